@@ -0,0 +1,127 @@
+# bench/callback_latency.py
+"""
+Задержка обработки нажатий кнопок, пока параллельно строится тяжёлый отчёт.
+
+    python -m bench.callback_latency --logs 200000 --seconds 10
+
+Режим «sync» воспроизводит старое поведение (синхронный Session внутри
+async-хендлера), режим «async» — текущие хендлеры на async_session.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+_DB = os.path.join(tempfile.gettempdir(), "warehouse_bench.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB}")
+
+from bot import db  # noqa: E402
+from bot.models import Log, Product, Stock, User  # noqa: E402
+from bot.handlers import report, stock_list  # noqa: E402
+
+
+def seed(n_logs: int) -> None:
+    """Заполняет базу синтетикой: 1 сотрудник, 200 товаров, n_logs записей журнала."""
+    db.Base.metadata.drop_all(db.engine)
+    db.init_db()
+    session = db.Session()
+    session.add(User(id=1, telegram_id="1", full_name="Bench", role="employee"))
+    session.add_all(Product(id=i, name=f"Товар {i:04d}") for i in range(1, 201))
+    session.add_all(Stock(product_id=i, user_id=1, quantity=5) for i in range(1, 201))
+    now = datetime.now()
+    session.bulk_insert_mappings(Log, [
+        {
+            "timestamp": now - timedelta(minutes=random.randint(0, 60 * 24 * 30)),
+            "action": "add_stock",
+            "user_id": "1",
+            "info": f"Пополнено: Товар {i % 200:04d} +1 шт.",
+        }
+        for i in range(n_logs)
+    ])
+    session.commit()
+    session.close()
+
+
+def _fake_callback(data: str):
+    update = MagicMock()
+    update.callback_query.data = data
+    update.callback_query.from_user.id = 1
+    update.callback_query.answer = AsyncMock()
+    update.callback_query.edit_message_text = AsyncMock()
+    update.effective_chat.send_message = AsyncMock()
+    return update
+
+
+async def _sync_report(start, end):
+    # «до»: синхронный запрос прямо в корутине блокирует event loop
+    session = db.Session()
+    session.query(Log).filter(Log.timestamp.between(start, end)).order_by(Log.timestamp).all()
+    session.close()
+
+
+async def _report_load(mode: str, stop: asyncio.Event) -> int:
+    ctx = MagicMock()
+    ctx.bot.send_message = AsyncMock()
+    done = 0
+    while not stop.is_set():
+        end = datetime.now()
+        start = end - timedelta(days=365)
+        if mode == "sync":
+            await _sync_report(start, end)
+        else:
+            await report._generate_and_send_report(_fake_callback("report"), ctx, start, end)
+        done += 1
+        await asyncio.sleep(0)
+    return done
+
+
+async def _probe(stop: asyncio.Event, latencies: list) -> None:
+    ctx = MagicMock()
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await stock_list.show_stock(_fake_callback("show_stock"), ctx)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        await asyncio.sleep(0.01)
+
+
+async def run(mode: str, seconds: float) -> None:
+    stop = asyncio.Event()
+    latencies: list = []
+    load = asyncio.create_task(_report_load(mode, stop))
+    probe = asyncio.create_task(_probe(stop, latencies))
+    await asyncio.sleep(seconds)
+    stop.set()
+    reports = await load
+    await probe
+    await db.async_engine.dispose()
+
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))]  # noqa: E731
+    print(
+        f"{mode:>5}: callbacks={len(latencies)} reports={reports} "
+        f"p50={statistics.median(latencies):.1f}ms p99={p(0.99):.1f}ms max={latencies[-1]:.1f}ms"
+    )
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--logs", type=int, default=200_000)
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--mode", choices=("sync", "async", "both"), default="both")
+    args = ap.parse_args(argv)
+
+    db.engine.echo = db.async_engine.echo = False
+    seed(args.logs)
+    for mode in ("sync", "async") if args.mode == "both" else (args.mode,):
+        asyncio.run(run(mode, args.seconds))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
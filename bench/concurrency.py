@@ -0,0 +1,138 @@
+# bench/concurrency.py
+"""
+Пропускная способность при смешанной нагрузке: тяжёлые отчёты + передачи.
+
+    python -m bench.concurrency --reports 4 --transfers 40 --logs 4000
+
+Через полный Application (bench.offline, Bot API отвечает с задержкой
+--latency) прогоняются одновременно:
+  • --reports менеджеров строят отчёт «сообщениями в чат» за неделю;
+  • --transfers сотрудников проходят диалог передачи
+    (кнопка → товар → сотрудник → количество).
+Апдейты идут вперемешку. Сравниваются обработка по одному (concurrency=1)
+и PerUserUpdateProcessor; проверяется, что каждая передача дошла до конца,
+т.е. шаги одного пользователя не перепутались.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_DB = os.path.join(tempfile.gettempdir(), "warehouse_concurrency_bench.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB}")
+
+from sqlalchemy import func, insert, select  # noqa: E402
+from telegram import Update  # noqa: E402
+
+from bench.offline import callback_update, message_update, offline_builder  # noqa: E402
+from bot import db  # noqa: E402
+from bot.main import build_app  # noqa: E402
+from bot.models import Log, Product, Stock, User  # noqa: E402
+
+PRODUCTS = 50
+RECIPIENT = 1  # users.id сотрудника, которому всё передаём
+
+
+def seed(reports: int, transfers: int, n_logs: int) -> None:
+    db.engine.dispose()
+    if db.engine.url.get_backend_name() == "sqlite" and os.path.exists(_DB):
+        os.remove(_DB)
+    db.init_db()
+    rnd = random.Random(1)
+    now = datetime.now()
+    with db.engine.begin() as conn:
+        conn.execute(insert(User), [{"telegram_id": "500", "full_name": "Получатель", "role": "employee"}])
+        conn.execute(insert(User), [
+            {"telegram_id": str(1000 + i), "full_name": f"Менеджер {i}", "role": "manager"}
+            for i in range(reports + transfers)
+        ])
+        conn.execute(insert(Product), [{"id": i, "name": f"Товар {i:03d}"} for i in range(1, PRODUCTS + 1)])
+        conn.execute(insert(Stock), [{"product_id": i, "user_id": None, "quantity": 10_000} for i in range(1, PRODUCTS + 1)])
+        for lo in range(0, n_logs, 50_000):
+            conn.execute(insert(Log), [
+                {
+                    "timestamp": now - timedelta(seconds=rnd.randint(0, 6 * 86400)),
+                    "action": "add_stock",
+                    "user_id": "1000",
+                    "info": f"Пополнено: Товар {rnd.randint(1, PRODUCTS):03d} +1 шт.",
+                }
+                for _ in range(lo, min(n_logs, lo + 50_000))
+            ])
+
+
+def traffic(reports: int, transfers: int) -> list:
+    """Списки апдейтов по пользователям, перемешанные по шагам (round-robin)."""
+    flows, uid = [], 1000
+    for _ in range(reports):
+        flows.append([("cb", uid, "report"), ("cb", uid, "week"), ("cb", uid, "fmt:chat")])
+        uid += 1
+    for i in range(transfers):
+        pid = 1 + i % PRODUCTS
+        flows.append([("cb", uid, "transfer_stock"), ("cb", uid, str(pid)), ("cb", uid, str(RECIPIENT)), ("msg", uid, "1")])
+        uid += 1
+
+    updates, step = [], 0
+    while any(step < len(f) for f in flows):
+        for f in flows:
+            if step < len(f):
+                kind, u, data = f[step]
+                n = len(updates) + 1
+                updates.append(callback_update(n, u, data) if kind == "cb" else message_update(n, u, data))
+        step += 1
+    return updates
+
+
+async def run(concurrency: int, updates: list, latency: float, transfers: int) -> None:
+    builder, api = offline_builder(latency)
+    app = build_app(builder, concurrency=concurrency)
+    async with db.async_session() as session:
+        before = await session.scalar(select(func.sum(Stock.quantity)).filter(Stock.user_id == RECIPIENT)) or 0
+
+    async with app:
+        await app.start()
+        t0 = time.perf_counter()
+        for body in updates:
+            await app.update_queue.put(Update.de_json(body, app.bot))
+        await app.update_queue.join()
+        elapsed = time.perf_counter() - t0
+        await app.stop()
+
+    async with db.async_session() as session:
+        after = await session.scalar(select(func.sum(Stock.quantity)).filter(Stock.user_id == RECIPIENT)) or 0
+    await db.async_engine.dispose()
+
+    done = [t - t0 for t, _, _, text in api.sent if text.startswith("✅ Передача выполнена")]
+    done.sort()
+    p = lambda q: done[min(len(done) - 1, int(q * len(done)))] * 1000 if done else float("nan")  # noqa: E731
+    print(
+        f"concurrency={concurrency:>3}: {len(updates)} апдейтов за {elapsed:.2f} с "
+        f"({len(updates) / elapsed:.0f}/с); передач завершено {len(done)}/{transfers}, "
+        f"остаток получателя +{after - before}; время до завершения передачи "
+        f"p50={statistics.median(done) * 1000 if done else float('nan'):.0f}ms p95={p(0.95):.0f}ms"
+    )
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--reports", type=int, default=4)
+    ap.add_argument("--transfers", type=int, default=40)
+    ap.add_argument("--logs", type=int, default=4000)
+    ap.add_argument("--latency", type=float, default=0.03, help="задержка Bot API, с")
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 16])
+    args = ap.parse_args(argv)
+
+    db.engine.echo = db.async_engine.echo = False
+    updates = traffic(args.reports, args.transfers)
+    for c in args.concurrency:
+        seed(args.reports, args.transfers, args.logs)
+        asyncio.run(run(c, updates, args.latency, args.transfers))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+# bench/db_profiles.py
+"""
+Пропускная способность записи при разных профилях движка (DB_PROFILE).
+
+    python -m bench.db_profiles --writers 16 --tx 100
+    python -m bench.db_profiles --url postgresql://bot@localhost/bench_db
+
+Каждый писатель повторяет путь пополнения склада: Stock.adjust + Log +
+StockMovement и commit, --tx транзакций подряд; все писатели одновременно.
+Для SQLite каждый профиль получает свой свежий файл (режим журнала хранится
+в файле — иначе plain унаследовал бы WAL от tuned). Для Postgres таблицы
+в --url пересоздаются — не указывайте рабочую базу.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# ожидание блокировки — не «медленный SQL», в выводе прогона оно не нужно
+os.environ.setdefault("SQL_SLOW_MS", "1e9")
+
+from sqlalchemy import func, insert, select  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker  # noqa: E402
+
+from bot import db  # noqa: E402
+from bot.models import Log, Product, Stock, StockMovement  # noqa: E402
+
+PRODUCTS = 50
+
+
+def _percentile(values, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def prepare(url: str, profile: str):
+    sync_engine, async_engine = db.create_engines(url, profile)
+    sync_engine.echo = async_engine.echo = False
+    db.Base.metadata.drop_all(sync_engine)
+    db.Base.metadata.create_all(sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(insert(Product), [{"id": i, "name": f"Товар {i:03}"} for i in range(1, PRODUCTS + 1)])
+    sync_engine.dispose()
+    return async_engine
+
+
+async def _writer(make_session, n: int, tx: int, latencies: list) -> tuple:
+    done = locked = 0
+    for i in range(tx):
+        pid = (n * tx + i) % PRODUCTS + 1
+        t = time.perf_counter()
+        try:
+            async with make_session() as session:
+                total = await Stock.adjust(session, pid, None, 1)
+                session.add(Log(action="add_stock", user_id=str(n), info=f"bench +1 шт. Итого: {total} шт."))
+                session.add(StockMovement(kind="add_stock", product_id=pid, to_holder=None, qty=1, actor=str(n)))
+                await session.commit()
+            done += 1
+        except OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            locked += 1
+        latencies.append(time.perf_counter() - t)
+    return done, locked
+
+
+async def run(url: str, profile: str, writers: int, tx: int) -> None:
+    async_engine = prepare(url, profile)
+    make_session = async_sessionmaker(async_engine, expire_on_commit=False)
+    latencies = []
+
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(_writer(make_session, n, tx, latencies) for n in range(writers)))
+    elapsed = time.perf_counter() - t0
+
+    async with make_session() as session:
+        total = await session.scalar(select(func.coalesce(func.sum(Stock.quantity), 0)))
+    await async_engine.dispose()
+
+    done = sum(d for d, _ in results)
+    locked = sum(k for _, k in results)
+    status = "OK" if total == done else f"РАСХОЖДЕНИЕ ({total} ≠ {done})"
+    print(
+        f"{profile:>6}: {done} транзакций за {elapsed:.2f} с — {done / elapsed:,.0f} в с; "
+        f"p50 {_percentile(latencies, 0.5) * 1000:.1f} мс, p95 {_percentile(latencies, 0.95) * 1000:.1f} мс, "
+        f"max {max(latencies) * 1000:.0f} мс; «database is locked»: {locked} — {status}"
+    )
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", help="база для прогона (по умолчанию — временные файлы SQLite)")
+    ap.add_argument("--profile", nargs="+", choices=db.PROFILES, default=["plain", "tuned"])
+    ap.add_argument("--writers", type=int, default=16, help="одновременных писателей")
+    ap.add_argument("--tx", type=int, default=100, help="транзакций на писателя")
+    args = ap.parse_args(argv)
+
+    for profile in args.profile:
+        url = args.url
+        if url is None:
+            path = os.path.join(tempfile.gettempdir(), f"warehouse_profile_{profile}.db")
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            url = f"sqlite:///{path}"
+        asyncio.run(run(url, profile, args.writers, args.tx))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
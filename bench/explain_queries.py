@@ -0,0 +1,95 @@
+# bench/explain_queries.py
+"""
+План выполнения для каждого запроса хендлеров — чтобы было видно,
+если какой-то из них перестал попадать в индекс.
+
+    python -m bench.explain_queries
+
+SQLite: EXPLAIN QUERY PLAN, Postgres: EXPLAIN.
+Строки «SCAN <таблица>» без индекса помечаются ⚠️.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, text
+
+from bot.db import engine, init_db
+from bot.models import JoinRequest, Log, Product, Stock, StockMovement, User
+
+
+def handler_queries():
+    now = datetime.now()
+    free = Stock.user_id.is_(None)
+    return {
+        "start.start: user": select(User).filter_by(telegram_id="1"),
+        "start.start: join request": select(JoinRequest).filter_by(telegram_id="1"),
+        "stock.add_stock_start": select(Product).order_by(Product.name),
+        "stock.enter_qty: warehouse row": select(Stock.quantity).filter_by(product_id=1, user_id=None),
+        "stock_list: own": (
+            select(Product.name, func.sum(Stock.quantity)).join(Stock)
+            .filter(Stock.user_id == 1, Stock.quantity > 0)
+            .group_by(Product.name).order_by(Product.name)
+        ),
+        "stock_list: by employee": (
+            select(User.full_name, Product.name, func.sum(Stock.quantity)).select_from(Stock)
+            .join(User, User.id == Stock.user_id).join(Product, Product.id == Stock.product_id)
+            .filter(Stock.quantity > 0)
+            .group_by(User.full_name, Product.name).order_by(User.full_name, Product.name)
+        ),
+        "stock_list: by product": (
+            select(Product.name, User.full_name, func.sum(Stock.quantity)).select_from(Stock)
+            .join(Product, Stock.product_id == Product.id).outerjoin(User, User.id == Stock.user_id)
+            .filter(Stock.quantity > 0)
+            .group_by(Product.id, Stock.user_id, User.full_name)
+            .order_by(Product.name, User.full_name.nullsfirst())
+        ),
+        "transfer_stock.transfer_start": (
+            select(Stock.product_id).filter(free, Stock.quantity > 0).distinct()
+        ),
+        "transfer_stock.select_product": select(User).filter_by(role="employee").order_by(User.full_name),
+        "transfer_stock.select_employee": select(Stock.quantity).filter_by(product_id=1, user_id=None),
+        "writeoff.writeoff_start: employees": (
+            select(User).join(Stock).filter(User.role == "employee", Stock.quantity > 0)
+            .group_by(User.id).order_by(User.full_name)
+        ),
+        "writeoff.writeoff_start: unassigned": select(Stock.id).filter(free, Stock.quantity > 0).limit(1),
+        "writeoff._show_products": (
+            select(Stock).join(Product, Stock.product_id == Product.id)
+            .filter(Stock.user_id == 1, Stock.quantity > 0).order_by(Product.name)
+        ),
+        "report._generate_and_send_report": (
+            select(Log).filter(Log.timestamp.between(now - timedelta(days=30), now)).order_by(Log.timestamp)
+        ),
+        "delete_product.delete_product_start": (
+            select(Product)
+            .filter(Product.id.notin_(select(Stock.product_id).filter(Stock.quantity > 0).distinct()))
+            .order_by(Product.name)
+        ),
+        "ledger: product history": (
+            select(StockMovement).filter(StockMovement.product_id == 1, StockMovement.ts >= now - timedelta(days=30))
+            .order_by(StockMovement.ts)
+        ),
+        "ledger: employee history": (
+            select(StockMovement).filter(StockMovement.to_holder == 1, StockMovement.ts >= now - timedelta(days=30))
+            .order_by(StockMovement.ts)
+        ),
+    }
+
+
+def main() -> None:
+    engine.echo = False
+    init_db()
+    explain = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+
+    with engine.connect() as conn:
+        for label, query in handler_queries().items():
+            sql = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+            print(f"\n── {label}")
+            for row in conn.execute(text(explain + sql)):
+                line = str(row[-1])
+                full_scan = line.startswith("SCAN") and "INDEX" not in line
+                print(("⚠️  " if full_scan else "   ") + line)
+
+
+if __name__ == "__main__":
+    main()
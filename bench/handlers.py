@@ -0,0 +1,323 @@
+# bench/handlers.py
+"""
+Микро-бенчмарк хендлеров на синтетической базе заданного размера.
+
+    python -m bench.handlers --products 10000 --employees 2000 --logs 1000000
+    python -m bench.handlers --save baseline.json
+    python -m bench.handlers --compare baseline.json
+
+Корутины хендлеров (start, show_stock, enter_qty пополнения и передачи,
+enter_reason списания, отчёт «сообщениями в чат») вызываются напрямую с
+настоящими Update и CallbackContext; Bot API подменён bench.offline, так
+что исходящие вызовы только считаются. Для каждого хендлера печатаются
+перцентили задержки, число SQL-запросов и вызовов Bot API на один вызов и
+пик памяти (tracemalloc, отдельным проходом, чтобы не искажать время).
+
+База генерируется один раз и переиспользуется, пока размеры те же
+(--reseed — пересоздать). --compare показывает изменение к сохранённому
+--save прогону.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+_DB = os.path.join(tempfile.gettempdir(), "warehouse_handlers_bench.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB}")
+
+from sqlalchemy import event, insert  # noqa: E402
+from telegram import Update  # noqa: E402
+from telegram.ext import CallbackContext  # noqa: E402
+
+from bench.offline import callback_update, message_update, offline_builder  # noqa: E402
+from bot import db  # noqa: E402
+from bot.handlers import report, start, stock, stock_list, transfer_stock, writeoff  # noqa: E402
+from bot.main import build_app  # noqa: E402
+from bot.models import Log, Product, Stock, User  # noqa: E402
+
+MANAGERS = 5
+BATCH = 50_000
+
+
+# ── синтетическая база ──────────────────────────────────────────────────────
+def _employee_tg(i: int) -> int:
+    return 100_000 + i
+
+
+def _manager_tg(i: int) -> int:
+    return 900_000 + i
+
+
+def seed(products: int, employees: int, logs: int, holdings: int, days: int, reseed: bool = False) -> dict:
+    """
+    Создать (или переиспользовать) базу. Пользователи: сотрудники — users.id
+    1..employees, менеджеры — следом; склад — stocks.id 1..products.
+    """
+    sizes = {"products": products, "employees": employees, "logs": logs, "holdings": holdings, "days": days}
+    meta = _DB + ".json"
+    sqlite = db.engine.url.get_backend_name() == "sqlite"
+    if sqlite and not reseed and os.path.exists(_DB) and os.path.exists(meta):
+        with open(meta) as f:
+            if json.load(f) == sizes:
+                return sizes
+
+    db.engine.dispose()
+    if sqlite:
+        for path in (_DB, _DB + "-wal", _DB + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+    else:
+        db.Base.metadata.drop_all(db.engine)
+    db.init_db()
+
+    rnd = random.Random(20)
+    now = datetime.now()
+    t0 = time.perf_counter()
+    with db.engine.begin() as conn:
+        conn.execute(insert(Product), [{"id": i, "name": f"Товар {i:05d}"} for i in range(1, products + 1)])
+        conn.execute(insert(User), [
+            {"id": i, "telegram_id": str(_employee_tg(i)), "full_name": f"Сотрудник {i:04d}", "role": "employee"}
+            for i in range(1, employees + 1)
+        ] + [
+            {"id": employees + i, "telegram_id": str(_manager_tg(i)), "full_name": f"Менеджер {i}", "role": "manager"}
+            for i in range(1, MANAGERS + 1)
+        ])
+        conn.execute(insert(Stock), [
+            {"id": i, "product_id": i, "user_id": None, "quantity": 1_000_000} for i in range(1, products + 1)
+        ])
+        held = [
+            {"product_id": pid, "user_id": uid, "quantity": 1_000}
+            for uid in range(1, employees + 1)
+            for pid in rnd.sample(range(1, products + 1), min(holdings, products))
+        ]
+        for lo in range(0, len(held), BATCH):
+            conn.execute(insert(Stock), held[lo:lo + BATCH])
+        for lo in range(0, logs, BATCH):
+            conn.execute(insert(Log), [
+                {
+                    "timestamp": now - timedelta(seconds=rnd.randint(0, days * 86400)),
+                    "action": "add_stock",
+                    "user_id": str(_manager_tg(1)),
+                    "info": f"Пополнено: Товар {rnd.randint(1, products):05d} +1 шт.",
+                }
+                for _ in range(lo, min(logs, lo + BATCH))
+            ])
+    if sqlite:
+        with open(meta, "w") as f:
+            json.dump(sizes, f)
+    print(f"база сгенерирована за {time.perf_counter() - t0:.1f} с: {sizes}")
+    return sizes
+
+
+# ── сценарии ────────────────────────────────────────────────────────────────
+def scenarios(sizes: dict, report_days: float) -> dict:
+    """имя → f(app, i) → корутина одного вызова хендлера."""
+    products, employees = sizes["products"], sizes["employees"]
+    rnd = random.Random(3)
+    manager = _manager_tg(1)
+    newcomers = 10_000_000 + random.SystemRandom().randrange(10 ** 9)  # база переиспользуется между прогонами
+
+    def ctx(app, body, **user_data):
+        update = Update.de_json(body, app.bot)
+        context = CallbackContext.from_update(update, app)
+        context.user_data.clear()
+        context.user_data.update(user_data)
+        return update, context
+
+    def start_manager(app, i):
+        return start.start(*ctx(app, message_update(i, manager, "/start")))
+
+    def start_unknown(app, i):
+        # каждый раз новый человек: запрос на вступление + рассылка менеджерам
+        return start.start(*ctx(app, message_update(i, newcomers + i, "/start")))
+
+    def show_own(app, i):
+        return stock_list.show_stock(*ctx(app, callback_update(i, _employee_tg(rnd.randint(1, employees)), "show_stock")))
+
+    def show_by_employee(app, i):
+        return stock_list.show_stock(*ctx(app, callback_update(i, manager, stock_list.EMP)))
+
+    def show_by_product(app, i):
+        return stock_list.show_stock(*ctx(app, callback_update(i, manager, stock_list.PROD)))
+
+    def add_stock(app, i):
+        return stock.enter_qty(*ctx(app, message_update(i, manager, "5"), product_id=rnd.randint(1, products)))
+
+    def transfer(app, i):
+        pid = rnd.randint(1, products)
+        return transfer_stock.enter_qty(*ctx(
+            app, message_update(i, manager, "1"),
+            product_id=pid, employee_id=rnd.randint(1, employees), available_qty=1_000_000,
+            product_name=f"Товар {pid:05d}",
+        ))
+
+    def writeoff_reason(app, i):
+        # строки сотрудников идут после складских: id > products
+        stock_id = products + rnd.randint(1, employees * min(sizes["holdings"], products))
+        return writeoff.enter_reason(*ctx(
+            app, message_update(i, manager, "бенчмарк"), writeoff_qty=1, stock_id=stock_id,
+        ))
+
+    def report_chat(app, i):
+        end = datetime.now()
+        update, context = ctx(app, callback_update(i, manager, "fmt:chat"))
+        return report._generate_and_send_report(update, context, end - timedelta(days=report_days), end)
+
+    return {
+        "start: менеджер": start_manager,
+        "start: новый человек": start_unknown,
+        "show_stock: свои": show_own,
+        "show_stock: по сотрудникам": show_by_employee,
+        "show_stock: по товарам": show_by_product,
+        "stock.enter_qty": add_stock,
+        "transfer_stock.enter_qty": transfer,
+        "writeoff.enter_reason": writeoff_reason,
+        "report: в чат": report_chat,
+    }
+
+
+# ── замеры ──────────────────────────────────────────────────────────────────
+class _SqlCounter:
+    def __init__(self):
+        self.n = 0
+
+    def __call__(self, *_):
+        self.n += 1
+
+
+def _pct(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def measure(app, api, make, repeat: int, mem_repeat: int, sql: _SqlCounter, seq) -> dict:
+    latencies, errors = [], 0
+    sql0, calls0 = sql.n, sum(api.calls.values())
+    for _ in range(repeat):
+        sent = len(api.sent)
+        coro = make(app, next(seq))
+        t = time.perf_counter()
+        await coro
+        latencies.append((time.perf_counter() - t) * 1000)
+        errors += any(text.startswith("❌") for *_, text in api.sent[sent:])
+    n_sql = (sql.n - sql0) / repeat
+    n_api = (sum(api.calls.values()) - calls0) / repeat
+
+    peak = 0
+    for _ in range(mem_repeat):
+        coro = make(app, next(seq))
+        tracemalloc.start()
+        try:
+            await coro
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "n": repeat,
+        "p50": statistics.median(latencies),
+        "p95": _pct(latencies, 0.95),
+        "p99": _pct(latencies, 0.99),
+        "max": latencies[-1],
+        "sql": n_sql,
+        "api": n_api,
+        "peak_kib": peak / 1024,
+        "errors": errors,
+    }
+
+
+def _delta(cur: float, base: float) -> str:
+    if not base:
+        return ""
+    return f" ({(cur - base) / base:+.0%})"
+
+
+def print_table(results: dict, baseline: dict = None) -> None:
+    baseline = baseline or {}
+    print(f"{'хендлер':<28} {'n':>4} {'p50 мс':>16} {'p95 мс':>16} {'p99 мс':>9} "
+          f"{'SQL':>12} {'API':>6} {'пик KiB':>18} {'ошибок':>6}")
+    for name, r in results.items():
+        b = baseline.get(name, {})
+        print(
+            f"{name:<28} {r['n']:>4} "
+            f"{r['p50']:>8.2f}{_delta(r['p50'], b.get('p50')):>8} "
+            f"{r['p95']:>8.2f}{_delta(r['p95'], b.get('p95')):>8} "
+            f"{r['p99']:>9.2f} "
+            f"{r['sql']:>5.1f}{_delta(r['sql'], b.get('sql')):>7} "
+            f"{r['api']:>6.1f} "
+            f"{r['peak_kib']:>10.0f}{_delta(r['peak_kib'], b.get('peak_kib')):>8} "
+            f"{r['errors']:>6}"
+        )
+
+
+async def run(args, sizes: dict) -> dict:
+    builder, api = offline_builder(args.latency)
+    app = build_app(builder, concurrency=1)
+    sql = _SqlCounter()
+    event.listen(db.async_engine.sync_engine, "before_cursor_execute", sql)
+
+    selected = scenarios(sizes, args.report_days)
+    if args.only:
+        selected = {k: v for k, v in selected.items() if any(s in k for s in args.only)}
+
+    seq = iter(range(1, 10 ** 9))
+    results = {}
+    async with app:
+        for name, make in selected.items():
+            heavy = name.startswith(("report", "show_stock: по"))
+            repeat = args.heavy_repeat if heavy else args.repeat
+            await make(app, next(seq))  # прогрев: кеши, пул соединений
+            results[name] = await measure(app, api, make, repeat, args.mem_repeat, sql, seq)
+    event.remove(db.async_engine.sync_engine, "before_cursor_execute", sql)
+    await db.async_engine.dispose()
+    return results
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--products", type=int, default=10_000)
+    ap.add_argument("--employees", type=int, default=2_000)
+    ap.add_argument("--logs", type=int, default=1_000_000)
+    ap.add_argument("--holdings", type=int, default=5, help="товаров на руках у каждого сотрудника")
+    ap.add_argument("--days", type=int, default=90, help="за сколько дней разбросан журнал")
+    ap.add_argument("--report-days", type=float, default=1, help="период отчёта в чат")
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--heavy-repeat", type=int, default=5, help="повторов для отчёта и полных списков остатков")
+    ap.add_argument("--mem-repeat", type=int, default=2, help="проходов под tracemalloc")
+    ap.add_argument("--latency", type=float, default=0.0, help="задержка Bot API, с")
+    ap.add_argument("--only", nargs="+", help="подстроки имён хендлеров")
+    ap.add_argument("--reseed", action="store_true")
+    ap.add_argument("--save", metavar="FILE", help="сохранить результаты как базовую линию")
+    ap.add_argument("--compare", metavar="FILE", help="сравнить с сохранённой базовой линией")
+    args = ap.parse_args(argv)
+
+    db.engine.echo = db.async_engine.echo = False
+    sizes = seed(args.products, args.employees, args.logs, args.holdings, args.days, args.reseed)
+    results = asyncio.run(run(args, sizes))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            saved = json.load(f)
+        if saved.get("sizes") != sizes:
+            print(f"⚠️ базовая линия снята на другой базе: {saved.get('sizes')}")
+        baseline = saved["results"]
+    print_table(results, baseline)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"sizes": sizes, "at": datetime.now().isoformat(timespec="seconds"), "results": results},
+                      f, ensure_ascii=False, indent=1)
+        print(f"сохранено в {args.save}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+# bench/offline.py
+"""
+Бот без Telegram: подменный транспорт Bot API и генераторы апдейтов.
+
+OfflineRequest отвечает на любой метод правдоподобным JSON (getMe — фейковый
+бот, send*/edit* — сообщение, getFile/скачивание — из request.files,
+остальное — true) и записывает вызовы, так что
+полный Application с нашими хендлерами работает локально:
+
+    builder, request = offline_builder()
+    app = build_app(builder)
+"""
+
+import asyncio
+import json
+import time
+from collections import Counter
+
+from telegram.ext import Application
+from telegram.request import BaseRequest
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Warehouse", "username": "warehouse_bench_bot"}
+
+
+class OfflineRequest(BaseRequest):
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency  # имитация сетевой задержки Bot API, с
+        self.calls = Counter()
+        self.sent = []  # (time.perf_counter(), метод, chat_id, text) для send*/edit*
+        self.files = {}  # file_id → содержимое для getFile и скачивания
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        if "/file/bot" in url:  # скачивание файла, полученного через getFile
+            return 200, self.files[url.rsplit("/", 1)[-1]]
+
+        api = url.rsplit("/", 1)[-1]
+        self.calls[api] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        params = request_data.parameters if request_data else {}
+        if api == "getMe":
+            result = BOT_USER
+        elif api.startswith(("send", "edit")):
+            chat_id = params.get("chat_id", 0)
+            self.sent.append((time.perf_counter(), api, chat_id, params.get("text", "")))
+            result = {
+                "message_id": sum(self.calls.values()),
+                "date": int(time.time()),
+                "chat": {"id": int(chat_id) if str(chat_id).lstrip("-").isdigit() else 0, "type": "private"},
+                "from": BOT_USER,
+                "text": params.get("text", ""),
+            }
+        elif api == "getFile":
+            file_id = params["file_id"]
+            result = {
+                "file_id": file_id,
+                "file_unique_id": file_id,
+                "file_size": len(self.files[file_id]),
+                "file_path": f"documents/{file_id}",
+            }
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+def offline_builder(latency: float = 0.0, token: str = "1:offline"):
+    """Application.builder() с подменным транспортом (и для getUpdates тоже)."""
+    request = OfflineRequest(latency)
+    builder = Application.builder().token(token).request(request).get_updates_request(OfflineRequest())
+    return builder, request
+
+
+def _user(uid: int) -> dict:
+    return {"id": uid, "is_bot": False, "first_name": f"User{uid}"}
+
+
+def message_update(update_id: int, uid: int, text: str) -> dict:
+    msg = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": uid, "type": "private"},
+        "from": _user(uid),
+        "text": text,
+    }
+    if text.startswith("/"):
+        msg["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": update_id, "message": msg}
+
+
+def document_update(update_id: int, uid: int, file_id: str, file_name: str, size: int = 0) -> dict:
+    """Сообщение с документом; содержимое положить в request.files[file_id]."""
+    body = message_update(update_id, uid, "")
+    msg = body["message"]
+    del msg["text"]
+    msg["document"] = {"file_id": file_id, "file_unique_id": file_id, "file_name": file_name, "file_size": size}
+    return body
+
+
+def callback_update(update_id: int, uid: int, data: str, message_id: int = 1) -> dict:
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": _user(uid),
+            "chat_instance": str(uid),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": uid, "type": "private"},
+                "from": BOT_USER,
+                "text": "…",
+            },
+        },
+    }
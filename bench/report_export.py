@@ -0,0 +1,113 @@
+# bench/report_export.py
+"""
+Выгрузка журнала: время и пиковая память (RSS) на большом периоде.
+
+    python -m bench.report_export --logs 1000000
+
+Режимы (каждый в отдельном процессе, чтобы пик RSS был честным):
+  legacy — как раньше: все Log через .all() и строки отчёта в памяти;
+  csv    — bot.export, gzip'нутый CSV;
+  xlsx   — bot.export, XLSX в режиме constant_memory.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_DB = os.path.join(tempfile.gettempdir(), "warehouse_export_bench.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB}")
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from bot import db  # noqa: E402
+from bot.export import FORMATS, export_logs  # noqa: E402
+from bot.models import Log  # noqa: E402
+
+MODES = ("legacy",) + FORMATS
+
+
+def seed(n_logs: int, chunk: int = 50_000) -> None:
+    if db.engine.url.get_backend_name() == "sqlite" and os.path.exists(_DB):
+        os.remove(_DB)
+    db.init_db()
+    rnd = random.Random(42)
+    now = datetime.now()
+    with db.engine.begin() as conn:
+        for lo in range(0, n_logs, chunk):
+            conn.execute(insert(Log), [
+                {
+                    "timestamp": now - timedelta(seconds=rnd.randint(0, 30 * 86400)),
+                    "action": "transfer_stock",
+                    "user_id": str(rnd.randint(10**8, 10**9)),
+                    "info": f"Передано {rnd.randint(1, 50)} шт. Товар {rnd.randint(1, 5000):05d} сотруднику Сотрудник {rnd.randint(1, 300)}",
+                }
+                for _ in range(lo, min(n_logs, lo + chunk))
+            ])
+
+
+async def _legacy(start, end):
+    async with db.async_session() as session:
+        rows = (await session.scalars(
+            select(Log).filter(Log.timestamp.between(start, end)).order_by(Log.timestamp)
+        )).all()
+    lines = [
+        f"{log.timestamp.strftime('%Y-%m-%d %H:%M')} | {log.action:<12} | {log.user_id:<10} | {log.info}"
+        for log in rows
+    ]
+    chunks = ["\n".join(lines[i:i + 40]) for i in range(0, len(lines), 40)]
+    return len(rows), f"{len(chunks)} сообщений"
+
+
+async def _export(start, end, fmt):
+    async with db.async_session() as session:
+        path, count = await export_logs(session, start, end, fmt)
+    size = os.path.getsize(path)
+    os.remove(path)
+    return count, f"файл {size / 2**20:.1f} МБ"
+
+
+async def run_one(mode: str) -> None:
+    end = datetime.now()
+    start = end - timedelta(days=31)
+    rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    if mode == "legacy":
+        count, what = await _legacy(start, end)
+    else:
+        count, what = await _export(start, end, mode)
+    elapsed = time.perf_counter() - t0
+    await db.async_engine.dispose()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # КБ в Linux
+    print(
+        f"{mode:>6}: {count} строк за {elapsed:.1f} с, {what}, "
+        f"пик RSS {rss / 1024:.0f} МБ (+{(rss - rss0) / 1024:.0f} МБ)"
+    )
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--logs", type=int, default=1_000_000)
+    ap.add_argument("--mode", choices=MODES + ("all",), default="all")
+    ap.add_argument("--no-seed", action="store_true", help="взять уже заполненную базу")
+    args = ap.parse_args(argv)
+
+    db.engine.echo = db.async_engine.echo = False
+    if args.mode != "all":
+        asyncio.run(run_one(args.mode))
+        return
+
+    if not args.no_seed:
+        seed(args.logs)
+    for mode in MODES:
+        subprocess.run([sys.executable, "-m", "bench.report_export", "--mode", mode], check=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
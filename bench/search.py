@@ -0,0 +1,83 @@
+# bench/search.py
+"""
+Скорость поиска товаров на синтетическом каталоге.
+
+    python -m bench.search --products 50000 --queries 500
+
+Каталог: «<слово> <слово> <артикул>» из небольшого словаря, запросы —
+случайные куски названий (1–8 символов). Цель: p99 заметно ниже 50 мс.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+_DB = os.path.join(tempfile.gettempdir(), "warehouse_search_bench.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB}")
+
+from sqlalchemy import insert  # noqa: E402
+
+from bot import db  # noqa: E402
+from bot.models import Product  # noqa: E402
+from bot.search import search_products  # noqa: E402
+
+_WORDS = (
+    "кабель провод болт гайка винт шуруп дюбель анкер хомут скоба лента труба уголок "
+    "профиль петля замок ключ отвёртка молоток перчатки краска клей герметик фум муфта "
+    "тройник кран фильтр насос датчик реле автомат розетка выключатель лампа патрон"
+).split()
+
+
+def seed(n: int) -> list:
+    if db.engine.url.get_backend_name() == "sqlite" and os.path.exists(_DB):
+        os.remove(_DB)
+    db.init_db()
+    rnd = random.Random(42)
+    names = [f"{rnd.choice(_WORDS).capitalize()} {rnd.choice(_WORDS)} {i:06d}" for i in range(n)]
+    with db.engine.begin() as conn:
+        conn.execute(insert(Product), [{"name": name} for name in names])
+    return names
+
+
+async def run(names: list, queries: int) -> None:
+    rnd = random.Random(7)
+    latencies, hits = [], 0
+    async with db.async_session() as session:
+        await search_products(session, "прогрев")
+        for _ in range(queries):
+            name = rnd.choice(names)
+            size = rnd.randint(1, 8)
+            start = rnd.randint(0, max(0, len(name) - size))
+            q = name[start:start + size].strip() or name[:3]
+            t0 = time.perf_counter()
+            hits += len(await search_products(session, q))
+            latencies.append((time.perf_counter() - t0) * 1000)
+    await db.async_engine.dispose()
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+    print(
+        f"{len(names)} товаров, {queries} запросов ({db.async_engine.dialect.name}): "
+        f"p50={statistics.median(latencies):.2f}ms p99={p99:.2f}ms max={latencies[-1]:.2f}ms "
+        f"результатов в среднем {hits / queries:.1f}"
+    )
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--products", type=int, default=50_000)
+    ap.add_argument("--queries", type=int, default=500)
+    args = ap.parse_args(argv)
+
+    db.engine.echo = db.async_engine.echo = False
+    names = seed(args.products)
+    asyncio.run(run(names, args.queries))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
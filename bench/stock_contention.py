@@ -0,0 +1,97 @@
+# bench/stock_contention.py
+"""
+Много одновременных списаний с одной строки остатка.
+
+    python -m bench.stock_contention --tasks 200 --stock 1000
+
+Каждая задача повторяет путь хендлера: читает доступное количество,
+«думает» (--think, как пользователь, который вводит число и причину —
+никаких блокировок в это время не держится), потом списывает.
+  • legacy — как было: проверка по прочитанному, затем quantity - qty;
+  • cas    — Stock.take: UPDATE … WHERE quantity >= qty, итог по rowcount.
+Проверяется, что остаток не ушёл в минус и сходится с суммой списаний.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+_DB = os.path.join(tempfile.gettempdir(), "warehouse_contention_bench.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB}")
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from bot import db  # noqa: E402
+from bot.models import Product, Stock  # noqa: E402
+
+PID = 1
+
+
+def seed(stock: int) -> None:
+    db.engine.dispose()
+    if db.engine.url.get_backend_name() == "sqlite" and os.path.exists(_DB):
+        os.remove(_DB)
+    db.init_db()
+    with db.engine.begin() as conn:
+        conn.execute(insert(Product), [{"id": PID, "name": "Товар"}])
+        conn.execute(insert(Stock), [{"product_id": PID, "user_id": None, "quantity": stock}])
+
+
+async def _worker(mode: str, qty: int, think: float, rnd: random.Random) -> int:
+    async with db.async_session() as session:
+        available = await session.scalar(select(Stock.quantity).filter_by(product_id=PID, user_id=None))
+    if qty > available:
+        return 0  # хендлер не дал бы ввести столько
+
+    await asyncio.sleep(rnd.uniform(0, think))
+
+    async with db.async_session() as session:
+        if mode == "cas":
+            if not await Stock.take(session, qty, product_id=PID, user_id=None):
+                return 0
+        else:
+            await Stock.adjust(session, PID, None, -qty)
+        await session.commit()
+    return qty
+
+
+async def run(mode: str, tasks: int, stock: int, max_qty: int, think: float) -> None:
+    rnd = random.Random(7)
+    wanted = [rnd.randint(1, max_qty) for _ in range(tasks)]
+    t0 = time.perf_counter()
+    taken = await asyncio.gather(*(_worker(mode, q, think, rnd) for q in wanted))
+    elapsed = time.perf_counter() - t0
+
+    async with db.async_session() as session:
+        left = await session.scalar(select(Stock.quantity).filter_by(product_id=PID, user_id=None))
+    await db.async_engine.dispose()
+
+    ok = sum(1 for t in taken if t)
+    status = "OK" if left >= 0 and left + sum(taken) == stock else "РАСХОЖДЕНИЕ"
+    print(
+        f"{mode:>6}: {tasks} задач за {elapsed:.2f} с; списано {ok} раз на {sum(taken)} шт., "
+        f"отказано {tasks - ok}; остаток {left} (было {stock}) — {status}"
+    )
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--tasks", type=int, default=200)
+    ap.add_argument("--stock", type=int, default=1000)
+    ap.add_argument("--max-qty", type=int, default=20)
+    ap.add_argument("--think", type=float, default=0.05, help="макс. пауза между чтением и списанием, с")
+    ap.add_argument("--mode", nargs="+", choices=["legacy", "cas"], default=["legacy", "cas"])
+    args = ap.parse_args(argv)
+
+    db.engine.echo = db.async_engine.echo = False
+    for mode in args.mode:
+        seed(args.stock)
+        asyncio.run(run(mode, args.tasks, args.stock, args.max_qty, args.think))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+# bench/webhook_replay.py
+"""
+Локальная проверка режима webhook без Telegram.
+
+    python -m bench.webhook_replay --updates 500
+
+Поднимает bot.webhook на localhost с подменным Bot API (bench.offline),
+POST'ит синтетические апдейты (/start и «Мои остатки» от разных людей),
+проверяет /healthz и отказ без секретного заголовка, печатает задержки
+HTTP-ответа и сколько вызовов Bot API сделали хендлеры.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+_DB = os.path.join(tempfile.gettempdir(), "warehouse_webhook_bench.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB}")
+os.environ.setdefault("WEBHOOK_SECRET", "bench-secret")
+
+import httpx  # noqa: E402
+
+from bench.offline import callback_update, message_update, offline_builder  # noqa: E402
+from bot import db, webhook  # noqa: E402
+from bot.config import WEBHOOK_PATH, WEBHOOK_SECRET  # noqa: E402
+from bot.main import build_app  # noqa: E402
+from bot.models import User  # noqa: E402
+
+USERS = 50
+
+
+def seed() -> None:
+    if db.engine.url.get_backend_name() == "sqlite" and os.path.exists(_DB):
+        os.remove(_DB)
+    db.init_db()
+    with db.Session() as session:
+        session.add_all(
+            User(telegram_id=str(1000 + i), full_name=f"User{1000 + i}", role="employee") for i in range(USERS)
+        )
+        session.commit()
+
+
+async def run(n: int, port: int) -> None:
+    builder, api = offline_builder()
+    app = build_app(builder)
+    stop = asyncio.Event()
+    server = asyncio.create_task(webhook.serve(app, "127.0.0.1", port, stop))
+
+    base = f"http://127.0.0.1:{port}"
+    headers = {"X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET} if WEBHOOK_SECRET else {}
+    latencies = []
+    async with httpx.AsyncClient(base_url=base) as client:
+        for _ in range(50):  # ждём, пока сервер поднимется
+            try:
+                health = (await client.get("/healthz")).json()
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+        print("healthz:", health)
+
+        if WEBHOOK_SECRET:
+            r = await client.post(WEBHOOK_PATH, json=message_update(1, 1000, "/start"))
+            print("без секрета:", r.status_code)
+
+        t0 = time.perf_counter()
+        for i in range(n):
+            uid = 1000 + i % USERS
+            body = message_update(i + 1, uid, "/start") if i % 2 else callback_update(i + 1, uid, "show_stock")
+            t = time.perf_counter()
+            r = await client.post(WEBHOOK_PATH, json=body, headers=headers)
+            latencies.append((time.perf_counter() - t) * 1000)
+            assert r.status_code == 200, r.status_code
+        while app.update_queue.qsize():
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - t0
+        print("healthz:", (await client.get("/healthz")).json())
+
+    stop.set()
+    await server
+
+    latencies.sort()
+    print(
+        f"{n} апдейтов за {elapsed:.2f} с: HTTP p50={statistics.median(latencies):.1f}ms "
+        f"p99={latencies[int(0.99 * (len(latencies) - 1))]:.1f}ms; вызовы Bot API: {dict(api.calls)}"
+    )
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--updates", type=int, default=500)
+    ap.add_argument("--port", type=int, default=8089)
+    args = ap.parse_args(argv)
+
+    db.engine.echo = db.async_engine.echo = False
+    seed()
+    asyncio.run(run(args.updates, args.port))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# bot/catalog.py
+"""
+Справочник товаров в памяти: id → название и список (название, id),
+отсортированный так же, как ORDER BY name, id.
+
+Товары меняются только при добавлении и удалении — эти места зовут
+catalog.bump() после commit. Версия растёт, и при следующем обращении
+справочник перечитывается одним запросом; до тех пор выбор товара
+(CatalogPicker) не ходит в БД, а готовые клавиатуры страниц хранятся
+в markups до смены версии.
+"""
+
+from sqlalchemy import select
+
+from bot.models import Product
+
+MARKUPS_MAX = 1024
+
+
+class Catalog:
+    def __init__(self):
+        self.version = 0
+        self._loaded = -1
+        self.names: dict = {}
+        self.order: list = []
+        self.markups: dict = {}
+        self.hits = self.misses = self.evictions = self.loads = 0
+
+    def bump(self) -> None:
+        """Каталог изменился — перечитать при следующем обращении."""
+        self.version += 1
+
+    async def ensure(self, session) -> None:
+        if self._loaded == self.version:
+            return
+        version = self.version
+        rows = (await session.execute(select(Product.id, Product.name))).all()
+        self.names = dict(rows)
+        self.order = sorted((name, pid) for pid, name in rows)
+        self.markups.clear()
+        self._loaded = version
+        self.loads += 1
+
+    def name(self, pid: int):
+        return self.names.get(pid)
+
+    def cached_markup(self, key, build):
+        """Клавиатура страницы из кеша текущей версии (или build())."""
+        markup = self.markups.get(key)
+        if markup is not None:
+            self.hits += 1
+            return markup
+        self.misses += 1
+        if len(self.markups) >= MARKUPS_MAX:
+            self.evictions += len(self.markups)
+            self.markups.clear()
+        markup = self.markups[key] = build()
+        return markup
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self.order),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.version,
+            "loads": self.loads,
+        }
+
+
+catalog = Catalog()
@@ -0,0 +1,79 @@
+# bot/concurrency.py
+"""
+Параллельная обработка апдейтов с сохранением порядка для каждого пользователя.
+
+Апдейты разных людей обрабатываются одновременно (не больше
+CONCURRENT_UPDATES сразу), а апдейты одного пользователя — строго по
+очереди: ConversationHandler'ы (пополнение, передача, списание) держат
+состояние в user_data и рассчитывают на последовательные шаги.
+
+Семафор базового класса берётся раньше, чем do_process_update, поэтому
+лимит держим сами и уже после блокировки пользователя — иначе апдейты,
+ждущие «своей очереди», занимали бы слоты и тормозили остальных.
+"""
+
+import asyncio
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+_UNBOUNDED = 2 ** 16
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(_UNBOUNDED)
+        self.limit = max_concurrent_updates
+        self._slots = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._locks = {}  # ключ → [Lock, сколько апдейтов его держат/ждут]
+        self.active = self.peak = self.processed = 0
+
+    @staticmethod
+    def _key(update: object):
+        if isinstance(update, Update):
+            if update.effective_user:
+                return "u", update.effective_user.id
+            if update.effective_chat:
+                return "c", update.effective_chat.id
+        return None
+
+    async def _run(self, coroutine) -> None:
+        async with self._slots:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            try:
+                await coroutine
+            finally:
+                self.active -= 1
+                self.processed += 1
+
+    async def do_process_update(self, update: object, coroutine) -> None:
+        key = self._key(update)
+        if key is None:
+            await self._run(coroutine)
+            return
+
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:  # Lock отдаёт очередь строго в порядке ожидания
+                await self._run(coroutine)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "peak": self.peak,
+            "processed": self.processed,
+            "users_waiting": sum(1 for _, n in self._locks.values() if n > 1),
+        }
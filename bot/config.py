@@ -6,6 +6,79 @@ load_dotenv()
 
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///warehouse.db')
+# реплика только для чтения (пусто — всё идёт в DATABASE_URL); после своей записи
+# пользователь READ_YOUR_WRITES_SECONDS читает с основной базы, пока реплика догоняет
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL", "")
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
 MANAGER_TELEGRAM_ID = os.getenv('MANAGER_TELEGRAM_IDS')
 
+# профиль движка БД: tuned — настройки ниже, plain — умолчания SQLAlchemy и драйвера
+DB_PROFILE = os.getenv("DB_PROFILE", "tuned").lower()
+# SQLite (tuned): WAL, synchronous=NORMAL, ожидание блокировки, mmap и кеш страниц
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "15000"))
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "64"))
+# Postgres (tuned): пул соединений и ограничение времени запроса
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "16"))  # не меньше CONCURRENT_UPDATES
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
 MANAGER_TELEGRAM_IDS = [id for id in os.getenv("MANAGER_TELEGRAM_IDS", "").split(",")]
+
+# сторож event loop (выключен по умолчанию)
+WATCHDOG_ENABLED = os.getenv("WATCHDOG_ENABLED", "0").lower() in ("1", "true", "yes")
+WATCHDOG_THRESHOLD_MS = int(os.getenv("WATCHDOG_THRESHOLD_MS", "250"))
+WATCHDOG_INTERVAL_MS = int(os.getenv("WATCHDOG_INTERVAL_MS", "100"))
+WATCHDOG_REPORT_SECONDS = int(os.getenv("WATCHDOG_REPORT_SECONDS", "600"))
+
+# кеш пользователей (telegram_id → id, роль, имя)
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", "2048"))
+IDENTITY_CACHE_TTL = int(os.getenv("IDENTITY_CACHE_TTL", "300"))
+
+# как часто сворачивать stock_movements в суточные итоги
+ROLLUP_INTERVAL_SECONDS = int(os.getenv("ROLLUP_INTERVAL_SECONDS", "300"))
+
+# очередь уведомлений: общий лимит Bot API и лимит на один чат
+NOTIFY_RATE = float(os.getenv("NOTIFY_RATE", "30"))
+NOTIFY_CHAT_INTERVAL = float(os.getenv("NOTIFY_CHAT_INTERVAL", "1"))
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "10000"))
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", "8"))
+
+# сводки списаний менеджерам: раз в N минут или по M событиям. По умолчанию 0 —
+# выключено, каждое списание отдельным сообщением. Буфер сводки только в памяти:
+# при остановке он досылается, при падении процесса — теряется
+WRITEOFF_DIGEST_MINUTES = int(os.getenv("WRITEOFF_DIGEST_MINUTES", "0"))
+WRITEOFF_DIGEST_MAX_EVENTS = int(os.getenv("WRITEOFF_DIGEST_MAX_EVENTS", "25"))
+WRITEOFF_URGENT_QTY = int(os.getenv("WRITEOFF_URGENT_QTY", "50"))
+
+# режим работы: polling (по умолчанию) или webhook (см. bot/webhook.py)
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+# без WEBHOOK_SECRET апдейт может подделать любой, кто достучится до порта,
+# поэтому без секрета сервер по умолчанию слушает только localhost, а с
+# WEBHOOK_URL или внешним адресом не запускается вовсе (см. webhook.check_secret)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0" if WEBHOOK_SECRET else "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # публичный адрес, напр. https://bot.example.com
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+
+# учёт SQL: запросы дольше SQL_SLOW_MS — в лог (без значений параметров);
+# запрос, повторённый за апдейт SQL_NPLUS1_MIN раз, помечается как N+1.
+# SQL_ECHO=1 — печатать все запросы (только для отладки)
+SQL_SLOW_MS = float(os.getenv("SQL_SLOW_MS", "200"))
+SQL_NPLUS1_MIN = int(os.getenv("SQL_NPLUS1_MIN", "10"))
+SQL_ECHO = os.getenv("SQL_ECHO", "0") == "1"
+
+# метрики Prometheus: METRICS_PORT > 0 — отдельный сервер с /metrics (в любом режиме);
+# слушает только localhost, если не указано иное
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+
+# как часто сохранять user_data и состояние диалогов в БД, секунд
+PERSISTENCE_INTERVAL = float(os.getenv("PERSISTENCE_INTERVAL", "10"))
+
+# сколько апдейтов разных пользователей обрабатывать одновременно (1 — по одному)
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "16"))
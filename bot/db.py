@@ -1,13 +1,178 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, scoped_session, sessionmaker
+import functools
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session as OrmSession, declarative_base, scoped_session, sessionmaker
+
+from bot import sqlstats
+from bot.config import (
+    DATABASE_READ_URL, DATABASE_URL, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_PROFILE,
+    DB_STATEMENT_TIMEOUT_MS, READ_YOUR_WRITES_SECONDS, SQL_ECHO, SQLITE_BUSY_TIMEOUT_MS, SQLITE_CACHE_MB, SQLITE_MMAP_MB,
+)
+
+# асинхронные драйверы для поддерживаемых бэкендов
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def async_url(url: str) -> str:
+    """sqlite:///… → sqlite+aiosqlite:///…, postgresql://… → postgresql+asyncpg://…"""
+    u = make_url(url)
+    backend = u.get_backend_name()
+    if backend in _ASYNC_DRIVERS and "+" not in u.drivername:
+        u = u.set(drivername=_ASYNC_DRIVERS[backend])
+    return u.render_as_string(hide_password=False)
 
-from bot.config import DATABASE_URL
 
 Base = declarative_base()
-engine = create_engine(DATABASE_URL, echo=True)
+
+
+# ── профили движка ──────────────────────────────────────────────────────────
+# tuned — под параллельную обработку апдейтов; plain — умолчания SQLAlchemy и
+# драйвера (для сравнения, см. bench/db_profiles.py)
+PROFILES = ("tuned", "plain")
+
+
+def _sqlite_connect(dbapi_conn, _record) -> None:
+    # апдейты обрабатываются параллельно: WAL не даёт длинному чтению (отчёту)
+    # блокировать запись, busy_timeout — подождать, а не упасть с «database is locked».
+    # synchronous=NORMAL в WAL не теряет целостность, fsync — только на checkpoint
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}")
+    cur.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}")  # отрицательное — в КиБ
+    cur.close()
+
+
+def _engine_options(url: str, profile: str) -> dict:
+    """Параметры create_engine для профиля: пул и таймауты запросов Postgres."""
+    if profile not in PROFILES:
+        raise ValueError(f"неизвестный DB_PROFILE: {profile!r} (есть: {', '.join(PROFILES)})")
+    u = make_url(url)
+    if profile == "plain" or u.get_backend_name() != "postgresql":
+        return {}
+
+    options = dict(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+    # statement_timeout — при подключении, а не SET: SET откатился бы вместе с транзакцией
+    if u.get_driver_name() == "asyncpg":
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+    elif u.get_driver_name() in ("psycopg2", "psycopg"):
+        options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+def create_engines(url: str = DATABASE_URL, profile: str = DB_PROFILE):
+    """(синхронный, асинхронный) движки для url с настройками профиля."""
+    sync_engine = create_engine(url, echo=SQL_ECHO, **_engine_options(url, profile))
+    aurl = async_url(url)
+    aengine = create_async_engine(aurl, echo=SQL_ECHO, **_engine_options(aurl, profile))
+
+    for e in (sync_engine, aengine.sync_engine):
+        # число запросов и время в БД на апдейт, медленные запросы (bot/sqlstats.py)
+        sqlstats.install(e)
+        if profile == "tuned" and e.dialect.name == "sqlite":
+            event.listen(e, "connect", _sqlite_connect)
+    return sync_engine, aengine
+
+
+# синхронный движок — только для init_db и служебных скриптов;
+# асинхронный — для хендлеров, чтобы не блокировать event loop
+engine, async_engine = create_engines()
 Session = scoped_session(sessionmaker(bind=engine))
 
 
+# ── реплика для чтения ──────────────────────────────────────────────────────
+# Хендлеры, помеченные @read_only, читают с DATABASE_READ_URL; всё остальное,
+# любая запись и чтение пользователя сразу после его собственной записи —
+# с основной базы. Без DATABASE_READ_URL это обычная сессия.
+
+# telegram id пользователя, чей апдейт обрабатывается (ставит bot.tracing)
+current_actor: ContextVar[Optional[int]] = ContextVar("db_actor", default=None)
+_read_only: ContextVar[bool] = ContextVar("db_read_only", default=False)
+_last_write: Dict[int, float] = {}  # actor → monotonic() последнего commit с записью
+routing = {"replica": 0, "sticky": 0}  # запросы @read_only-хендлеров: на реплику / на основную
+
+
+def read_only(func):
+    """Хендлер только читает — его запросы можно отдать реплике."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = _read_only.set(True)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _read_only.reset(token)
+    return wrapper
+
+
+class RoutingSession(OrmSession):
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or getattr(clause, "is_dml", False):
+            self.info["wrote"] = True
+            return async_engine.sync_engine
+        if not _read_only.get():
+            return async_engine.sync_engine
+        if time.monotonic() - _last_write.get(current_actor.get(), float("-inf")) < READ_YOUR_WRITES_SECONDS:
+            routing["sticky"] += 1
+            return async_engine.sync_engine
+        routing["replica"] += 1
+        return async_read_engine.sync_engine
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _remember_write(session) -> None:
+    if session.info.pop("wrote", False) and current_actor.get() is not None:
+        _last_write[current_actor.get()] = time.monotonic()
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_write(session) -> None:
+    session.info.pop("wrote", None)
+
+
+if DATABASE_READ_URL:
+    _, async_read_engine = create_engines(DATABASE_READ_URL)
+    async_session = async_sessionmaker(async_engine, expire_on_commit=False, sync_session_class=RoutingSession)
+else:
+    async_read_engine = async_engine
+    async_session = async_sessionmaker(async_engine, expire_on_commit=False)
+
+
+def alembic_config() -> Config:
+    cfg = Config()
+    cfg.set_main_option("script_location", os.path.join(os.path.dirname(__file__), "migrations"))
+    return cfg
+
+
 def init_db():
-    """Создаёт все таблицы в базе, если их ещё нет."""
-    Base.metadata.create_all(engine)
+    """Сверяет ревизию схемы с Alembic и накатывает недостающие миграции."""
+    cfg = alembic_config()
+    head = ScriptDirectory.from_config(cfg).get_current_head()
+
+    with engine.connect() as conn:
+        current = MigrationContext.configure(conn).get_current_revision()
+    if current == head:
+        return
+
+    with engine.begin() as conn:
+        cfg.attributes["connection"] = conn
+        command.upgrade(cfg, "head")
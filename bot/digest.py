@@ -0,0 +1,100 @@
+# bot/digest.py
+"""
+Сводки списаний для менеджеров.
+
+Вместо сообщения на каждое списание события копятся в буфере каждого
+менеджера и уходят одной сводкой (сотрудник → товар → кол-во, причины):
+по JobQueue раз в WRITEOFF_DIGEST_MINUTES или сразу, как накопится
+WRITEOFF_DIGEST_MAX_EVENTS. Крупное списание (от WRITEOFF_URGENT_QTY шт.)
+отправляется немедленно. Включается WRITEOFF_DIGEST_MINUTES > 0; по
+умолчанию (0) — по сообщению на каждое списание, как раньше.
+
+Буфер живёт только в памяти процесса. При штатной остановке main.py
+досылает его (flush() до остановки outbox); при падении или kill -9
+накопленные, но не отправленные события пропадут — в журнале (logs,
+stock_movements) они есть, теряется только уведомление.
+"""
+
+import html
+from collections import defaultdict
+from dataclasses import dataclass
+
+from bot.config import (
+    MANAGER_TELEGRAM_IDS, WRITEOFF_DIGEST_MAX_EVENTS, WRITEOFF_DIGEST_MINUTES, WRITEOFF_URGENT_QTY,
+)
+from bot.notify import outbox
+
+MAX_LINES = 60  # строк в одном сообщении сводки
+
+
+@dataclass
+class WriteoffEvent:
+    employee: str
+    product: str
+    qty: int
+    reason: str
+
+
+def _format(events) -> list:
+    grouped = defaultdict(lambda: defaultdict(lambda: [0, []]))
+    for ev in events:
+        item = grouped[ev.employee][ev.product]
+        item[0] += ev.qty
+        if ev.reason and ev.reason not in item[1]:
+            item[1].append(ev.reason)
+
+    lines = [f"🔔 <b>Списания</b> ({len(events)}):"]
+    for employee in sorted(grouped):
+        lines.append(f"\n<b>{html.escape(employee)}</b>")
+        for product, (qty, reasons) in sorted(grouped[employee].items()):
+            why = f" — {html.escape('; '.join(reasons))}" if reasons else ""
+            lines.append(f" • <i>{html.escape(product)}</i>: {qty} шт.{why}")
+    return ["\n".join(lines[i:i + MAX_LINES]) for i in range(0, len(lines), MAX_LINES)]
+
+
+class WriteoffDigest:
+    def __init__(self, managers=MANAGER_TELEGRAM_IDS, minutes=WRITEOFF_DIGEST_MINUTES,
+                 max_events=WRITEOFF_DIGEST_MAX_EVENTS, urgent_qty=WRITEOFF_URGENT_QTY):
+        self.managers = managers
+        self.minutes = minutes
+        self.max_events = max_events
+        self.urgent_qty = urgent_qty
+        self.buffers = defaultdict(list)  # manager_id → [WriteoffEvent]
+
+    @property
+    def enabled(self) -> bool:
+        return self.minutes > 0
+
+    def add(self, employee: str, product: str, qty: int, reason: str) -> None:
+        """Учесть списание: в буфер или (если срочно/режим выключен) сразу."""
+        if not self.enabled or (self.urgent_qty and qty >= self.urgent_qty):
+            prefix = "🚨" if self.enabled else "🔔"
+            outbox.broadcast(
+                self.managers,
+                f"{prefix} <b>{html.escape(employee)}</b> списал {qty} шт. <i>{html.escape(product)}</i>.\n"
+                f"Причина: {html.escape(reason)}",
+                parse_mode="HTML",
+            )
+            return
+
+        event = WriteoffEvent(employee, product, qty, reason)
+        for mgr_id in self.managers:
+            buf = self.buffers[mgr_id]
+            buf.append(event)
+            if len(buf) >= self.max_events:
+                self.flush(mgr_id)
+
+    def flush(self, mgr_id=None) -> None:
+        """Отправить накопленное одному менеджеру (или всем)."""
+        for mid in ([mgr_id] if mgr_id is not None else list(self.buffers)):
+            events = self.buffers.pop(mid, None)
+            if events:
+                for text in _format(events):
+                    outbox.send(mid, text, parse_mode="HTML")
+
+    async def job(self, context) -> None:
+        """Периодическая задача JobQueue."""
+        self.flush()
+
+
+writeoff_digest = WriteoffDigest()
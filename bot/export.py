@@ -0,0 +1,124 @@
+# bot/export.py
+"""
+Выгрузка журнала в файл без загрузки всего периода в память.
+
+Строки читаются из БД порциями (yield_per) и сразу пишутся во временный
+файл: CSV сжимается gzip'ом на лету, XLSX пишется xlsxwriter'ом в режиме
+constant_memory. Запись порции уходит в поток, чтобы не держать event loop.
+В листе Excel не больше 1 048 576 строк — дальше XLSX продолжается на
+следующем листе («Журнал (2)» и т.д.), строки не теряются.
+xlsxwriter — необязательная зависимость: без него доступен только CSV.
+"""
+
+import asyncio
+import csv
+import gzip
+import io
+import os
+import tempfile
+
+from sqlalchemy import select
+
+from bot.models import Log
+
+try:
+    import xlsxwriter
+except ImportError:  # pragma: no cover
+    xlsxwriter = None
+
+BATCH = 5000
+HEADER = ("Дата", "Действие", "Пользователь", "Описание")
+FORMATS = ("csv", "xlsx") if xlsxwriter else ("csv",)
+
+
+def log_rows(start, end):
+    """Запрос строк журнала за период (в порядке времени)."""
+    return (
+        select(Log.timestamp, Log.action, Log.user_id, Log.info)
+        .filter(Log.timestamp.between(start, end))
+        .order_by(Log.timestamp)
+        .execution_options(yield_per=BATCH)
+    )
+
+
+class _CsvGz:
+    suffix = ".csv.gz"
+
+    def __init__(self, path):
+        self._raw = gzip.open(path, "wb", compresslevel=6)
+        self._text = io.TextIOWrapper(self._raw, encoding="utf-8-sig", newline="")
+        self._csv = csv.writer(self._text)
+        self._csv.writerow(HEADER)
+
+    def write(self, rows):
+        self._csv.writerows(
+            (ts.strftime("%Y-%m-%d %H:%M:%S"), action, user_id, info) for ts, action, user_id, info in rows
+        )
+
+    def close(self):
+        self._text.close()
+
+
+class _Xlsx:
+    suffix = ".xlsx"
+    rows_per_sheet = 1_048_576 - 1  # предел Excel минус строка заголовка
+
+    def __init__(self, path):
+        self._wb = xlsxwriter.Workbook(path, {"constant_memory": True, "tmpdir": tempfile.gettempdir()})
+        self._date = self._wb.add_format({"num_format": "yyyy-mm-dd hh:mm"})
+        self._sheets = 0
+        self._add_sheet()
+
+    def _add_sheet(self):
+        self._sheets += 1
+        name = "Журнал" if self._sheets == 1 else f"Журнал ({self._sheets})"
+        self._ws = ws = self._wb.add_worksheet(name)
+        ws.set_column(0, 0, 17)
+        ws.set_column(1, 2, 14)
+        ws.set_column(3, 3, 80)
+        ws.write_row(0, 0, HEADER)
+        self._row = 1
+
+    def write(self, rows):
+        ws, r = self._ws, self._row
+        for ts, action, user_id, info in rows:
+            if r > self.rows_per_sheet:
+                self._add_sheet()
+                ws, r = self._ws, self._row
+            ws.write_datetime(r, 0, ts, self._date)
+            ws.write_string(r, 1, action or "")
+            ws.write_string(r, 2, user_id or "")
+            ws.write_string(r, 3, info or "")
+            r += 1
+        self._row = r
+
+    def close(self):
+        self._wb.close()
+
+
+_WRITERS = {"csv": _CsvGz, "xlsx": _Xlsx}
+
+
+async def export_logs(session, start, end, fmt: str = "csv"):
+    """
+    Выгрузить журнал за период во временный файл.
+    Возвращает (путь, число строк); файл удаляет вызывающий.
+    """
+    cls = _WRITERS[fmt]
+    fd, path = tempfile.mkstemp(prefix="report_", suffix=cls.suffix)
+    os.close(fd)
+
+    count = 0
+    try:
+        writer = await asyncio.to_thread(cls, path)
+        try:
+            result = await session.stream(log_rows(start, end))
+            async for rows in result.partitions():
+                await asyncio.to_thread(writer.write, rows)
+                count += len(rows)
+        finally:
+            await asyncio.to_thread(writer.close)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, count
@@ -1,3 +1,4 @@
+from sqlalchemy import delete, select
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     ContextTypes,
@@ -5,41 +6,40 @@ from telegram.ext import (
     CallbackQueryHandler,
 )
 
-from bot.db import Session
-from bot.keyboards import home_kb
-from bot.models import Product, Stock, Log
+from bot.catalog import catalog
+from bot.db import async_session
+from bot.keyboards import home_kb, CatalogPicker
+from bot.models import Product, Stock, Log, StockMovement
 
 SELECT_PRODUCT = 0
 
+# удалить можно только товар без остатков
+products_picker = CatalogPicker(
+    "delete_product",
+    allowed=lambda ctx: select(Product.id).filter(
+        Product.id.notin_(select(Stock.product_id).filter(Stock.quantity > 0))
+    ),
+    search=None,
+)
+
 
 async def delete_product_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     try:
         query = update.callback_query
         await query.answer()
 
-        session = Session()
-        subquery = session.query(Stock.product_id).distinct()
-        products = (
-            session.query(Product)
-            .filter(Product.id.notin_(subquery))
-            .order_by(Product.name)
-            .all()
-        )
-        session.close()
+        async with async_session() as session:
+            markup = await products_picker.keyboard(session, context)
 
-        if not products:
+        if markup is None:
             await query.edit_message_text(
                 "❗ Нет товаров, доступных для удаления.",
                 reply_markup=home_kb()
             )
             return ConversationHandler.END
 
-        keyboard = [
-            [InlineKeyboardButton(p.name, callback_data=str(p.id))] for p in products
-        ]
-        full_kb = InlineKeyboardMarkup(keyboard + list(home_kb().inline_keyboard))
         await query.edit_message_text(
-            "🗑️ Выберите товар для удаления:", reply_markup=full_kb
+            "🗑️ Выберите товар для удаления:", reply_markup=markup
         )
         return SELECT_PRODUCT
 
@@ -62,20 +62,41 @@ async def confirm_delete(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
         pid = int(query.data)
 
-        session = Session()
-        product = session.get(Product, pid)
-        name = product.name
-        session.delete(product)
-
-        log = Log(
-            action="delete_product",
-            user_id=str(update.effective_user.id),
-            info=f"Удалён товар: {name}"
-        )
-        session.add(log)
+        async with async_session() as session:
+            product = await session.get(Product, pid)
+            if product is None:
+                await query.edit_message_text("❗ Товар уже удалён.", reply_markup=home_kb())
+                return ConversationHandler.END
+            name = product.name
+
+            # список мог устареть (приход после показа, диалог из сохранённого состояния):
+            # убираем только обнулённые строки, а при живом остатке — откат
+            await session.execute(delete(Stock).where(Stock.product_id == pid, Stock.quantity == 0))
+            left = await session.scalar(
+                select(Stock.id).where(Stock.product_id == pid, Stock.quantity != 0).limit(1)
+            )
+            if left is not None:
+                await session.rollback()
+                await query.edit_message_text(
+                    f"⛔ У товара '{name}' есть остатки — удалить его нельзя.", reply_markup=home_kb()
+                )
+                return ConversationHandler.END
+            await session.delete(product)
+
+            log = Log(
+                action="delete_product",
+                user_id=str(update.effective_user.id),
+                info=f"Удалён товар: {name}"
+            )
+            session.add(log)
+            session.add(StockMovement(
+                kind="delete_product",
+                product_id=pid,
+                actor=str(update.effective_user.id),
+            ))
 
-        session.commit()
-        session.close()
+            await session.commit()
+        catalog.bump()
 
         await query.edit_message_text(f"✅ Товар '{name}' удалён.")
 
@@ -97,9 +118,14 @@ async def confirm_delete(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 def get_handler() -> ConversationHandler:
     return ConversationHandler(
+        name="delete_product",
+        persistent=True,
         entry_points=[CallbackQueryHandler(delete_product_start, pattern="^delete_product$")],
         states={
-            SELECT_PRODUCT: [CallbackQueryHandler(confirm_delete, pattern=r"^\d+$")],
+            SELECT_PRODUCT: [
+                products_picker.nav_handler(),
+                CallbackQueryHandler(confirm_delete, pattern=r"^\d+$"),
+            ],
         },
         fallbacks=[],
     )
@@ -0,0 +1,62 @@
+# bot/handlers/inline_search.py
+"""
+Inline-режим: «@бот кабель» в любом чате — товары с остатком на складе,
+а менеджерам ещё и сотрудники. Нужно включить /setinline у BotFather.
+"""
+
+from sqlalchemy import and_, select
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
+from telegram.ext import ContextTypes, InlineQueryHandler
+
+from bot.db import async_session
+from bot.identity import resolve
+from bot.models import Product, Stock
+from bot.search import matches, search_employees
+
+INLINE_LIMIT = 20
+
+
+async def inline_search(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
+    iq = update.inline_query
+    text = (iq.query or "").strip()
+    if not text:
+        await iq.answer([], cache_time=0, is_personal=True)
+        return
+
+    user = await resolve(iq.from_user.id)
+    if not user:
+        await iq.answer([], cache_time=0, is_personal=True)
+        return
+
+    async with async_session() as session:
+        products = (await session.execute(
+            select(Product.id, Product.name, Stock.quantity)
+            .outerjoin(Stock, and_(Stock.product_id == Product.id, Stock.user_id.is_(None)))
+            .where(matches(Product, text))
+            .order_by(Product.name)
+            .limit(INLINE_LIMIT)
+        )).all()
+        employees = await search_employees(session, text, INLINE_LIMIT) if user.role == "manager" else []
+
+    results = [
+        InlineQueryResultArticle(
+            id=f"p{pid}",
+            title=name,
+            description=f"На складе: {qty or 0} шт.",
+            input_message_content=InputTextMessageContent(f"📦 {name}: на складе {qty or 0} шт."),
+        )
+        for pid, name, qty in products
+    ]
+    results += [
+        InlineQueryResultArticle(
+            id=f"u{uid}",
+            title=f"👤 {full_name}",
+            input_message_content=InputTextMessageContent(f"👤 {full_name}"),
+        )
+        for uid, full_name in employees
+    ]
+    await iq.answer(results[:50], cache_time=5, is_personal=True)
+
+
+def get_handler() -> InlineQueryHandler:
+    return InlineQueryHandler(inline_search)
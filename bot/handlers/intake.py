@@ -0,0 +1,161 @@
+# bot/handlers/intake.py
+"""
+Приход из файла: менеджер присылает CSV/XLSX «название;количество»,
+бот проводит все строки разом и отвечает одной сводкой (см. bot/intake.py).
+"""
+
+import html
+import os
+import tempfile
+
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import (
+    ContextTypes, ConversationHandler, CallbackQueryHandler, MessageHandler, filters
+)
+
+from bot.db import async_session
+from bot.handlers.stock import back_to_menu
+from bot.identity import resolve
+from bot.intake import FORMATS, apply_intake
+from bot.keyboards import home_kb
+
+WAIT_FILE = 0
+
+MAX_FILE_SIZE = 20 * 1024 * 1024  # больше Bot API скачать не даёт
+MAX_LISTED = 30  # строк в каждом списке сводки — чтобы уложиться в 4096 символов
+
+_HELP = (
+    "📥 <b>Приход из файла</b>\n\n"
+    "Пришлите CSV или Excel: в каждой строке название товара и количество, например\n"
+    "<code>Перчатки нитриловые;200\nСкотч 48 мм;35</code>\n\n"
+    "Если в первой строке заголовок <code>id;qty</code> — товары ищутся по id.\n"
+    "Форматы: {formats}."
+)
+
+
+def _kb(create: bool) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(
+            f"🆕 Создавать новые товары: {'да' if create else 'нет'}", callback_data="intake:create"
+        )],
+        [InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")],
+    ])
+
+
+def _help_text() -> str:
+    return _HELP.format(formats=", ".join(FORMATS))
+
+
+async def intake_start(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
+    try:
+        query = update.callback_query
+        await query.answer()
+
+        user = await resolve(query.from_user.id)
+        if not user or user.role != "manager":
+            await query.edit_message_text("⛔ Только для менеджеров.", reply_markup=home_kb())
+            return ConversationHandler.END
+
+        ctx.user_data.clear()
+        ctx.user_data["intake_create"] = False
+        await query.edit_message_text(_help_text(), parse_mode="HTML", reply_markup=_kb(False))
+        return WAIT_FILE
+
+    except Exception as e:
+        print("‼️ ОШИБКА В intake_start:", e)
+        await update.effective_chat.send_message("❌ Ошибка при открытии прихода.", reply_markup=home_kb())
+        return ConversationHandler.END
+
+
+async def toggle_create(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    await query.answer()
+    create = ctx.user_data["intake_create"] = not ctx.user_data.get("intake_create", False)
+    await query.edit_message_reply_markup(reply_markup=_kb(create))
+    return WAIT_FILE
+
+
+def _summary(result) -> str:
+    lines = [
+        f"✅ Пополнено позиций: {len(result.applied)}, всего +{result.total_qty} шт."
+        if result.applied else "❗ Ничего не проведено."
+    ]
+    for name, qty, total in result.applied[:MAX_LISTED]:
+        lines.append(f"• {html.escape(name)}: +{qty} (итого {total})")
+    if len(result.applied) > MAX_LISTED:
+        lines.append(f"… и ещё {len(result.applied) - MAX_LISTED}")
+
+    if result.created:
+        lines += ["", f"🆕 Создано товаров: {len(result.created)}"]
+        lines += [f"• {html.escape(name)}" for name in result.created[:MAX_LISTED]]
+        if len(result.created) > MAX_LISTED:
+            lines.append(f"… и ещё {len(result.created) - MAX_LISTED}")
+
+    if result.rejected:
+        lines += ["", f"⚠️ Отклонено строк: {len(result.rejected)}"]
+        for n, key, reason in result.rejected[:MAX_LISTED]:
+            lines.append(f"• стр. {n}: «{html.escape(key)}» — {reason}")
+        if len(result.rejected) > MAX_LISTED:
+            lines.append(f"… и ещё {len(result.rejected) - MAX_LISTED}")
+    return "\n".join(lines)
+
+
+async def receive_file(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
+    doc = update.message.document
+    suffix = os.path.splitext(doc.file_name or "")[1].lower()
+    if suffix not in FORMATS:
+        await update.message.reply_text(f"❗ Нужен файл {', '.join(FORMATS)}.")
+        return WAIT_FILE
+    if doc.file_size and doc.file_size > MAX_FILE_SIZE:
+        await update.message.reply_text("❗ Файл больше 20 МБ — разбейте его на части.")
+        return WAIT_FILE
+
+    fd, path = tempfile.mkstemp(prefix="intake_", suffix=suffix)
+    os.close(fd)
+    try:
+        await update.message.reply_text("⏳ Обрабатываю файл…")
+        tg_file = await doc.get_file()
+        await tg_file.download_to_drive(path)
+
+        async with async_session() as session:
+            result = await apply_intake(
+                session, path, suffix,
+                actor=str(update.effective_user.id),
+                create_missing=ctx.user_data.get("intake_create", False),
+            )
+
+        kb = InlineKeyboardMarkup([
+            [InlineKeyboardButton("📥 Ещё файл", callback_data="bulk_intake"),
+             InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")],
+        ])
+        await update.message.reply_text(_summary(result), parse_mode="HTML", reply_markup=kb)
+        return ConversationHandler.END
+
+    except Exception as e:
+        print("‼️ ОШИБКА В receive_file:", e)
+        await update.message.reply_text("❌ Ошибка при обработке файла — ничего не проведено.", reply_markup=home_kb())
+        return ConversationHandler.END
+    finally:
+        os.remove(path)
+
+
+async def expect_file(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
+    await update.message.reply_text("📎 Пришлите файл документом (не фото и не текстом).")
+    return WAIT_FILE
+
+
+def get_handler() -> ConversationHandler:
+    return ConversationHandler(
+        name="bulk_intake",
+        persistent=True,
+        entry_points=[CallbackQueryHandler(intake_start, pattern="^bulk_intake$")],
+        states={
+            WAIT_FILE: [
+                CallbackQueryHandler(toggle_create, pattern="^intake:create$"),
+                MessageHandler(filters.Document.ALL, receive_file),
+                MessageHandler(~filters.COMMAND, expect_file),
+            ],
+        },
+        fallbacks=[CallbackQueryHandler(back_to_menu, pattern="^main_menu$")],
+        allow_reentry=True,
+    )
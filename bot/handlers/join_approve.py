@@ -1,32 +1,35 @@
 # bot/handlers/join_approve.py
+from sqlalchemy import select
 from telegram import Update
 from telegram.ext import CallbackQueryHandler, ContextTypes
-from bot.db import Session
+from bot.db import async_session
+from bot.identity import identities
 from bot.models import JoinRequest, User
 
 async def handle_join(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query; await q.answer()
     action, tg_id = q.data.split(":", 1)
 
-    session = Session()
-    req = session.query(JoinRequest).filter_by(telegram_id=tg_id).one_or_none()
-
-    if not req:
-        await q.edit_message_text("⛔ Заявка уже обработана.")
-        session.close()
-        return
-
-    if action == "join_ok":
-        session.add(User(telegram_id=tg_id, full_name=req.full_name, role="employee"))
-        txt_admin = "✅ Доступ выдан."
-        txt_user  = "🎉 Доступ к боту открыт! Введите /start."
-    else:
-        txt_admin = "❌ Заявка отклонена."
-        txt_user  = "😔 Администратор отклонил заявку."
-
-    session.delete(req)
-    session.commit()
-    session.close()
+    async with async_session() as session:
+        req = await session.scalar(select(JoinRequest).filter_by(telegram_id=tg_id))
+
+        if not req:
+            await q.edit_message_text("⛔ Заявка уже обработана.")
+            return
+
+        if action == "join_ok":
+            session.add(User(telegram_id=tg_id, full_name=req.full_name, role="employee"))
+            txt_admin = "✅ Доступ выдан."
+            txt_user  = "🎉 Доступ к боту открыт! Введите /start."
+        else:
+            txt_admin = "❌ Заявка отклонена."
+            txt_user  = "😔 Администратор отклонил заявку."
+
+        await session.delete(req)
+        await session.commit()
+
+    # в кеше могло остаться «не зарегистрирован»
+    identities.invalidate(tg_id)
 
     await q.edit_message_text(txt_admin)
     try:
@@ -7,9 +7,10 @@ from telegram.ext import (
     filters,
 )
 
-from bot.db import Session
+from bot.catalog import catalog
+from bot.db import async_session
 from bot.keyboards import home_kb
-from bot.models import Product, Log
+from bot.models import Product, Log, StockMovement
 
 ENTER_NAME = 0
 
@@ -29,49 +30,56 @@ async def add_product_start(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 
 async def add_product_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    session = Session()
-    try:
-        name = update.message.text.strip()
-        product = Product(name=name)
-        session.add(product)
+    async with async_session() as session:
+        try:
+            name = update.message.text.strip()
+            product = Product(name=name)
+            session.add(product)
 
-        log = Log(
-            action="add_product",
-            user_id=str(update.effective_user.id),
-            info=f"Добавлен товар: {name}"
-        )
-        session.add(log)
+            log = Log(
+                action="add_product",
+                user_id=str(update.effective_user.id),
+                info=f"Добавлен товар: {name}"
+            )
+            session.add(log)
 
-        session.commit()
+            await session.flush()  # нужен product.id для журнала движения
+            session.add(StockMovement(
+                kind="add_product",
+                product_id=product.id,
+                actor=str(update.effective_user.id),
+            ))
 
-        await update.message.reply_text(f"✅ Товар «{name}» добавлен!", reply_markup=home_kb())
+            await session.commit()
+            catalog.bump()
 
-        keyboard = [
-            [
-                InlineKeyboardButton("🆕 Добавить ещё", callback_data="add_product"),
-                InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu"),
-            ]
-        ]
-        await update.message.reply_text(
-            "Что дальше?", reply_markup=InlineKeyboardMarkup(keyboard)
-        )
+            await update.message.reply_text(f"✅ Товар «{name}» добавлен!", reply_markup=home_kb())
 
-    except Exception as e:
-        session.rollback()
-        print("‼️ ОШИБКА В add_product_name:", e)
-        if update.message:
-            await update.message.reply_text("❌ Ошибка при добавлении товара.", reply_markup=home_kb())
-        else:
-            await update.effective_chat.send_message("❌ Ошибка при добавлении товара.", reply_markup=home_kb())
+            keyboard = [
+                [
+                    InlineKeyboardButton("🆕 Добавить ещё", callback_data="add_product"),
+                    InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu"),
+                ]
+            ]
+            await update.message.reply_text(
+                "Что дальше?", reply_markup=InlineKeyboardMarkup(keyboard)
+            )
 
-    finally:
-        session.close()
+        except Exception as e:
+            await session.rollback()
+            print("‼️ ОШИБКА В add_product_name:", e)
+            if update.message:
+                await update.message.reply_text("❌ Ошибка при добавлении товара.", reply_markup=home_kb())
+            else:
+                await update.effective_chat.send_message("❌ Ошибка при добавлении товара.", reply_markup=home_kb())
 
     return ConversationHandler.END
 
 
 def get_handler() -> ConversationHandler:
     return ConversationHandler(
+        name="add_product",
+        persistent=True,
         entry_points=[CallbackQueryHandler(add_product_start, pattern="^add_product$")],
         states={
             ENTER_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_product_name)]
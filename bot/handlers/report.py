@@ -1,17 +1,31 @@
 import html
+import os
 from datetime import datetime, timedelta
 
+from sqlalchemy import select
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     CallbackQueryHandler, ConversationHandler, MessageHandler,
     ContextTypes, filters
 )
 
-from bot.db import Session
+from bot.catalog import catalog
+from bot.db import async_session, read_only
 from bot.models import Log
+from bot.export import FORMATS, export_logs
 from bot.keyboards import home_kb
+from bot.rollup import period_totals
 
-CHOOSE_PERIOD, ASK_DAYS = range(2)
+CHOOSE_PERIOD, ASK_DAYS, CHOOSE_FORMAT = range(3)
+
+_SUMMARY_TITLES = {
+    "add_stock": "➕ Пополнено",
+    "transfer_stock": "📦 Передано",
+    "writeoff": "🗑️ Списано",
+    "add_product": "🆕 Новых товаров",
+    "delete_product": "❌ Удалено товаров",
+}
+_SUMMARY_COLUMNS = ("add_stock", "transfer_stock", "writeoff")
 
 
 def _build_period_kb():
@@ -24,6 +38,26 @@ def _build_period_kb():
     return InlineKeyboardMarkup(kb)
 
 
+def _build_format_kb():
+    files = [InlineKeyboardButton("📎 CSV (.gz)", callback_data="fmt:csv")]
+    if "xlsx" in FORMATS:
+        files.append(InlineKeyboardButton("📊 Excel", callback_data="fmt:xlsx"))
+    kb = [
+        [InlineKeyboardButton("📈 Сводка", callback_data="fmt:summary"),
+         InlineKeyboardButton("💬 Сообщениями в чат", callback_data="fmt:chat")],
+        files,
+        [InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")]
+    ]
+    return InlineKeyboardMarkup(kb)
+
+
+def _next_kb():
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("📄 Новый отчёт", callback_data="report")],
+        [InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")],
+    ])
+
+
 async def start_report(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     try:
         await update.callback_query.answer()
@@ -41,13 +75,11 @@ async def choose_period(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         choice = update.callback_query.data
         now = datetime.now()
 
-        if choice == "week":
-            start = now - timedelta(days=7)
-            return await _generate_and_send_report(update, context, start, now)
-
-        if choice == "month":
-            start = now - timedelta(days=30)
-            return await _generate_and_send_report(update, context, start, now)
+        if choice in ("week", "month"):
+            start = now - timedelta(days=7 if choice == "week" else 30)
+            context.user_data["report_period"] = (start, now)
+            await update.callback_query.edit_message_text("📄 Как выдать отчёт?", reply_markup=_build_format_kb())
+            return CHOOSE_FORMAT
 
         if choice == "manual":
             await update.callback_query.edit_message_text("⌨ Введите количество дней в прошлое (1-365):")
@@ -67,8 +99,9 @@ async def ask_days(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         if days <= 0 or days > 365:
             raise ValueError
         now = datetime.now()
-        start = now - timedelta(days=days)
-        return await _generate_and_send_report(update, context, start, now)
+        context.user_data["report_period"] = (now - timedelta(days=days), now)
+        await update.message.reply_text("📄 Как выдать отчёт?", reply_markup=_build_format_kb())
+        return CHOOSE_FORMAT
 
     except ValueError:
         await update.message.reply_text("❌ Введите целое число от 1 до 365.")
@@ -78,11 +111,128 @@ async def ask_days(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         await update.effective_chat.send_message("❌ Ошибка при вводе периода.", reply_markup=home_kb())
         return ConversationHandler.END
 
+
+async def choose_format(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    try:
+        await update.callback_query.answer()
+        fmt = update.callback_query.data.split(":", 1)[1]
+        start, end = context.user_data.pop("report_period")
+
+        if fmt == "summary":
+            return await _send_summary(update, context, start, end)
+        if fmt == "chat":
+            return await _generate_and_send_report(update, context, start, end)
+        return await _send_report_file(update, context, start, end, fmt)
+
+    except Exception as e:
+        print("‼️ ОШИБКА В choose_format:", e)
+        await update.effective_chat.send_message("❌ Ошибка при выборе формата.", reply_markup=home_kb())
+        return ConversationHandler.END
+
+
+async def _send_summary(update: Update, context: ContextTypes.DEFAULT_TYPE, start: datetime, end: datetime) -> int:
+    try:
+        # итоги посуточные: N последних календарных дней, включая сегодня — [since, until)
+        until = end.date() + timedelta(days=1)
+        since = until - (end.date() - start.date())
+        async with async_session() as session:
+            rows = await period_totals(session, since, until)
+            await catalog.ensure(session)
+
+        if not rows:
+            await update.callback_query.edit_message_text(
+                "📄 За указанный период действий не найдено.", reply_markup=home_kb()
+            )
+            return ConversationHandler.END
+
+        totals, by_product = {}, {}
+        for kind, pid, events, qty in rows:
+            ev, q = totals.get(kind, (0, 0))
+            totals[kind] = (ev + events, q + qty)
+            if kind in _SUMMARY_COLUMNS:
+                name = catalog.name(pid) or f"#{pid}"
+                by_product.setdefault(name, dict.fromkeys(_SUMMARY_COLUMNS, 0))[kind] += qty
+
+        lines = [f"📈 <b>Сводка {since:%d.%m.%Y} – {end:%d.%m.%Y}</b>", ""]
+        for kind, title in _SUMMARY_TITLES.items():
+            if kind in totals:
+                events, qty = totals[kind]
+                lines.append(f"{title}: {events} опер., {qty} шт." if kind in _SUMMARY_COLUMNS else f"{title}: {events}")
+        if by_product:
+            lines += ["", "<b>По товарам</b> (пополнено / передано / списано):"]
+            for name in sorted(by_product):
+                cols = by_product[name]
+                lines.append(f"• {html.escape(name)}: " + " / ".join(str(cols[k]) for k in _SUMMARY_COLUMNS))
+
+        for i in range(0, len(lines), 60):
+            await context.bot.send_message(
+                chat_id=update.effective_chat.id,
+                text="\n".join(lines[i:i + 60]),
+                parse_mode="HTML"
+            )
+        await context.bot.send_message(chat_id=update.effective_chat.id, text="Что дальше?", reply_markup=_next_kb())
+        return ConversationHandler.END
+
+    except Exception as e:
+        print("‼️ ОШИБКА В _send_summary:", e)
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="❌ Ошибка при формировании сводки.",
+            reply_markup=home_kb()
+        )
+        return ConversationHandler.END
+
+
+@read_only
+async def _send_report_file(update: Update, context: ContextTypes.DEFAULT_TYPE, start: datetime, end: datetime, fmt: str) -> int:
+    path = None
+    try:
+        await update.callback_query.edit_message_text("⏳ Готовлю файл…")
+        async with async_session() as session:
+            path, count = await export_logs(session, start, end, fmt)
+
+        if not count:
+            await context.bot.send_message(
+                chat_id=update.effective_chat.id,
+                text="📄 За указанный период действий не найдено.",
+                reply_markup=home_kb()
+            )
+            return ConversationHandler.END
+
+        suffix = ".csv.gz" if fmt == "csv" else ".xlsx"
+        filename = f"report_{start:%Y%m%d}-{end:%Y%m%d}{suffix}"
+        with open(path, "rb") as f:
+            await context.bot.send_document(
+                chat_id=update.effective_chat.id,
+                document=f,
+                filename=filename,
+                caption=f"📄 Отчёт {start:%d.%m.%Y} – {end:%d.%m.%Y}: {count} записей",
+                read_timeout=120,
+                write_timeout=120,
+            )
+        await context.bot.send_message(chat_id=update.effective_chat.id, text="Что дальше?", reply_markup=_next_kb())
+        return ConversationHandler.END
+
+    except Exception as e:
+        print("‼️ ОШИБКА В _send_report_file:", e)
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="❌ Ошибка при выгрузке отчёта.",
+            reply_markup=home_kb()
+        )
+        return ConversationHandler.END
+    finally:
+        if path:
+            os.remove(path)
+
+
+@read_only
 async def _generate_and_send_report(update: Update, context: ContextTypes.DEFAULT_TYPE, start: datetime, end: datetime) -> int:
     try:
-        session = Session()
-        rows = session.query(Log).filter(Log.timestamp.between(start, end)).order_by(Log.timestamp).all()
-        session.close()
+        async with async_session() as session:
+            rows = (await session.scalars(
+                select(Log).filter(Log.timestamp.between(start, end)).order_by(Log.timestamp)
+            )).all()
 
         if not rows:
             await context.bot.send_message(
@@ -106,11 +256,7 @@ async def _generate_and_send_report(update: Update, context: ContextTypes.DEFAUL
                 parse_mode="HTML"
             )
 
-        keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton("📄 Новый отчёт", callback_data="report")],
-            [InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")],
-        ])
-        await context.bot.send_message(chat_id=update.effective_chat.id, text="Что дальше?", reply_markup=keyboard)
+        await context.bot.send_message(chat_id=update.effective_chat.id, text="Что дальше?", reply_markup=_next_kb())
 
         return ConversationHandler.END
 
@@ -126,10 +272,13 @@ async def _generate_and_send_report(update: Update, context: ContextTypes.DEFAUL
 
 def get_handler() -> ConversationHandler:
     return ConversationHandler(
+        name="report",
+        persistent=True,
         entry_points=[CallbackQueryHandler(start_report, pattern="^report$")],
         states={
             CHOOSE_PERIOD: [CallbackQueryHandler(choose_period, pattern="^(week|month|manual)$")],
             ASK_DAYS: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_days)],
+            CHOOSE_FORMAT: [CallbackQueryHandler(choose_format, pattern="^fmt:(summary|chat|csv|xlsx)$")],
         },
         fallbacks=[]
     )
\ No newline at end of file
@@ -3,6 +3,7 @@
 Главное меню
 """
 
+from sqlalchemy import select
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import (
     ContextTypes,
@@ -13,8 +14,10 @@ from telegram.ext import (
 
 from bot.config import MANAGER_TELEGRAM_IDS
 from bot.keyboards import main_menu_markup
-from bot.db import Session
-from bot.models import User, JoinRequest
+from bot.db import async_session
+from bot.identity import resolve
+from bot.models import JoinRequest
+from bot.notify import outbox
 
 
 def get_handler() -> CallbackQueryHandler:
@@ -31,48 +34,43 @@ async def start(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
     tg_id = str(update.effective_user.id)
     full  = update.effective_user.full_name or "No name"
 
-    session = Session()
-    user = session.query(User).filter_by(telegram_id=tg_id).one_or_none()
-    req  = session.query(JoinRequest).filter_by(telegram_id=tg_id).one_or_none()
+    user = await resolve(tg_id)
 
     # ── 1. есть аккаунт → обычный запуск ──────────────────────────────
     if user:
         kb = main_menu_markup(user.role)
         await (update.message or update.callback_query.message).reply_text("🏠 Главное меню", reply_markup=kb)
-        session.close()
         return ConversationHandler.END
 
+    async with async_session() as session:
+        req = await session.scalar(select(JoinRequest).filter_by(telegram_id=tg_id))
+
+        # ── 3. новый человек → записываем запрос и шлём админу ────────
+        if not req:
+            session.add(JoinRequest(telegram_id=tg_id, full_name=full))
+            await session.commit()
+
     # ── 2. уже подал заявку → напоминалка ─────────────────────────────
     if req:
         await update.effective_chat.send_message("⌛ Ваша заявка ещё не рассмотрена.")
-        session.close()
         return ConversationHandler.END
 
-    # ── 3. новый человек → записываем запрос и шлём админу ────────────
-    session.add(JoinRequest(telegram_id=tg_id, full_name=full))
-    session.commit()
-    session.close()
-
     await update.effective_chat.send_message(
         "👋 Привет! Доступ к боту выдаёт администратор. "
         "Я отправил заявку — ожидайте подтверждения."
     )
 
-    # ► всем администраторам
-    for admin_id in MANAGER_TELEGRAM_IDS:
-        try:
-            await ctx.bot.send_message(
-                admin_id,
-                f"🆕 <b>{full}</b> (<code>{tg_id}</code>) просит доступ.",
-                parse_mode="HTML",
-                reply_markup=InlineKeyboardMarkup([
-                    [
-                        InlineKeyboardButton("✅ Одобрить", callback_data=f"join_ok:{tg_id}"),
-                        InlineKeyboardButton("❌ Отклонить", callback_data=f"join_no:{tg_id}"),
-                    ]
-                ])
-            )
-        except Exception:
-            pass
+    # ► всем администраторам (доставит outbox в фоне)
+    outbox.broadcast(
+        MANAGER_TELEGRAM_IDS,
+        f"🆕 <b>{full}</b> (<code>{tg_id}</code>) просит доступ.",
+        parse_mode="HTML",
+        reply_markup=InlineKeyboardMarkup([
+            [
+                InlineKeyboardButton("✅ Одобрить", callback_data=f"join_ok:{tg_id}"),
+                InlineKeyboardButton("❌ Отклонить", callback_data=f"join_no:{tg_id}"),
+            ]
+        ])
+    )
 
     return ConversationHandler.END
\ No newline at end of file
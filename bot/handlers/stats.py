@@ -0,0 +1,73 @@
+# bot/handlers/stats.py
+"""
+/stats — счётчики внутренних кешей (только для менеджеров).
+"""
+
+from telegram import Update
+from telegram.ext import CommandHandler, ContextTypes
+
+from bot import db, sqlstats
+from bot.catalog import catalog
+from bot.identity import identities, resolve
+from bot.notify import outbox
+from bot.stockviews import stock_views
+
+
+def _line(name: str, st: dict) -> str:
+    return (
+        f"• {name}: {st['size']} записей, попаданий {st['hits']}, промахов {st['misses']} "
+        f"({st['hit_rate']:.0%}), вытеснено {st['evictions']}, сброшено {st['invalidations']}"
+    )
+
+
+async def stats_command(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
+    user = await resolve(update.effective_user.id)
+    if not user or user.role != "manager":
+        return
+
+    lines = [
+        "📈 Кеши:",
+        _line("пользователи", identities.stats()),
+        _line(f"клавиатуры каталога (v{catalog.version}, загрузок {catalog.loads})", catalog.stats()),
+        _line(f"экраны остатков (v{stock_views.version})", stock_views.stats()),
+    ]
+    ob = outbox.stats()
+    lines += [
+        "",
+        f"📨 Уведомления: доставлено {ob['delivered']}, ошибок {ob['failed']}, отброшено {ob['dropped']}, "
+        f"повторов {ob['retried']}, в очереди {ob['queued']}",
+    ]
+    proc = ctx.application.update_processor
+    if hasattr(proc, "stats"):
+        st = proc.stats()
+        lines.append(
+            f"⚙️ Апдейты: одновременно {st['active']} из {st['limit']} (пик {st['peak']}), "
+            f"обработано {st['processed']}, ждут своей очереди {st['users_waiting']} польз."
+        )
+    top = sqlstats.stats()
+    if top:
+        lines += ["", "🗄 SQL по хендлерам (больше всего времени в БД):"]
+        for name, st in top:
+            per_call = (
+                f", на вызов {st.statements / st.calls:.1f} запр. и {st.db_time * 1000 / st.calls:.1f} мс"
+                f" (макс. {st.max_statements} запр.)" if st.calls else ""
+            )
+            nplus1 = f", N+1: {st.nplus1}" if st.nplus1 else ""
+            lines.append(f"• {name}: {st.statements} запр., {st.db_time * 1000:.0f} мс{per_call}{nplus1}")
+    if db.async_read_engine is not db.async_engine:
+        lines.append(
+            f"🪞 Реплика: запросов {db.routing['replica']}, "
+            f"с основной после своей записи {db.routing['sticky']}"
+        )
+    persistence = ctx.application.persistence
+    if hasattr(persistence, "stats"):
+        st = persistence.stats()
+        lines.append(
+            f"💾 Состояние в БД: строк {st['rows']}, записано {st['writes']}, удалено {st['deletes']}, "
+            f"без изменений {st['skipped']}, ждут записи {st['pending']}, подгружено {st['lazy_loads']}"
+        )
+    await update.message.reply_text("\n".join(lines))
+
+
+def get_handler() -> CommandHandler:
+    return CommandHandler("stats", stats_command)
@@ -13,13 +13,15 @@ from telegram.ext import (
 )
 from telegram.error import BadRequest  # ← добавили
 
-from bot.db import Session
-from bot.keyboards import home_kb
-from bot.models import Product, Stock, Log
+from bot.db import async_session
+from bot.keyboards import home_kb, CatalogPicker
+from bot.models import Product, Stock, Log, StockMovement
 
 # ── состояния ────────────────────────────────────────────────────────────────
 SELECT_PRODUCT, ENTER_QTY = range(2)
 
+products_picker = CatalogPicker("add_stock")
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 async def add_stock_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -29,30 +31,23 @@ async def add_stock_start(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await query.answer()
         context.user_data.clear()
 
-        # список товаров
-        session = Session()
-        products = session.query(Product).order_by(Product.name).all()
-        session.close()
+        # первая страница списка товаров
+        async with async_session() as session:
+            markup = await products_picker.keyboard(session, context)
 
-        if not products:
+        if markup is None:
             await query.edit_message_text(
                 "❗ Нет товаров. Сперва добавьте новый товар.", reply_markup=home_kb()
             )
             return ConversationHandler.END
 
-        kb = [[InlineKeyboardButton(p.name, callback_data=str(p.id))] for p in products]
         try:
             # пробуем изменить и текст, и клавиатуру
-            await query.edit_message_text(
-                "➕ Выберите товар для пополнения:",
-                reply_markup=InlineKeyboardMarkup(kb + list(home_kb().inline_keyboard)),
-            )
+            await query.edit_message_text("➕ Выберите товар для пополнения или напишите часть названия:", reply_markup=markup)
         except BadRequest as e:
             # если текст тот же, меняем только клавиатуру – избавляемся от «Message is not modified»
             if "Message is not modified" in str(e):
-                await query.edit_message_reply_markup(
-                    reply_markup=InlineKeyboardMarkup(kb + list(home_kb().inline_keyboard))
-                )
+                await query.edit_message_reply_markup(reply_markup=markup)
             else:
                 raise
 
@@ -101,29 +96,29 @@ async def enter_qty(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
     pid = context.user_data["product_id"]
 
-    session = Session()
-    stock = session.query(Stock).filter_by(product_id=pid, user_id=None).first()
-
-    if stock:
-        stock.quantity += qty
-        final_qty = stock.quantity
-    else:
-        stock = Stock(product_id=pid, quantity=qty)
-        session.add(stock)
-        final_qty = qty
-
-    product = session.get(Product, pid)
-    product_name = product.name  # кешируем до закрытия сессии
-
-    session.add(
-        Log(
-            action="add_stock",
-            user_id=str(update.effective_user.id),
-            info=f"Пополнено: {product_name} +{qty} шт. Итого: {final_qty} шт.",
+    async with async_session() as session:
+        final_qty = await Stock.adjust(session, pid, None, qty)
+
+        product = await session.get(Product, pid)
+        product_name = product.name  # кешируем до закрытия сессии
+
+        session.add(
+            Log(
+                action="add_stock",
+                user_id=str(update.effective_user.id),
+                info=f"Пополнено: {product_name} +{qty} шт. Итого: {final_qty} шт.",
+            )
         )
-    )
-    session.commit()
-    session.close()
+        session.add(
+            StockMovement(
+                kind="add_stock",
+                product_id=pid,
+                to_holder=None,
+                qty=qty,
+                actor=str(update.effective_user.id),
+            )
+        )
+        await session.commit()
 
     reply_kb = InlineKeyboardMarkup(
         [
@@ -154,9 +149,15 @@ async def back_to_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
 
 def get_handler() -> ConversationHandler:
     return ConversationHandler(
+        name="add_stock",
+        persistent=True,
         entry_points=[CallbackQueryHandler(add_stock_start, pattern="^add_stock$")],
         states={
-            SELECT_PRODUCT: [CallbackQueryHandler(select_product, pattern=r"^\d+$")],
+            SELECT_PRODUCT: [
+                products_picker.nav_handler(),
+                products_picker.search_handler(),
+                CallbackQueryHandler(select_product, pattern=r"^\d+$"),
+            ],
             ENTER_QTY: [MessageHandler(filters.TEXT & ~filters.COMMAND, enter_qty)],
         },
         fallbacks=[CallbackQueryHandler(back_to_menu, pattern="^main_menu$")],
@@ -1,110 +1,122 @@
 # bot/handlers/stock_list.py
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CallbackQueryHandler, ContextTypes
-from sqlalchemy import func
-from bot.db import Session
+from sqlalchemy import func, select
+from bot.db import async_session, read_only
+from bot.identity import resolve
 from bot.keyboards import home_kb
 from bot.models import User, Product, Stock
+from bot.stockviews import stock_views
 
 EMP, PROD = "show_stock_emp", "show_stock_prod"
 
+
+# ── тексты экранов (кешируются в stock_views до следующего изменения остатков) ──
+async def _own_text(user_id: int) -> str:
+    async with async_session() as session:
+        rows = (await session.execute(
+            select(Product.name, func.sum(Stock.quantity))
+            .join(Stock)
+            .filter(Stock.user_id == user_id, Stock.quantity > 0)
+            .group_by(Product.name)
+            .order_by(Product.name)
+        )).all()
+
+    if not rows:
+        return "📦 У вас нет остатков."
+
+    text = ["📦 <b>Мои остатки</b>"]
+    text += [f"• {p}: <code>{q} шт.</code>" for p, q in rows]
+    return "\n".join(text)
+
+
+async def _by_employee_text() -> str:
+    async with async_session() as session:
+        rows = (await session.execute(
+            select(User.full_name, Product.name, func.sum(Stock.quantity))
+            .select_from(Stock)
+            .join(User,    User.id == Stock.user_id)
+            .join(Product, Product.id == Stock.product_id)
+            .filter(Stock.quantity > 0)
+            .group_by(User.full_name, Product.name)
+            .order_by(User.full_name, Product.name)
+        )).all()
+
+    if not rows:
+        return "📦 Нет остатков назначенных на сотрудников."
+
+    out, cur_user = ["📊 <b>Остатки по сотрудникам</b>"], None
+    for uname, prod, qty in rows:
+        if uname != cur_user:
+            out.append(f"\n<u>{uname}</u>:")
+            cur_user = uname
+        out.append(f" • {prod} <code>{qty} шт.</code>")
+    return "\n".join(out)
+
+
+async def _by_product_text() -> str:
+    async with async_session() as session:
+        rows = (await session.execute(
+            select(
+                Product.name,
+                User.full_name,
+                func.sum(Stock.quantity)
+            )
+            .select_from(Stock)
+            .join(Product, Stock.product_id == Product.id)
+            .outerjoin(User,   User.id == Stock.user_id)
+            .filter(Stock.quantity > 0)
+            .group_by(Product.id, Stock.user_id, User.full_name)
+            .order_by(Product.name, User.full_name.nullsfirst())
+        )).all()
+
+    if not rows:
+        return "📦 Нет остатков без ответственных на складе."
+
+    out, cur_prod = ["📊 <b>Остатки по товарам</b>"], None
+    for prod, uname, qty in rows:
+        if prod != cur_prod:
+            out.append(f"\n<u>{prod}</u>:")
+            cur_prod = prod
+        holder = uname or "Не назначен"
+        out.append(f" • {holder}: <code>{qty} шт.</code>")
+    return "\n".join(out)
+
+
+@read_only  # при DATABASE_READ_URL — с реплики
 async def show_stock(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
     try:
         query = update.callback_query
         await query.answer()
         data = query.data
 
-        session = Session()
-        cur_user = session.query(User).filter_by(
-            telegram_id=str(query.from_user.id)
-        ).one()
+        cur_user = await resolve(query.from_user.id)
         role = cur_user.role
 
         if role == "employee":
-            rows = (
-                session.query(Product.name, func.sum(Stock.quantity))
-                .join(Stock)
-                .filter(Stock.user_id == cur_user.id)
-                .group_by(Product.name)
-                .order_by(Product.name)
-                .all()
-            )
-            session.close()
-
-            if not rows:
-                await query.edit_message_text("📦 У вас нет остатков.", reply_markup=home_kb())
-                return
-
-            text = ["📦 <b>Мои остатки</b>"]
-            text += [f"• {p}: <code>{q} шт.</code>" for p, q in rows]
-            await query.edit_message_text("\n".join(text), parse_mode="HTML", reply_markup=home_kb())
+            text = await stock_views.cached(("own", cur_user.id), lambda: _own_text(cur_user.id))
+            await query.edit_message_text(text, parse_mode="HTML", reply_markup=home_kb())
             return
 
         if data == "show_stock":
             kb = [
-                [InlineKeyboardButton("👤 По сотрудникам", callback_data=EMP)],
-                [InlineKeyboardButton("📦 По товарам",    callback_data=PROD)],
+                [InlineKeyboardButton("👤 По сотрудникам", callback_data=EMP)],
+                [InlineKeyboardButton("📦 По товарам",    callback_data=PROD)],
                 [InlineKeyboardButton("🏠 Главное меню",  callback_data="main_menu")],
             ]
             await query.edit_message_text(
                 "Как представить остатки?", reply_markup=InlineKeyboardMarkup(kb)
             )
-            session.close()
             return
 
         if data == EMP:
-            rows = (
-                session.query(User.full_name, Product.name, func.sum(Stock.quantity))
-                .select_from(Stock)
-                .join(User,    User.id == Stock.user_id)
-                .join(Product, Product.id == Stock.product_id)
-                .group_by(User.full_name, Product.name)
-                .order_by(User.full_name, Product.name)
-                .all()
-            )
-            session.close()
-
-            if not rows:
-                await query.edit_message_text("📦 Нет остатков назначенных на сотрудников.", reply_markup=home_kb())
-                return
-
-            out, cur_user = ["📊 <b>Остатки по сотрудникам</b>"], None
-            for uname, prod, qty in rows:
-                if uname != cur_user:
-                    out.append(f"\n<u>{uname}</u>:")
-                    cur_user = uname
-                out.append(f" • {prod} <code>{qty} шт.</code>")
-            await query.edit_message_text("\n".join(out), parse_mode="HTML", reply_markup=home_kb())
+            text = await stock_views.cached(EMP, _by_employee_text)
+            await query.edit_message_text(text, parse_mode="HTML", reply_markup=home_kb())
             return
 
         if data == PROD:
-            rows = (
-                session.query(
-                    Product.name,
-                    User.full_name,
-                    func.sum(Stock.quantity)
-                )
-                .select_from(Stock)
-                .join(Product, Stock.product_id == Product.id)
-                .outerjoin(User,   User.id == Stock.user_id)
-                .group_by(Product.id, Stock.user_id, User.full_name)
-                .order_by(Product.name, User.full_name.nullsfirst())
-                .all()
-            )
-            session.close()
-
-            if not rows:
-                await query.edit_message_text("📦 Нет остатков без ответственных на складе.", reply_markup=home_kb())
-                return
-
-            out, cur_prod = ["📊 <b>Остатки по товарам</b>"], None
-            for prod, uname, qty in rows:
-                if prod != cur_prod:
-                    out.append(f"\n<u>{prod}</u>:")
-                    cur_prod = prod
-                holder = uname or "Не назначен"
-                out.append(f" • {holder}: <code>{qty} шт.</code>")
-            await query.edit_message_text("\n".join(out), parse_mode="HTML", reply_markup=home_kb())
+            text = await stock_views.cached(PROD, _by_product_text)
+            await query.edit_message_text(text, parse_mode="HTML", reply_markup=home_kb())
             return
 
     except Exception as e:
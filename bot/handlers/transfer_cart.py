@@ -0,0 +1,327 @@
+# bot/handlers/transfer_cart.py
+"""
+Передача набора товаров сотруднику одной операцией («корзина»).
+
+Менеджер выбирает сотрудника и собирает корзину: кнопкой по одному товару
+или сообщением из строк «товар количество». После просмотра всё
+проводится одной транзакцией: склад уменьшается одним условным UPDATE
+(Stock.take_many), сотруднику — пакетный upsert, одна запись в журнал и
+одно уведомление получателю.
+"""
+
+import html
+import re
+
+from sqlalchemy import insert, select
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+from telegram.ext import (
+    ContextTypes, ConversationHandler, CallbackQueryHandler, MessageHandler, filters
+)
+
+from bot.catalog import catalog
+from bot.db import async_session
+from bot.handlers.stock import back_to_menu
+from bot.keyboards import home_kb, Picker, CatalogPicker
+from bot.models import Stock, User, Log, StockMovement
+from bot.notify import outbox
+
+CART_EMPLOYEE, CART_EDIT, CART_PRODUCT, CART_QTY = range(4)
+
+MAX_LINES = 50  # позиций в одной корзине
+
+# «Перчатки 5», «Перчатки;5», «Перчатки — 5 шт», «Перчатки x5»; x/х/×/* — знак
+# количества, только если отделён от названия пробелом («Мех 5» — это «Мех»)
+_LINE = re.compile(r"^(.+?)\s*(?:[;,:—–]\s*|\s+[xх×*]\s*|\s+)(\d+)\s*(?:шт\.?)?$", re.IGNORECASE)
+
+
+def parse_line(raw: str):
+    """«товар количество» → (название, количество) или None."""
+    m = _LINE.match(raw.strip())
+    if not m:
+        return None
+    return " ".join(m.group(1).split()), int(m.group(2))
+
+
+employees_picker = Picker(
+    "cart_employee",
+    lambda ctx: select(User.id, User.full_name).filter(User.role == "employee"),
+    User.id, User.full_name,
+    search=User,
+)
+
+products_picker = CatalogPicker(
+    "cart_product",
+    allowed=lambda ctx: select(Stock.product_id).filter(Stock.user_id.is_(None), Stock.quantity > 0),
+)
+
+
+async def _free(session, pids) -> dict:
+    """Свободный (складской) остаток по товарам."""
+    if not pids:
+        return {}
+    rows = await session.execute(
+        select(Stock.product_id, Stock.quantity).filter(Stock.user_id.is_(None), Stock.product_id.in_(list(pids)))
+    )
+    return dict(rows.all())
+
+
+async def _render(ctx, note: str = None):
+    """Текст и клавиатура корзины с актуальными остатками склада."""
+    cart = ctx.user_data["cart"]
+    async with async_session() as session:
+        await catalog.ensure(session)
+        free = await _free(session, cart)
+
+    lines = [f"🧺 <b>Передача: {html.escape(ctx.user_data['cart_name'])}</b>", ""]
+    kb = []
+    if not cart:
+        lines.append("Корзина пуста.")
+    for pid, qty in cart.items():
+        name = catalog.name(pid) or f"#{pid}"
+        have = free.get(pid, 0)
+        warn = " ⚠️" if qty > have else ""
+        lines.append(f"• {html.escape(name)} — {qty} шт. (на складе {have}){warn}")
+        kb.append([InlineKeyboardButton(f"❌ {name}", callback_data=f"cart:del:{pid}")])
+    lines += [
+        "",
+        "Добавьте товар кнопкой или пришлите строки «товар количество», по одной на строку.",
+    ]
+    if note:
+        lines += ["", note]
+
+    kb.append([InlineKeyboardButton("➕ Добавить товар", callback_data="cart:add")])
+    if cart:
+        total = sum(cart.values())
+        kb.append([InlineKeyboardButton(f"✅ Передать ({len(cart)} поз., {total} шт.)", callback_data="cart:commit")])
+        kb.append([InlineKeyboardButton("🧹 Очистить", callback_data="cart:clear")])
+    kb.append([InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")])
+    return "\n".join(lines), InlineKeyboardMarkup(kb)
+
+
+async def _show(update: Update, ctx, note: str = None) -> int:
+    text, markup = await _render(ctx, note)
+    if update.callback_query:
+        try:
+            await update.callback_query.edit_message_text(text, parse_mode="HTML", reply_markup=markup)
+        except BadRequest as e:
+            if "Message is not modified" not in str(e):
+                raise
+    else:
+        await update.message.reply_text(text, parse_mode="HTML", reply_markup=markup)
+    return CART_EDIT
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+async def cart_start(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
+    try:
+        query = update.callback_query
+        await query.answer()
+        ctx.user_data.clear()
+
+        async with async_session() as session:
+            markup = await employees_picker.keyboard(session, ctx)
+
+        if markup is None:
+            await query.edit_message_text("❗ Нет сотрудников для передачи.", reply_markup=home_kb())
+            return ConversationHandler.END
+
+        await query.edit_message_text("🧺 Кому собираем набор? Выберите или напишите часть имени.", reply_markup=markup)
+        return CART_EMPLOYEE
+
+    except Exception as e:
+        print("‼️ ОШИБКА В cart_start:", e)
+        await update.effective_chat.send_message("❌ Ошибка при запуске передачи.", reply_markup=home_kb())
+        return ConversationHandler.END
+
+
+async def select_employee(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
+    try:
+        query = update.callback_query
+        await query.answer()
+
+        uid = int(query.data)
+        async with async_session() as session:
+            employee = await session.get(User, uid)
+        ctx.user_data["cart_uid"] = uid
+        ctx.user_data["cart_name"] = employee.full_name
+        ctx.user_data["cart"] = {}
+        return await _show(update, ctx)
+
+    except Exception as e:
+        print("‼️ ОШИБКА В cart select_employee:", e)
+        await update.effective_chat.send_message("❌ Ошибка при выборе сотрудника.", reply_markup=home_kb())
+        return ConversationHandler.END
+
+
+# ── корзина ──────────────────────────────────────────────────────────────────
+async def add_lines(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
+    """Строки «товар количество» одним сообщением."""
+    try:
+        async with async_session() as session:
+            await catalog.ensure(session)
+        by_name = {name.casefold(): pid for name, pid in catalog.order}
+
+        cart, bad = ctx.user_data["cart"], []
+        for raw in update.message.text.splitlines():
+            raw = raw.strip()
+            if not raw:
+                continue
+            parsed = parse_line(raw)
+            pid = by_name.get(parsed[0].casefold()) if parsed else None
+            qty = parsed[1] if parsed else 0
+            if pid is None or qty <= 0:
+                bad.append(raw)
+                continue
+            if pid not in cart and len(cart) >= MAX_LINES:
+                bad.append(raw)
+                continue
+            cart[pid] = cart.get(pid, 0) + qty
+
+        note = None
+        if bad:
+            shown = "\n".join(f"• {html.escape(b[:60])}" for b in bad[:10])
+            more = f"\n… и ещё {len(bad) - 10}" if len(bad) > 10 else ""
+            note = f"⚠️ Не распознано (нужно точное название и целое число):\n{shown}{more}"
+        return await _show(update, ctx, note)
+
+    except Exception as e:
+        print("‼️ ОШИБКА В add_lines:", e)
+        await update.message.reply_text("❌ Ошибка при разборе строк.", reply_markup=home_kb())
+        return ConversationHandler.END
+
+
+async def cart_action(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    await query.answer()
+    action = query.data.split(":", 2)[1:]
+
+    if action[0] == "add":
+        async with async_session() as session:
+            markup = await products_picker.keyboard(session, ctx)
+        if markup is None:
+            return await _show(update, ctx, "❗ На складе нет свободных остатков.")
+        await query.edit_message_text("📦 Выберите товар или напишите часть названия:", reply_markup=markup)
+        return CART_PRODUCT
+    if action[0] == "del":
+        ctx.user_data["cart"].pop(int(action[1]), None)
+    elif action[0] == "clear":
+        ctx.user_data["cart"].clear()
+    return await _show(update, ctx)
+
+
+async def select_product(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
+    query = update.callback_query
+    await query.answer()
+
+    pid = int(query.data)
+    async with async_session() as session:
+        free = (await _free(session, [pid])).get(pid, 0)
+    in_cart = ctx.user_data["cart"].get(pid, 0)
+    ctx.user_data["cart_pid"] = pid
+    ctx.user_data["cart_free"] = free - in_cart
+    await query.edit_message_text(
+        f"🔢 Сколько добавить: {catalog.name(pid)}? Доступно: {free - in_cart} шт."
+    )
+    return CART_QTY
+
+
+async def enter_qty(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
+    free = ctx.user_data["cart_free"]
+    try:
+        qty = int(update.message.text.strip())
+        if qty <= 0 or qty > free:
+            raise ValueError
+    except ValueError:
+        await update.message.reply_text(f"❗ Введите число от 1 до {free}")
+        return CART_QTY
+
+    cart, pid = ctx.user_data["cart"], ctx.user_data.pop("cart_pid")
+    if pid not in cart and len(cart) >= MAX_LINES:
+        return await _show(update, ctx, f"❗ В корзине уже {MAX_LINES} позиций.")
+    cart[pid] = cart.get(pid, 0) + qty
+    return await _show(update, ctx)
+
+
+# ── проведение ───────────────────────────────────────────────────────────────
+async def commit_cart(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
+    try:
+        query = update.callback_query
+        await query.answer()
+
+        cart = dict(ctx.user_data["cart"])
+        uid = ctx.user_data["cart_uid"]
+        if not cart:
+            return await _show(update, ctx)
+        actor = str(update.effective_user.id)
+
+        async with async_session() as session:
+            # склад — одним условным UPDATE: либо хватило на все строки, либо откат
+            if not await Stock.take_many(session, cart):
+                await session.rollback()
+                return await _show(update, ctx, "⚠️ Пока собирали корзину, остатки изменились — "
+                                                "поправьте строки с ⚠️ и передайте снова.")
+            await Stock.adjust_many(session, cart, user_id=uid)
+
+            recipient = await session.get(User, uid)
+            await catalog.ensure(session)
+            items = [(catalog.name(pid) or f"#{pid}", qty) for pid, qty in cart.items()]
+            total = sum(cart.values())
+            listing = ", ".join(f"{name} ×{qty}" for name, qty in items)
+
+            session.add(Log(
+                action="transfer_stock",
+                user_id=actor,
+                info=f"Передано сотруднику {recipient.full_name} ({len(cart)} поз., {total} шт.): {listing}"
+            ))
+            await session.execute(insert(StockMovement), [
+                {"kind": "transfer_stock", "product_id": pid, "from_holder": None, "to_holder": uid,
+                 "qty": qty, "actor": actor}
+                for pid, qty in cart.items()
+            ])
+            await session.commit()
+            recipient_tg = recipient.telegram_id
+
+        lines = "\n".join(f"• {html.escape(name)} — {qty} шт." for name, qty in items)
+        outbox.send(recipient_tg, f"📦 Вам передано {len(cart)} поз. ({total} шт.):\n{lines}", parse_mode="HTML")
+
+        ctx.user_data.pop("cart", None)
+        await query.edit_message_text(
+            f"✅ Передано {html.escape(recipient.full_name)}: {len(cart)} поз., {total} шт.\n{lines}",
+            parse_mode="HTML",
+            reply_markup=home_kb(),
+        )
+        return ConversationHandler.END
+
+    except Exception as e:
+        print("‼️ ОШИБКА В commit_cart:", e)
+        await update.effective_chat.send_message("❌ Ошибка при передаче.", reply_markup=home_kb())
+        return ConversationHandler.END
+
+
+def get_handler() -> ConversationHandler:
+    return ConversationHandler(
+        name="transfer_cart",
+        persistent=True,
+        entry_points=[CallbackQueryHandler(cart_start, pattern="^transfer_cart$")],
+        states={
+            CART_EMPLOYEE: [
+                employees_picker.nav_handler(),
+                employees_picker.search_handler(),
+                CallbackQueryHandler(select_employee, pattern=r"^\d+$"),
+            ],
+            CART_EDIT: [
+                CallbackQueryHandler(commit_cart, pattern="^cart:commit$"),
+                CallbackQueryHandler(cart_action, pattern="^cart:(add|clear|del:\\d+)$"),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, add_lines),
+            ],
+            CART_PRODUCT: [
+                products_picker.nav_handler(),
+                products_picker.search_handler(),
+                CallbackQueryHandler(select_product, pattern=r"^\d+$"),
+            ],
+            CART_QTY: [MessageHandler(filters.TEXT & ~filters.COMMAND, enter_qty)],
+        },
+        fallbacks=[CallbackQueryHandler(back_to_menu, pattern="^main_menu$")],
+        allow_reentry=True,
+    )
@@ -3,51 +3,45 @@
 Передача остатков сотруднику.
 """
 
-from sqlalchemy.orm import joinedload
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from sqlalchemy import select
+from telegram import Update
 from telegram.ext import (
     ContextTypes, ConversationHandler, CallbackQueryHandler, MessageHandler, filters
 )
-from bot.db import Session
+from bot.db import async_session
 from bot.handlers.stock import back_to_menu
-from bot.keyboards import home_kb
-from bot.models import Product, Stock, User, Log
+from bot.keyboards import home_kb, Picker, CatalogPicker
+from bot.models import Product, Stock, User, Log, StockMovement
 
 SELECT_PRODUCT, SELECT_EMPLOYEE, ENTER_QTY = range(3)
 
+# товары со свободным (складским) остатком
+products_picker = CatalogPicker(
+    "transfer_product",
+    allowed=lambda ctx: select(Stock.product_id).filter(Stock.user_id.is_(None), Stock.quantity > 0),
+)
+
+employees_picker = Picker(
+    "transfer_employee",
+    lambda ctx: select(User.id, User.full_name).filter(User.role == "employee"),
+    User.id, User.full_name,
+    search=User,
+)
+
 
 async def transfer_start(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
     try:
         query = update.callback_query
         await query.answer()
 
-        session = Session()
-        stock_product_ids = (
-            session.query(Stock.product_id)
-            .filter(Stock.user_id == None, Stock.quantity > 0)
-            .distinct()
-            .all()
-        )
-        product_ids = [pid for (pid,) in stock_product_ids]
-
-        if not product_ids:
-            session.close()
+        async with async_session() as session:
+            markup = await products_picker.keyboard(session, ctx)
+
+        if markup is None:
             await query.edit_message_text("❗ Нет свободных остатков для передачи.", reply_markup=home_kb())
             return ConversationHandler.END
 
-        products = (
-            session.query(Product)
-            .filter(Product.id.in_(product_ids))
-            .order_by(Product.name)
-            .all()
-        )
-        session.close()
-
-        kb = [[InlineKeyboardButton(p.name, callback_data=str(p.id))] for p in products]
-        await query.edit_message_text(
-            "📦 Выберите товар для передачи:",
-            reply_markup=InlineKeyboardMarkup(kb + list(home_kb().inline_keyboard))
-        )
+        await query.edit_message_text("📦 Выберите товар для передачи или напишите часть названия:", reply_markup=markup)
         return SELECT_PRODUCT
 
     except Exception as e:
@@ -65,21 +59,16 @@ async def select_product(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
         ctx.user_data.clear()
         ctx.user_data["product_id"] = pid
 
-        session = Session()
-        product = session.get(Product, pid)
-        ctx.user_data["product_name"] = product.name
-        users = session.query(User).filter_by(role="employee").order_by(User.full_name).all()
-        session.close()
+        async with async_session() as session:
+            product = await session.get(Product, pid)
+            ctx.user_data["product_name"] = product.name
+            markup = await employees_picker.keyboard(session, ctx)
 
-        if not users:
+        if markup is None:
             await query.edit_message_text("❗ Нет сотрудников для передачи.", reply_markup=home_kb())
             return ConversationHandler.END
 
-        kb = [[InlineKeyboardButton(u.full_name, callback_data=str(u.id))] for u in users]
-        await query.edit_message_text(
-            f"👤 Кому передать {product.name}?",
-            reply_markup=InlineKeyboardMarkup(kb + list(home_kb().inline_keyboard))
-        )
+        await query.edit_message_text(f"👤 Кому передать {product.name}? Выберите или напишите часть имени.", reply_markup=markup)
         return SELECT_EMPLOYEE
 
     except Exception as e:
@@ -96,15 +85,10 @@ async def select_employee(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int
         ctx.user_data["employee_id"] = int(query.data)
         pid = ctx.user_data["product_id"]
 
-        session = Session()
-        available = (
-            session.query(Stock)
-            .filter_by(product_id=pid, user_id=None)
-            .with_entities(Stock.quantity)
-            .all()
-        )
-        total = sum(qty for (qty,) in available)
-        session.close()
+        async with async_session() as session:
+            total = await session.scalar(
+                select(Stock.quantity).filter_by(product_id=pid, user_id=None)
+            ) or 0
 
         if total == 0:
             await query.edit_message_text("❗ Нет доступного количества для передачи.", reply_markup=home_kb())
@@ -133,43 +117,45 @@ async def enter_qty(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
     uid = ctx.user_data["employee_id"]
     qty_requested = qty
 
-    session = Session()
-    product = session.get(Product, pid)
-    recipient = session.get(User, uid)
-
-    # 1. Добавим остатки сотруднику
-    stock = session.query(Stock).filter_by(product_id=pid, user_id=uid).first()
-    if stock:
-        stock.quantity += qty
-    else:
-        stock = Stock(product_id=pid, user_id=uid, quantity=qty)
-        session.add(stock)
-
-    # 2. Уменьшаем остатки склада
-    remaining = qty
-    free_stocks = (
-        session.query(Stock)
-        .filter_by(product_id=pid, user_id=None)
-        .order_by(Stock.id)
-        .all()
-    )
-    for s in free_stocks:
-        if remaining <= 0:
-            break
-        if s.quantity > remaining:
-            s.quantity -= remaining
-            remaining = 0
-        else:
-            remaining -= s.quantity
-            session.delete(s)
-
-    session.add(Log(
-        action="transfer_stock",
-        user_id=str(update.effective_user.id),
-        info=f"Передано {qty_requested} шт. {product.name} сотруднику {recipient.full_name}"
-    ))
-    session.commit()
-    session.close()
+    async with async_session() as session:
+        # 1. забираем со склада, только если там всё ещё есть qty
+        #    (доступное число читали шагом раньше — его могли уже передать)
+        if not await Stock.take(session, qty, product_id=pid, user_id=None):
+            await session.rollback()
+            left = await session.scalar(
+                select(Stock.quantity).filter_by(product_id=pid, user_id=None)
+            ) or 0
+            if left <= 0:
+                await update.message.reply_text(
+                    "⚠️ Пока вы вводили количество, свободный остаток закончился — передача не выполнена.",
+                    reply_markup=home_kb(),
+                )
+                return ConversationHandler.END
+            ctx.user_data["available_qty"] = left
+            await update.message.reply_text(
+                f"⚠️ Пока вы вводили количество, остаток изменился: сейчас доступно {left} шт. "
+                f"Сколько передать?"
+            )
+            return ENTER_QTY
+
+        # 2. добавляем остатки сотруднику
+        recipient = await session.get(User, uid)
+        await Stock.adjust(session, pid, uid, qty)
+
+        session.add(Log(
+            action="transfer_stock",
+            user_id=str(update.effective_user.id),
+            info=f"Передано {qty_requested} шт. {ctx.user_data['product_name']} сотруднику {recipient.full_name}"
+        ))
+        session.add(StockMovement(
+            kind="transfer_stock",
+            product_id=pid,
+            from_holder=None,
+            to_holder=uid,
+            qty=qty,
+            actor=str(update.effective_user.id),
+        ))
+        await session.commit()
 
     await update.message.reply_text("✅ Передача выполнена.", reply_markup=home_kb())
     return ConversationHandler.END
@@ -177,10 +163,20 @@ async def enter_qty(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
 
 def get_handler() -> ConversationHandler:
     return ConversationHandler(
+        name="transfer_stock",
+        persistent=True,
         entry_points=[CallbackQueryHandler(transfer_start, pattern="^transfer_stock$")],
         states={
-            SELECT_PRODUCT: [CallbackQueryHandler(select_product, pattern=r"^\d+$")],
-            SELECT_EMPLOYEE: [CallbackQueryHandler(select_employee, pattern=r"^\d+$")],
+            SELECT_PRODUCT: [
+                products_picker.nav_handler(),
+                products_picker.search_handler(),
+                CallbackQueryHandler(select_product, pattern=r"^\d+$"),
+            ],
+            SELECT_EMPLOYEE: [
+                employees_picker.nav_handler(),
+                employees_picker.search_handler(),
+                CallbackQueryHandler(select_employee, pattern=r"^\d+$"),
+            ],
             ENTER_QTY: [MessageHandler(filters.TEXT & ~filters.COMMAND, enter_qty)],
         },
         fallbacks=[CallbackQueryHandler(back_to_menu, pattern="^main_menu$")],
@@ -18,17 +18,39 @@ from telegram.error import BadRequest
 from telegram.ext import (
     ContextTypes, ConversationHandler, CallbackQueryHandler, MessageHandler, filters
 )
+from sqlalchemy import select
 from sqlalchemy.orm import joinedload
 
-from bot.config import MANAGER_TELEGRAM_IDS
-from bot.db import Session
-from bot.keyboards import home_kb
-from bot.models import User, Product, Stock, Log
+from bot.db import async_session
+from bot.digest import writeoff_digest
+from bot.identity import resolve
+from bot.keyboards import home_kb, Picker, JUMP_LETTERS
+from bot.models import User, Product, Stock, Log, StockMovement
 
 # ── состояния ────────────────────────────────────────────────────────────────
 CHOOSE_EMPLOYEE, CHOOSE_PRODUCT, ENTER_QTY, ENTER_REASON = range(4)
 
 
+def _holder_stocks(ctx):
+    """Строки остатков выбранного источника (сотрудник или склад)."""
+    uid = ctx.user_data["target_uid"]
+    return (
+        select(Stock.id, Product.name, Stock.quantity)
+        .join(Product, Stock.product_id == Product.id)
+        .filter((Stock.user_id == uid) if uid is not None else Stock.user_id.is_(None), Stock.quantity > 0)
+    )
+
+
+stocks_picker = Picker(
+    "writeoff_stock",
+    _holder_stocks,
+    Stock.id, Product.name,
+    label=lambda row: f"{row.name}: {row.quantity} шт.",
+    jump=JUMP_LETTERS,
+    search=Product,
+)
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 async def writeoff_start(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
     """Точка входа: определяем, чьи остатки будем списывать."""
@@ -37,29 +59,26 @@ async def writeoff_start(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
         await q.answer()
         ctx.user_data.clear()
 
-        session = Session()
-        current = session.query(User).filter_by(telegram_id=str(q.from_user.id)).one()
+        current = await resolve(q.from_user.id)
         uid = current.id
 
         # ── сотрудник списывает свои товары сразу ────────────────────────────
         if current.role == "employee":
             ctx.user_data["target_uid"] = uid
-            session.close()
             return await _show_products(q, ctx)
 
         # ── менеджер выбирает источник списания ──────────────────────────────
-        employees = (
-            session.query(User)
-            .join(Stock)
-            .filter(User.role == "employee", Stock.quantity > 0)
-            .group_by(User.id)
-            .order_by(User.full_name)
-            .all()
-        )
-        has_unassigned = session.query(Stock).filter(
-            Stock.user_id.is_(None), Stock.quantity > 0
-        ).count() > 0
-        session.close()
+        async with async_session() as session:
+            employees = (await session.scalars(
+                select(User)
+                .join(Stock)
+                .filter(User.role == "employee", Stock.quantity > 0)
+                .group_by(User.id)
+                .order_by(User.full_name)
+            )).all()
+            has_unassigned = await session.scalar(
+                select(Stock.id).filter(Stock.user_id.is_(None), Stock.quantity > 0).limit(1)
+            ) is not None
 
         if not employees and not has_unassigned:
             await q.edit_message_text("❗ Нет остатков для списания.", reply_markup=home_kb())
@@ -103,29 +122,15 @@ async def select_employee(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int
 async def _show_products(query, ctx) -> int:
     """Показываем товары, доступные к списанию у выбранного источника."""
     try:
-        uid = ctx.user_data["target_uid"]
-        session = Session()
-        stocks = (
-            session.query(Stock)
-            .options(joinedload(Stock.product))
-            .join(Product, Stock.product_id == Product.id)
-            .filter((Stock.user_id == uid) if uid is not None else Stock.user_id.is_(None), Stock.quantity > 0)
-            .order_by(Product.name)
-            .all()
-        )
+        async with async_session() as session:
+            markup = await stocks_picker.keyboard(session, ctx)
 
-        if not stocks:
-            session.close()
+        if markup is None:
             await query.edit_message_text("❗ Нет остатков для списания.", reply_markup=home_kb())
             return ConversationHandler.END
 
-        kb = [[InlineKeyboardButton(f"{s.product.name}: {s.quantity} шт.", callback_data=str(s.id))] for s in stocks]
-        session.close()
-
         try:
-            await query.edit_message_text(
-                "📦 Выберите товар:", reply_markup=InlineKeyboardMarkup(kb + list(home_kb().inline_keyboard))
-            )
+            await query.edit_message_text("📦 Выберите товар или напишите часть названия:", reply_markup=markup)
         except BadRequest as e:
             if "Message is not modified" not in str(e):
                 raise
@@ -146,10 +151,9 @@ async def select_product(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
         stock_id = int(q.data)
         ctx.user_data["stock_id"] = stock_id
 
-        session = Session()
-        stock = session.query(Stock).get(stock_id)
+        async with async_session() as session:
+            stock = await session.get(Stock, stock_id)
         ctx.user_data["available_qty"] = stock.quantity
-        session.close()
 
         await q.edit_message_text(f"🔢 Введите количество (доступно: {stock.quantity} шт.):")
         return ENTER_QTY
@@ -184,35 +188,53 @@ async def enter_reason(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
         qty = ctx.user_data["writeoff_qty"]
         stock_id = ctx.user_data["stock_id"]
 
-        session = Session()
-        stock = session.query(Stock).get(stock_id)
-        product_name = stock.product.name  # берём до закрытия сессии
-        user_fullname = stock.user.full_name if stock.user else "Склад"
-
-        stock.quantity -= qty
-        if stock.quantity == 0:
-            session.delete(stock)
-
-        session.add(Log(
-            action="writeoff",
-            user_id=str(update.effective_user.id),
-            info=f"Списано {qty} шт. {product_name} ({user_fullname}). Причина: {reason}"
-        ))
-        session.commit()
-        session.close()
+        async with async_session() as session:
+            stock = await session.get(
+                Stock, stock_id, options=[joinedload(Stock.product), joinedload(Stock.user)]
+            )
+            product_name = stock.product.name  # берём до закрытия сессии
+            user_fullname = stock.user.full_name if stock.user else "Склад"
+
+            # списываем, только если остаток всё ещё не меньше qty: пока вводили
+            # количество и причину, его могли передать или списать другие
+            taken = await Stock.take(session, qty, stock_id=stock_id)
+            if not taken:
+                await session.rollback()
+                left = await session.scalar(select(Stock.quantity).filter_by(id=stock_id)) or 0
+            else:
+                session.add(Log(
+                    action="writeoff",
+                    user_id=str(update.effective_user.id),
+                    info=f"Списано {qty} шт. {product_name} ({user_fullname}). Причина: {reason}"
+                ))
+                session.add(StockMovement(
+                    kind="writeoff",
+                    product_id=stock.product_id,
+                    from_holder=stock.user_id,
+                    qty=qty,
+                    actor=str(update.effective_user.id),
+                    reason=reason,
+                ))
+                await session.commit()
+
+        if not taken:
+            if left <= 0:
+                await update.message.reply_text(
+                    f"⚠️ Пока вы заполняли списание, остаток {product_name} закончился — ничего не списано.",
+                    reply_markup=home_kb(),
+                )
+                return ConversationHandler.END
+            ctx.user_data["available_qty"] = left
+            await update.message.reply_text(
+                f"⚠️ Пока вы заполняли списание, остаток {product_name} изменился: сейчас доступно {left} шт. "
+                f"Введите количество заново:"
+            )
+            return ENTER_QTY
 
         await update.message.reply_text(f"✅ Списано {qty} шт. ({product_name}).", reply_markup=home_kb())
 
-        # уведомляем менеджеров (если есть)
-        for mgr_id in MANAGER_TELEGRAM_IDS:
-            try:
-                await update.get_bot().send_message(
-                    mgr_id,
-                    f"🔔 <b>{user_fullname}</b> списал {qty} шт. <i>{product_name}</i>.\nПричина: {reason}",
-                    parse_mode="HTML"
-                )
-            except Exception:
-                pass
+        # уведомляем менеджеров: сразу или в очередной сводке
+        writeoff_digest.add(user_fullname, product_name, qty, reason)
         return ConversationHandler.END
 
     except Exception as e:
@@ -225,10 +247,16 @@ async def enter_reason(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> int:
 
 def get_handler() -> ConversationHandler:
     return ConversationHandler(
+        name="writeoff",
+        persistent=True,
         entry_points=[CallbackQueryHandler(writeoff_start, pattern="^write_off$")],
         states={
             CHOOSE_EMPLOYEE: [CallbackQueryHandler(select_employee, pattern=r"^\d+$|^unassigned$")],
-            CHOOSE_PRODUCT: [CallbackQueryHandler(select_product, pattern=r"^\d+$")],
+            CHOOSE_PRODUCT: [
+                stocks_picker.nav_handler(),
+                stocks_picker.search_handler(),
+                CallbackQueryHandler(select_product, pattern=r"^\d+$"),
+            ],
             ENTER_QTY: [MessageHandler(filters.TEXT & ~filters.COMMAND, enter_qty)],
             ENTER_REASON: [MessageHandler(filters.TEXT & ~filters.COMMAND, enter_reason)],
         },
@@ -0,0 +1,93 @@
+# bot/identity.py
+"""
+Кеш «telegram_id → (users.id, роль, имя)».
+
+Почти каждый хендлер начинает с поиска текущего пользователя; на
+попадании в кеш это ноль запросов к БД. Записи живут IDENTITY_CACHE_TTL
+секунд, самые старые вытесняются при переполнении (LRU). Отсутствие
+пользователя тоже кешируется — поэтому одобрение заявки и смена роли
+обязаны звать identities.invalidate(telegram_id).
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import select
+
+from bot.config import IDENTITY_CACHE_SIZE, IDENTITY_CACHE_TTL
+from bot.db import async_session
+from bot.models import User
+
+_MISSING = object()
+
+
+@dataclass(frozen=True)
+class Identity:
+    id: int
+    role: str
+    full_name: str
+
+
+class IdentityCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, telegram_id: str):
+        entry = self._data.get(telegram_id)
+        if entry is None or entry[0] < time.monotonic():
+            self.misses += 1
+            return _MISSING
+        self._data.move_to_end(telegram_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, telegram_id: str, identity: Optional[Identity]) -> None:
+        self._data[telegram_id] = (time.monotonic() + self.ttl, identity)
+        self._data.move_to_end(telegram_id)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, telegram_id: Optional[str] = None) -> None:
+        """Сбросить одну запись (или весь кеш, если id не указан)."""
+        self.invalidations += 1
+        if telegram_id is None:
+            self._data.clear()
+        else:
+            self._data.pop(str(telegram_id), None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+identities = IdentityCache(IDENTITY_CACHE_SIZE, IDENTITY_CACHE_TTL)
+
+
+async def resolve(telegram_id) -> Optional[Identity]:
+    """Пользователь по Telegram ID (None — не зарегистрирован)."""
+    telegram_id = str(telegram_id)
+    cached = identities.get(telegram_id)
+    if cached is not _MISSING:
+        return cached
+
+    async with async_session() as session:
+        row = (await session.execute(
+            select(User.id, User.role, User.full_name).filter_by(telegram_id=telegram_id)
+        )).one_or_none()
+
+    identity = Identity(*row) if row else None
+    identities.put(telegram_id, identity)
+    return identity
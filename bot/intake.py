@@ -0,0 +1,189 @@
+# bot/intake.py
+"""
+Приход на склад из файла: строки «название;количество» (или «id;количество»).
+
+Файл читается потоково (csv.reader / openpyxl read_only) в потоке, в памяти
+остаётся только сумма по каждому товару, а не сами строки. Названия
+сопоставляются с каталогом одним запросом; неизвестные товары по желанию
+создаются. Все остатки, журнал и движения пишутся одной транзакцией
+пакетными INSERT'ами.
+
+Формат: первая колонка — название товара, вторая — количество. Первая
+строка считается заголовком, только если в ней названия колонок
+(«товар»/«название»…, «количество»/«кол-во»…); с «id»/«sku»/«код»/«артикул»
+в первой колонке товары ищутся по id. Разделитель CSV — «;», «,» или
+табуляция; кодировка UTF-8 или cp1251 (как сохраняет Excel).
+"""
+
+import asyncio
+import codecs
+import csv
+import io
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+from bot.catalog import catalog
+from bot.models import Log, Product, Stock, StockMovement
+
+try:
+    import openpyxl
+except ImportError:  # pragma: no cover
+    openpyxl = None
+
+FORMATS = (".csv", ".txt", ".xlsx") if openpyxl else (".csv", ".txt")
+_ID_HEADERS = {"id", "sku", "код", "артикул"}
+_NAME_HEADERS = {"название", "наименование", "товар", "name", "product"}
+_QTY_HEADERS = {"количество", "кол-во", "кол.", "шт", "шт.", "qty", "quantity", "count"}
+_NAME_LEN = Product.__table__.c.name.type.length
+
+
+@dataclass
+class IntakeResult:
+    applied: list = field(default_factory=list)   # (название, +qty, итого)
+    created: list = field(default_factory=list)   # названия новых товаров
+    rejected: list = field(default_factory=list)  # (номер строки, первая колонка, причина)
+
+    @property
+    def total_qty(self) -> int:
+        return sum(qty for _, qty, _ in self.applied)
+
+
+def _csv_rows(path):
+    with open(path, "rb") as f:
+        head = f.read(64 * 1024)
+    try:
+        # final=False: символ, разрезанный границей 64 КБ, не считается ошибкой
+        text = codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError:
+        text, encoding = head.decode("cp1251", errors="replace"), "cp1251"
+    first = text.lstrip("\ufeff").splitlines()[:1] or [""]
+    delimiter = next((d for d in (";", "\t", ",") if d in first[0]), ";")
+
+    with io.open(path, encoding=encoding, newline="") as f:
+        yield from csv.reader(f, delimiter=delimiter)
+
+
+def _xlsx_rows(path):
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in wb.active.iter_rows(values_only=True):
+            yield ["" if v is None else v for v in row]
+    finally:
+        wb.close()
+
+
+def _qty(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    try:
+        qty = int("".join(str(value).split()))  # «1 000» — пробелы-разделители разрядов
+    except ValueError:
+        return None
+    return qty if qty > 0 else None
+
+
+def _header(cells) -> bool:
+    names = [" ".join(c.split()).casefold() for c in cells[:2]] + [""]
+    return names[0] in _ID_HEADERS | _NAME_HEADERS or names[1] in _QTY_HEADERS
+
+
+def parse(path: str, suffix: str):
+    """
+    Прочитать файл. Возвращает (by_id, {ключ: [сумма, первая строка]}, отклонённые);
+    ключ — название (str) или id (int), повторы суммируются.
+    """
+    rows = _xlsx_rows(path) if suffix == ".xlsx" else _csv_rows(path)
+    by_id, totals, rejected = False, {}, []
+    for n, row in enumerate(rows, start=1):
+        cells = [str(c).strip() for c in row]
+        if not any(cells):
+            continue
+        key = " ".join(cells[0].split())
+        if n == 1 and _header(cells):
+            by_id = key.casefold() in _ID_HEADERS
+            continue
+
+        qty = _qty(row[1]) if len(row) > 1 else None
+        if not key:
+            rejected.append((n, "", "пустое название"))
+            continue
+        if qty is None:
+            rejected.append((n, key, "количество — не целое положительное число"))
+            continue
+        if by_id:
+            if not key.isdigit():
+                rejected.append((n, key, "id — не число"))
+                continue
+            key = int(key)
+        elif len(key) > _NAME_LEN:
+            rejected.append((n, key[:40] + "…", f"название длиннее {_NAME_LEN} символов"))
+            continue
+
+        entry = totals.setdefault(key, [0, n])
+        entry[0] += qty
+    return by_id, totals, rejected
+
+
+async def apply_intake(session, path: str, suffix: str, actor: str, create_missing: bool = False) -> IntakeResult:
+    """Разобрать файл и провести приход одной транзакцией."""
+    by_id, totals, rejected = await asyncio.to_thread(parse, path, suffix)
+    result = IntakeResult(rejected=rejected)
+    if not totals:
+        return result
+
+    # ── один запрос на сопоставление ───────────────────────────────────
+    col = Product.id if by_id else Product.name
+    found = (await session.execute(select(Product.id, Product.name).where(col.in_(list(totals))))).all()
+    known = {pid: (pid, name) for pid, name in found} if by_id else {name: (pid, name) for pid, name in found}
+
+    missing = [k for k in totals if k not in known]
+    if missing and create_missing and not by_id:
+        new = (await session.execute(
+            insert(Product).returning(Product.id, Product.name), [{"name": name} for name in missing]
+        )).all()
+        known.update((name, (pid, name)) for pid, name in new)
+        result.created = [name for _, name in new]
+        now = datetime.now()
+        await session.execute(insert(Log), [
+            {"timestamp": now, "action": "add_product", "user_id": actor, "info": f"Добавлен товар: {name}"}
+            for _, name in new
+        ])
+        await session.execute(insert(StockMovement), [
+            {"ts": now, "kind": "add_product", "product_id": pid, "qty": 0, "actor": actor} for pid, _ in new
+        ])
+    else:
+        reason = "нет товара с таким id" if by_id else "товар не найден"
+        result.rejected += [(totals[k][1], str(k), reason) for k in missing]
+        result.rejected.sort()
+
+    deltas = {known[k][0]: qty for k, (qty, _) in totals.items() if k in known}
+    if not deltas:
+        await session.rollback()
+        return result
+
+    # ── остатки, журнал, движения — пакетами ───────────────────────────
+    final = await Stock.adjust_many(session, deltas)
+    names = {pid: name for pid, name in known.values()}
+    now = datetime.now()
+    await session.execute(insert(Log), [
+        {
+            "timestamp": now,
+            "action": "add_stock",
+            "user_id": actor,
+            "info": f"Пополнено: {names[pid]} +{qty} шт. Итого: {final[pid]} шт.",
+        }
+        for pid, qty in deltas.items()
+    ])
+    await session.execute(insert(StockMovement), [
+        {"ts": now, "kind": "add_stock", "product_id": pid, "to_holder": None, "qty": qty, "actor": actor}
+        for pid, qty in deltas.items()
+    ])
+    await session.commit()
+    if result.created:
+        catalog.bump()
+
+    result.applied = sorted((names[pid], qty, final[pid]) for pid, qty in deltas.items())
+    return result
@@ -1,10 +1,23 @@
+from bisect import bisect_left, bisect_right
+
+from sqlalchemy import select, tuple_
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+from telegram.ext import CallbackQueryHandler, MessageHandler, filters
+
+from bot.catalog import catalog
+from bot.db import async_session
+from bot.models import Product
+from bot.search import matches
+from bot.stockviews import stock_views
 
 _MANAGER = [
     [InlineKeyboardButton("🆕 Добавить товар", callback_data="add_product"),
      InlineKeyboardButton("🗑️ Удалить товар", callback_data="delete_product")],
     [InlineKeyboardButton("➕ Пополнить", callback_data="add_stock"),
      InlineKeyboardButton("📦 Передать сотруднику", callback_data="transfer_stock")],
+    [InlineKeyboardButton("📥 Приход из файла", callback_data="bulk_intake"),
+     InlineKeyboardButton("🧺 Выдать набор", callback_data="transfer_cart")],
     [InlineKeyboardButton("📊 Все остатки", callback_data="show_stock")],
     [InlineKeyboardButton("🗑️ Списать у сотрудника", callback_data="write_off")],
     [InlineKeyboardButton("📄 Отчёт", callback_data="report")],  # ← вот она
@@ -26,3 +39,238 @@ def home_kb():
     return InlineKeyboardMarkup([
         [InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")]
     ])
+
+
+# ── постраничный выбор из большого списка ───────────────────────────────────
+PAGE_SIZE = 8
+JUMP_LETTERS = "АВДЖКМОРТФЧЭ"
+
+
+class Picker:
+    """
+    Клавиатура выбора из большого списка (товары, сотрудники, остатки).
+
+    Страницы выбираются keyset-пагинацией по (имя, id):
+    WHERE (name, id) > (:last_name, :last_id) ORDER BY name, id LIMIT n+1 —
+    общее количество строк никогда не считается. Текущая страница хранится
+    в context.user_data, так что каждый диалог листает свой список.
+
+    query(ctx) должен вернуть select(<id>, <имя>, ...доп. колонки);
+    кнопка = label(row), callback_data = str(id).
+
+    search — модель из bot.search (Product / User): тогда текст, введённый
+    в этом состоянии (search_handler), сужает список до совпадений.
+    """
+
+    def __init__(self, key, query, id_col, sort_col, label=None, page_size=PAGE_SIZE, jump=None, search=None):
+        self.key = key
+        self.query = query
+        self.id_col = id_col
+        self.sort_col = sort_col
+        self.label = label or (lambda row: row[1])
+        self.page_size = page_size
+        self.jump = jump
+        self.search = search
+
+    @property
+    def state_key(self) -> str:
+        return f"picker:{self.key}"
+
+    async def keyboard(self, session, ctx, move=None):
+        """Клавиатура текущей/соседней страницы или None, если список пуст."""
+        st = ctx.user_data.get(self.state_key) or {}
+        text = st.get("q")
+        if move is None or move == "clear":
+            st, text = {}, None
+        elif move.startswith("search:"):
+            st, text = {}, move[7:]
+
+        key = tuple_(self.sort_col, self.id_col)
+        q = self.query(ctx)
+        if text and self.search is not None:
+            q = q.where(matches(self.search, text))
+        backwards = False
+
+        if move == "next" and st.get("last"):
+            q = q.where(key > tuple_(*st["last"]))
+            has_prev = True
+        elif move == "prev" and st.get("first"):
+            q = q.where(key < tuple_(*st["first"]))
+            backwards = True
+        elif move and move.startswith("jump:"):
+            q = q.where(self.sort_col >= move[5:])
+            has_prev = True
+        else:
+            has_prev = False
+
+        if backwards:
+            q = q.order_by(self.sort_col.desc(), self.id_col.desc())
+        else:
+            q = q.order_by(self.sort_col, self.id_col)
+        rows = (await session.execute(q.limit(self.page_size + 1))).all()
+
+        more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if backwards:
+            rows.reverse()
+            has_prev, has_next = more, True
+        else:
+            has_next = more
+
+        if not rows:
+            # пустая страница (прыжок за конец списка, всё разобрали) — с начала
+            if move in ("next", "prev") or (move or "").startswith("jump:"):
+                return await self.keyboard(session, ctx, f"search:{text}" if text else None)
+            return None
+
+        self._remember(ctx, rows, has_prev, text)
+        return self._markup(rows, has_prev, has_next, text)
+
+    def _remember(self, ctx, rows, has_prev, text) -> None:
+        ctx.user_data[self.state_key] = {
+            "first": [rows[0][1], rows[0][0]],
+            "last": [rows[-1][1], rows[-1][0]],
+            "has_prev": has_prev,
+            "q": text,
+        }
+
+    def _markup(self, rows, has_prev, has_next, text=None) -> InlineKeyboardMarkup:
+        kb = [[InlineKeyboardButton(self.label(r), callback_data=str(r[0]))] for r in rows]
+        nav = []
+        if has_prev:
+            nav.append(InlineKeyboardButton("◀️", callback_data=f"pg:{self.key}:prev"))
+        if has_next:
+            nav.append(InlineKeyboardButton("▶️", callback_data=f"pg:{self.key}:next"))
+        if nav:
+            kb.append(nav)
+        if self.jump:
+            letters = list(self.jump)
+            half = (len(letters) + 1) // 2
+            for part in (letters[:half], letters[half:]):
+                if part:
+                    kb.append([InlineKeyboardButton(ch, callback_data=f"pg:{self.key}:jump:{ch}") for ch in part])
+        if text:
+            short = text if len(text) <= 20 else text[:19] + "…"
+            kb.append([InlineKeyboardButton(f"✖️ Сбросить поиск «{short}»", callback_data=f"pg:{self.key}:clear")])
+        return InlineKeyboardMarkup(kb + list(home_kb().inline_keyboard))
+
+    async def _navigate(self, update, ctx):
+        q = update.callback_query
+        await q.answer()
+        move = q.data.split(":", 2)[2]
+        async with async_session() as session:
+            markup = await self.keyboard(session, ctx, move)
+        if markup is not None:
+            try:
+                await q.edit_message_reply_markup(reply_markup=markup)
+            except BadRequest as e:
+                if "Message is not modified" not in str(e):
+                    raise
+        # None — ConversationHandler остаётся в текущем состоянии
+
+    async def _search(self, update, ctx):
+        text = (update.message.text or "").strip()
+        async with async_session() as session:
+            markup = await self.keyboard(session, ctx, f"search:{text}")
+        if markup is None:
+            await update.message.reply_text(f"🔎 По запросу «{text}» ничего не найдено, попробуйте иначе.")
+            return
+        await update.message.reply_text(f"🔎 Найдено по запросу «{text}»:", reply_markup=markup)
+
+    def nav_handler(self) -> CallbackQueryHandler:
+        """Хендлер кнопок ◀️/▶️/букв — добавляется в состояние диалога."""
+        return CallbackQueryHandler(self._navigate, pattern=rf"^pg:{self.key}:")
+
+    def search_handler(self) -> MessageHandler:
+        """Поиск набором текста — добавляется в то же состояние диалога."""
+        return MessageHandler(filters.TEXT & ~filters.COMMAND, self._search)
+
+
+class CatalogPicker(Picker):
+    """
+    Выбор товара по справочнику bot.catalog: страницы режутся из списка
+    в памяти, готовые клавиатуры берутся из кеша текущей версии каталога.
+
+    allowed(ctx) — необязательный select(<product_id>) для сужения списка
+    (например, «есть на складе»). Такой фильтр зависит только от остатков и
+    каталога, поэтому множество id и клавиатуры кешируются по паре версий
+    (stock_views.version, catalog.version): пока никто не менял остатки,
+    открытие выбора не делает запросов. Фильтр, зависящий от пользователя,
+    передаётся с per_user=True — тогда это один запрос на открытие.
+    Поиск по тексту по-прежнему идёт в БД через FTS-индекс.
+    """
+
+    def __init__(self, key, allowed=None, label=None, page_size=PAGE_SIZE, jump=JUMP_LETTERS, search=Product,
+                 per_user=False):
+        super().__init__(key, self._sql_query, Product.id, Product.name, label, page_size, jump, search)
+        self.allowed = allowed
+        self.per_user = per_user
+        self._allowed_ids = (None, None)  # (версии, множество id)
+
+    def _sql_query(self, ctx):
+        q = select(Product.id, Product.name)
+        if self.allowed is not None:
+            q = q.where(Product.id.in_(self.allowed(ctx)))
+        return q
+
+    async def keyboard(self, session, ctx, move=None):
+        st = ctx.user_data.get(self.state_key) or {}
+        if (move or "").startswith("search:") or (st.get("q") and move not in (None, "clear")):
+            return await super().keyboard(session, ctx, move)
+
+        await catalog.ensure(session)
+        ids, versions = await self._allowed_set(session, ctx)
+
+        order = catalog.order
+        backwards = False
+        if move == "next" and st.get("last"):
+            start, has_prev = bisect_right(order, tuple(st["last"])), True
+        elif move == "prev" and st.get("first"):
+            start, backwards = bisect_left(order, tuple(st["first"])) - 1, True
+        elif move and move.startswith("jump:"):
+            start, has_prev = bisect_left(order, (move[5:],)), True
+        else:
+            start, has_prev = 0, False
+
+        step = -1 if backwards else 1
+        picked, i = [], start
+        while 0 <= i < len(order) and len(picked) <= self.page_size:
+            name, pid = order[i]
+            if ids is None or pid in ids:
+                picked.append((pid, name))
+            i += step
+
+        more = len(picked) > self.page_size
+        rows = picked[:self.page_size]
+        if backwards:
+            rows.reverse()
+            has_prev, has_next = more, True
+        else:
+            has_next = more
+
+        if not rows:
+            if move in ("next", "prev") or (move or "").startswith("jump:"):
+                return await self.keyboard(session, ctx)
+            return None
+
+        self._remember(ctx, rows, has_prev, None)
+        if ids is not None and versions is None:
+            return self._markup(rows, has_prev, has_next)
+        # страница одна и та же у всех — клавиатуру собираем один раз на версию
+        return catalog.cached_markup(
+            (self.key, versions, rows[0][0], len(rows), has_prev, has_next),
+            lambda: self._markup(rows, has_prev, has_next),
+        )
+
+    async def _allowed_set(self, session, ctx):
+        """(множество разрешённых id или None, версии, под которыми его можно кешировать)."""
+        if self.allowed is None:
+            return None, None
+        if self.per_user:
+            return set((await session.scalars(self.allowed(ctx))).all()), None
+        versions = (stock_views.version, catalog.version)
+        cached_versions, ids = self._allowed_ids
+        if cached_versions != versions:
+            ids = set((await session.scalars(self.allowed(ctx))).all())
+            self._allowed_ids = (versions, ids)  # версии взяты до запроса — запись во время него их сменит
+        return ids, versions
@@ -1,43 +1,106 @@
 from telegram.ext import Application
 
-from bot.config import TELEGRAM_TOKEN
+from bot.config import (
+    TELEGRAM_TOKEN, WATCHDOG_ENABLED, ROLLUP_INTERVAL_SECONDS, BOT_MODE, CONCURRENT_UPDATES,
+)
+from bot.concurrency import PerUserUpdateProcessor
+from bot.digest import writeoff_digest
 from bot.handlers.join_approve import get_handler as join_approve_h
 from bot.handlers.delete_product import get_handler as delete_product_h
 from bot.handlers.product import get_handler as product_h
 from bot.handlers.start import get_handlers as start_handlers
 from bot.handlers.stock import get_handler as stock_add_h
+from bot.handlers.intake import get_handler as intake_h
 from bot.handlers.stock_list import get_handler as stock_list_h
 from bot.handlers.transfer_stock import get_handler as transfer_h
+from bot.handlers.transfer_cart import get_handler as transfer_cart_h
 from bot.handlers.writeoff import get_handler as writeoff_h
 from bot.handlers.report import get_handler as report_h
-from bot.db import init_db
+from bot.handlers.inline_search import get_handler as inline_search_h
+from bot.handlers.stats import get_handler as stats_h
+from bot.db import init_db, async_engine
+from bot import metrics, tracing, webhook
+from bot.notify import outbox
+from bot.persistence import SqlPersistence
+from bot.rollup import rollup_job
+from bot.watchdog import watchdog, get_handler as watchdog_h
 
 
 
-def main() -> None:
-    init_db()
-    app = Application.builder().token(TELEGRAM_TOKEN).build()
+async def _on_startup(app: Application) -> None:
+    outbox.start(app.bot)
+    if WATCHDOG_ENABLED:
+        watchdog.start()
+    metrics.metrics_server.start(app)
+
+
+async def _on_shutdown(app: Application) -> None:
+    metrics.metrics_server.stop()
+    if WATCHDOG_ENABLED:
+        watchdog.stop()
+    writeoff_digest.flush()  # недосланные сводки — в outbox, пока он ещё работает
+    await outbox.stop()
+    # закрываем пул соединений (и фоновые потоки aiosqlite)
+    await async_engine.dispose()
+
+
+def build_app(builder=None, concurrency: int = CONCURRENT_UPDATES) -> Application:
+    """Application со всеми хендлерами и задачами (builder — для прогонов без Telegram)."""
+    builder = builder or Application.builder().token(TELEGRAM_TOKEN)
+    if concurrency > 1:
+        builder = builder.concurrent_updates(PerUserUpdateProcessor(concurrency))
+    app = (
+        builder
+        .persistence(SqlPersistence())  # диалоги и user_data переживают перезапуск
+        .post_init(_on_startup)
+        .post_shutdown(_on_shutdown)
+        .build()
+    )
 
     # остальные модули
     app.add_handler(product_h())
     app.add_handler(stock_add_h())
+    app.add_handler(intake_h())
     app.add_handler(stock_list_h())
     app.add_handler(writeoff_h())
     app.add_handler(delete_product_h())
     app.add_handler(transfer_h())
+    app.add_handler(transfer_cart_h())
     app.add_handler(report_h())
     app.add_handler(join_approve_h())
+    app.add_handler(inline_search_h())
+    app.add_handler(stats_h())
 
     for h in start_handlers():
         app.add_handler(h)
 
+    # суточные итоги для сводки в отчёте
+    app.job_queue.run_repeating(rollup_job, interval=ROLLUP_INTERVAL_SECONDS, first=10)
+    if writeoff_digest.enabled:
+        app.job_queue.run_repeating(writeoff_digest.job, interval=writeoff_digest.minutes * 60)
+
+    if WATCHDOG_ENABLED:
+        app.add_handler(watchdog_h())
+    tracing.instrument(app)  # имя хендлера для сторожа, учёта SQL и метрик
+    metrics.instrument_request(app.bot.request)  # время вызовов Bot API (без long polling)
+
     async def error_handler(update, context):
         import traceback
+        metrics.record_error(getattr(context.error, "__handler__", "unknown"))
         print("❌ Ошибка:", traceback.format_exc())
 
     app.add_error_handler(error_handler)
+    return app
+
+
+def main() -> None:
+    init_db()
+    app = build_app()
 
-    app.run_polling()
+    if BOT_MODE == "webhook":
+        webhook.run(app)
+    else:
+        app.run_polling()
 
 
 if __name__ == "__main__":
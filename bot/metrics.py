@@ -0,0 +1,205 @@
+# bot/metrics.py
+"""
+Метрики в текстовом формате Prometheus (GET /metrics).
+
+    bot_handler_seconds{handler,state,pattern}   гистограмма времени хендлеров
+    bot_handler_errors_total{handler}            исключения (через error handler)
+    bot_api_seconds{method}, bot_api_errors_total{method,reason}
+    bot_db_seconds_total / bot_db_statements_total{handler}   из bot.sqlstats
+    bot_update_queue_depth, bot_active_conversations{conversation}, …
+
+Сбор на горячем пути — два perf_counter и bisect в заранее созданную
+гистограмму (её держит обёртка хендлера, поиска по меткам нет), это
+единицы микросекунд. Всё остальное считается в момент запроса /metrics.
+Отдаётся отдельным сервером на METRICS_LISTEN:METRICS_PORT (по умолчанию
+только localhost) — не на публичном порту webhook'а.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Dict, Tuple
+
+import tornado.web
+from telegram.error import RetryAfter, TelegramError
+from telegram.ext import Application, ConversationHandler
+
+from bot import sqlstats
+from bot.config import METRICS_LISTEN, METRICS_PORT
+from bot.stockviews import stock_views
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # последний — +Inf
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+
+    def render(self, name: str, labels: str, out: list) -> None:
+        acc = 0
+        for bound, n in zip(BUCKETS, self.counts):
+            acc += n
+            out.append(f'{name}_bucket{{{labels}le="{bound}"}} {acc}')
+        acc += self.counts[-1]
+        out.append(f'{name}_bucket{{{labels}le="+Inf"}} {acc}')
+        out.append(f"{name}_sum{{{labels.rstrip(',')}}} {self.sum:.6f}")
+        out.append(f"{name}_count{{{labels.rstrip(',')}}} {acc}")
+
+
+def _esc(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**kw) -> str:
+    return "".join(f'{k}="{_esc(v)}",' for k, v in kw.items())
+
+
+# (handler, state, pattern) → гистограмма; создаётся при instrument()
+handler_seconds: Dict[Tuple[str, str, str], Histogram] = {}
+handler_errors: Dict[str, int] = {}
+api_seconds: Dict[str, Histogram] = {}
+api_errors: Dict[Tuple[str, str], int] = {}
+
+
+def handler_histogram(handler: str, state: str, pattern: str) -> Histogram:
+    return handler_seconds.setdefault((handler, state, pattern), Histogram())
+
+
+def record_error(handler: str) -> None:
+    handler_errors[handler] = handler_errors.get(handler, 0) + 1
+
+
+# ── Bot API ─────────────────────────────────────────────────────────────────
+def instrument_request(request) -> None:
+    """Обернуть do_request транспорта бота: время и ошибки по методу Bot API."""
+    if getattr(request.do_request, "__timed__", False):
+        return
+    do_request = request.do_request
+
+    async def timed(url, method, *args, **kwargs):
+        api = url.rsplit("/", 1)[-1]
+        hist = api_seconds.get(api)
+        if hist is None:
+            hist = api_seconds[api] = Histogram()
+        t = time.perf_counter()
+        try:
+            code, payload = await do_request(url, method, *args, **kwargs)
+        except TelegramError as e:
+            reason = "retry_after" if isinstance(e, RetryAfter) else type(e).__name__
+            api_errors[(api, reason)] = api_errors.get((api, reason), 0) + 1
+            raise
+        finally:
+            hist.observe(time.perf_counter() - t)
+        if code >= 400:
+            api_errors[(api, str(code))] = api_errors.get((api, str(code)), 0) + 1
+        return code, payload
+
+    timed.__timed__ = True
+    request.do_request = timed
+
+
+# ── выдача ──────────────────────────────────────────────────────────────────
+def _conversations(app: Application):
+    for group in app.handlers.values():
+        for h in group:
+            if isinstance(h, ConversationHandler):
+                yield h.name or repr(h), len(h._conversations)
+
+
+def render(app: Application) -> str:
+    out = [
+        "# HELP bot_handler_seconds Время обработки апдейта хендлером.",
+        "# TYPE bot_handler_seconds histogram",
+    ]
+    for (handler, state, pattern), hist in list(handler_seconds.items()):
+        if any(hist.counts):
+            hist.render("bot_handler_seconds", _labels(handler=handler, state=state, pattern=pattern), out)
+
+    out += ["# HELP bot_handler_errors_total Исключения из хендлеров.", "# TYPE bot_handler_errors_total counter"]
+    out += [f"bot_handler_errors_total{{{_labels(handler=h).rstrip(',')}}} {n}" for h, n in handler_errors.items()]
+
+    out += ["# HELP bot_api_seconds Время вызовов Bot API.", "# TYPE bot_api_seconds histogram"]
+    for api, hist in list(api_seconds.items()):
+        hist.render("bot_api_seconds", _labels(method=api), out)
+    out += ["# HELP bot_api_errors_total Ошибки Bot API.", "# TYPE bot_api_errors_total counter"]
+    out += [
+        f"bot_api_errors_total{{{_labels(method=api, reason=reason).rstrip(',')}}} {n}"
+        for (api, reason), n in api_errors.items()
+    ]
+
+    out += ["# HELP bot_db_seconds_total Время в БД по хендлерам.", "# TYPE bot_db_seconds_total counter"]
+    db = list(sqlstats.per_handler.items())
+    out += [f"bot_db_seconds_total{{{_labels(handler=h).rstrip(',')}}} {st.db_time:.6f}" for h, st in db]
+    out += ["# HELP bot_db_statements_total SQL-запросы по хендлерам.", "# TYPE bot_db_statements_total counter"]
+    out += [f"bot_db_statements_total{{{_labels(handler=h).rstrip(',')}}} {st.statements}" for h, st in db]
+    out += ["# TYPE bot_db_nplus1_total counter"]
+    out += [f"bot_db_nplus1_total{{{_labels(handler=h).rstrip(',')}}} {st.nplus1}" for h, st in db if st.nplus1]
+
+    out += [
+        "# HELP bot_update_queue_depth Апдейты, ждущие обработки.",
+        "# TYPE bot_update_queue_depth gauge",
+        f"bot_update_queue_depth {app.update_queue.qsize()}",
+        "# HELP bot_active_conversations Незавершённые диалоги.",
+        "# TYPE bot_active_conversations gauge",
+    ]
+    out += [
+        f"bot_active_conversations{{{_labels(conversation=name).rstrip(',')}}} {n}"
+        for name, n in _conversations(app)
+    ]
+
+    proc = app.update_processor
+    if hasattr(proc, "stats"):
+        st = proc.stats()
+        out += [
+            "# TYPE bot_updates_in_progress gauge", f"bot_updates_in_progress {st['active']}",
+            "# TYPE bot_updates_processed_total counter", f"bot_updates_processed_total {st['processed']}",
+        ]
+
+    sv = stock_views.stats()
+    out += ["# TYPE bot_stock_views_cache_total counter"]
+    out += [f'bot_stock_views_cache_total{{result="{k}"}} {sv[k]}' for k in ("hits", "misses", "skipped")]
+    out += ["# TYPE bot_stock_version counter", f"bot_stock_version {sv['invalidations']}"]
+
+    from bot.notify import outbox  # локально: notify тянет за собой конфиг очереди
+    ob = outbox.stats()
+    out += ["# TYPE bot_outbox_queued gauge", f"bot_outbox_queued {ob['queued']}"]
+    out += ["# TYPE bot_outbox_total counter"]
+    out += [f'bot_outbox_total{{result="{k}"}} {ob[k]}' for k in ("delivered", "failed", "dropped", "retried")]
+    return "\n".join(out) + "\n"
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def initialize(self, app: Application, **_) -> None:
+        self.app = app
+
+    def get(self) -> None:
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.write(render(self.app))
+
+
+class MetricsServer:
+    """Локальный HTTP-сервер с одним маршрутом /metrics."""
+
+    def __init__(self, listen: str = METRICS_LISTEN, port: int = METRICS_PORT):
+        self.listen, self.port = listen, port
+        self._server = None
+
+    def start(self, app: Application) -> None:
+        if self.port and self._server is None:
+            web = tornado.web.Application([(r"/metrics", MetricsHandler, {"app": app})])
+            self._server = web.listen(self.port, address=self.listen)
+            print(f"📈 metrics: http://{self.listen}:{self.port}/metrics")
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.stop()
+            self._server = None
+
+
+metrics_server = MetricsServer()
@@ -0,0 +1,82 @@
+# bot/migrate.py
+"""
+Разовые миграции данных для баз, созданных старыми версиями бота.
+
+    python -m bot.migrate
+"""
+
+import re
+
+from sqlalchemy import func, select, insert
+
+from bot.db import engine, init_db
+from bot.models import Log, Product, StockMovement, User
+
+# разбор Log.info в том виде, в каком его пишут хендлеры
+_LOG_PATTERNS = {
+    "add_stock": re.compile(r"^Пополнено: (?P<product>.+) \+(?P<qty>\d+)\s*шт\."),
+    "transfer_stock": re.compile(r"^Передано (?P<qty>\d+)\s*шт\. (?P<product>.+) сотруднику (?P<to>.+)$", re.S),
+    "writeoff": re.compile(
+        r"^Списано (?P<qty>\d+)\s*шт\. (?P<product>.+) \((?P<from>.*)\)\. Причина: (?P<reason>.*)$", re.S
+    ),
+    "add_product": re.compile(r"^Добавлен товар: (?P<product>.+)$", re.S),
+    "delete_product": re.compile(r"^Удалён товар: (?P<product>.+)$", re.S),
+}
+
+
+def backfill_movements(conn, batch: int = 1000):
+    """
+    Переносит старые записи logs в stock_movements, разбирая Log.info.
+    Берутся только записи старше первого движения в журнале, так что
+    повторный запуск ничего не дублирует. Возвращает (перенесено, пропущено).
+    """
+    since = conn.scalar(select(func.min(StockMovement.ts)))
+    products = dict(conn.execute(select(Product.name, Product.id)).all())
+    users = {}
+    for uid, name in conn.execute(select(User.id, User.full_name).order_by(User.id)):
+        users.setdefault(name, uid)
+
+    query = select(Log).where(Log.action.in_(list(_LOG_PATTERNS))).order_by(Log.id)
+    if since is not None:
+        query = query.where(Log.timestamp < since)
+
+    moved = skipped = 0
+    rows = []
+    for log in conn.execute(query).yield_per(batch):
+        m = _LOG_PATTERNS[log.action].match(log.info or "")
+        if not m:
+            skipped += 1
+            continue
+
+        fields = m.groupdict()
+        rows.append({
+            "ts": log.timestamp,
+            "kind": log.action,
+            "product_id": products.get(fields["product"]),
+            "from_holder": users.get(fields.get("from")),  # «Склад» → NULL
+            "to_holder": users.get(fields.get("to")),
+            "qty": int(fields.get("qty") or 0),
+            "actor": log.user_id,
+            "reason": fields.get("reason"),
+        })
+        if len(rows) >= batch:
+            conn.execute(insert(StockMovement), rows)
+            moved += len(rows)
+            rows = []
+
+    if rows:
+        conn.execute(insert(StockMovement), rows)
+        moved += len(rows)
+    return moved, skipped
+
+
+def main() -> None:
+    engine.echo = False
+    init_db()  # схема и дубли остатков — ревизии Alembic
+    with engine.begin() as conn:
+        moved, skipped = backfill_movements(conn)
+    print(f"✅ Журнал движения: перенесено {moved}, не разобрано {skipped}")
+
+
+if __name__ == "__main__":
+    main()
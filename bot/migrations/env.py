@@ -0,0 +1,63 @@
+# bot/migrations/env.py
+from logging.config import fileConfig
+
+from alembic import context
+
+from bot.db import Base, engine
+import bot.models  # noqa: F401 — регистрирует таблицы в Base.metadata
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # поисковые индексы (FTS5 / pg_trgm) живут вне моделей — см. ревизию 0002
+    if reflected and compare_to is None and name and ("_fts" in name or name.endswith("_trgm")):
+        return False
+    return True
+
+
+def run_migrations_offline() -> None:
+    """Генерация SQL без подключения: alembic upgrade head --sql."""
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=engine.dialect.name == "sqlite",
+        include_object=include_object,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # init_db передаёт своё соединение, CLI — открываем сами
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+
+    with engine.connect() as connection:
+        _run(connection)
+
+
+def _run(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=connection.dialect.name == "sqlite",
+        include_object=include_object,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
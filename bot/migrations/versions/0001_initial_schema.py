@@ -0,0 +1,143 @@
+"""initial schema and hot-path indexes
+
+Базы, созданные раньше через create_all, уже содержат таблицы — поэтому
+ревизия создаёт только то, чего не хватает, схлопывает дубли остатков
+и добавляет индексы.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_tables(existing) -> None:
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("telegram_id", sa.String(64), nullable=False, unique=True),
+            sa.Column("full_name", sa.String(128)),
+            sa.Column("role", sa.String(16)),
+            sa.Column("created_at", sa.DateTime),
+        )
+    if "products" not in existing:
+        op.create_table(
+            "products",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("name", sa.String(100), nullable=False, unique=True),
+            sa.Column("created_at", sa.DateTime),
+        )
+    if "stocks" not in existing:
+        op.create_table(
+            "stocks",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("product_id", sa.Integer, sa.ForeignKey("products.id"), nullable=False),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id")),
+            sa.Column("quantity", sa.Integer, nullable=False),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("updated_at", sa.DateTime),
+        )
+    if "logs" not in existing:
+        op.create_table(
+            "logs",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("timestamp", sa.DateTime),
+            sa.Column("action", sa.String(64)),
+            sa.Column("user_id", sa.String(64)),
+            sa.Column("info", sa.Text),
+        )
+    if "join_requests" not in existing:
+        op.create_table(
+            "join_requests",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("telegram_id", sa.String(64), nullable=False, unique=True),
+            sa.Column("full_name", sa.String(128)),
+            sa.Column("created_at", sa.DateTime),
+        )
+    if "stock_movements" not in existing:
+        op.create_table(
+            "stock_movements",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("ts", sa.DateTime, nullable=False),
+            sa.Column("kind", sa.String(32), nullable=False),
+            sa.Column("product_id", sa.Integer),
+            sa.Column("from_holder", sa.Integer),
+            sa.Column("to_holder", sa.Integer),
+            sa.Column("qty", sa.Integer, nullable=False),
+            sa.Column("actor", sa.String(64)),
+            sa.Column("reason", sa.Text),
+        )
+
+
+def _merge_stock_duplicates(bind) -> None:
+    """Одна строка на (товар, держатель) — иначе уникальные индексы не создать."""
+    stocks = sa.table(
+        "stocks",
+        sa.column("id", sa.Integer),
+        sa.column("product_id", sa.Integer),
+        sa.column("user_id", sa.Integer),
+        sa.column("quantity", sa.Integer),
+    )
+    groups = bind.execute(
+        sa.select(stocks.c.product_id, stocks.c.user_id, sa.func.min(stocks.c.id), sa.func.sum(stocks.c.quantity))
+        .group_by(stocks.c.product_id, stocks.c.user_id)
+        .having(sa.func.count() > 1)
+    ).all()
+    for product_id, user_id, keep_id, total in groups:
+        holder = stocks.c.user_id.is_(None) if user_id is None else stocks.c.user_id == user_id
+        bind.execute(sa.update(stocks).where(stocks.c.id == keep_id).values(quantity=total))
+        bind.execute(sa.delete(stocks).where(stocks.c.product_id == product_id, holder, stocks.c.id != keep_id))
+
+
+# (имя, таблица, колонки, unique, условие частичного индекса)
+_INDEXES = [
+    ("ix_users_role", "users", ["role"], False, None),
+    ("ix_logs_timestamp", "logs", ["timestamp"], False, None),
+    ("ix_stocks_product_user", "stocks", ["product_id", "user_id"], False, None),
+    ("ix_stocks_user_id", "stocks", ["user_id"], False, None),
+    ("uq_stocks_product_user", "stocks", ["product_id", "user_id"], True, "user_id IS NOT NULL"),
+    ("uq_stocks_product_free", "stocks", ["product_id"], True, "user_id IS NULL"),
+    ("ix_movements_ts", "stock_movements", ["ts"], False, None),
+    ("ix_movements_kind_ts", "stock_movements", ["kind", "ts"], False, None),
+    ("ix_movements_product_ts", "stock_movements", ["product_id", "ts"], False, None),
+    ("ix_movements_from_ts", "stock_movements", ["from_holder", "ts"], False, None),
+    ("ix_movements_to_ts", "stock_movements", ["to_holder", "ts"], False, None),
+    ("ix_movements_actor_ts", "stock_movements", ["actor", "ts"], False, None),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    _create_tables(set(inspector.get_table_names()))
+    _merge_stock_duplicates(bind)
+
+    inspector = sa.inspect(bind)
+    for name, table, columns, unique, where in _INDEXES:
+        if name in {ix["name"] for ix in inspector.get_indexes(table)}:
+            continue
+        partial = {}
+        if where:
+            partial = dict(sqlite_where=sa.text(where), postgresql_where=sa.text(where))
+        op.create_index(name, table, columns, unique=unique, **partial)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, *_ in reversed(_INDEXES):
+        op.drop_index(name, table_name=table)
+    for table in ("stock_movements", "join_requests", "logs", "stocks", "products", "users"):
+        op.drop_table(table)
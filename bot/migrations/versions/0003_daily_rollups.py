@@ -0,0 +1,42 @@
+"""daily rollups of stock movements
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "daily_rollups",
+        sa.Column("day", sa.Date, primary_key=True),
+        sa.Column("kind", sa.String(32), primary_key=True),
+        sa.Column("product_id", sa.Integer, primary_key=True),
+        sa.Column("actor", sa.String(64), primary_key=True),
+        sa.Column("events", sa.Integer, nullable=False),
+        sa.Column("qty", sa.Integer, nullable=False),
+    )
+    op.create_table(
+        "rollup_state",
+        sa.Column("name", sa.String(32), primary_key=True),
+        sa.Column("last_id", sa.Integer, nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("rollup_state")
+    op.drop_table("daily_rollups")
@@ -0,0 +1,53 @@
+"""per-row folded flag on stock movements instead of a max-id watermark
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("stock_movements") as batch:
+        batch.add_column(sa.Column("folded", sa.Boolean, nullable=False, server_default=sa.text("false")))
+
+    # всё, что старая отметка уже свернула, помечаем свёрнутым
+    op.execute(
+        "UPDATE stock_movements SET folded = true "
+        "WHERE id <= COALESCE((SELECT last_id FROM rollup_state WHERE name = 'daily'), 0)"
+    )
+    op.create_index(
+        "ix_movements_unfolded", "stock_movements", ["id"],
+        sqlite_where=sa.text("folded = 0"), postgresql_where=sa.text("NOT folded"),
+    )
+    op.drop_table("rollup_state")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_table(
+        "rollup_state",
+        sa.Column("name", sa.String(32), primary_key=True),
+        sa.Column("last_id", sa.Integer, nullable=False),
+    )
+    # старая схема понимает только непрерывную отметку: до первого несвёрнутого
+    op.execute(
+        "INSERT INTO rollup_state (name, last_id) SELECT 'daily', "
+        "COALESCE((SELECT MIN(id) - 1 FROM stock_movements WHERE NOT folded), "
+        "(SELECT MAX(id) FROM stock_movements WHERE folded), 0)"
+    )
+    op.drop_index("ix_movements_unfolded", table_name="stock_movements")
+    with op.batch_alter_table("stock_movements") as batch:
+        batch.drop_column("folded")
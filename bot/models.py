@@ -1,7 +1,9 @@
 # bot/models.py
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Boolean, Column, Integer, String, Date, DateTime, ForeignKey, LargeBinary, Text, Index, case, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import relationship
 
 from bot.config import MANAGER_TELEGRAM_IDS
@@ -14,23 +16,26 @@ class User(Base):
     id = Column(Integer, primary_key=True)
     telegram_id = Column(String(64), unique=True, nullable=False)
     full_name = Column(String(128))
-    role = Column(String(16))  # "manager" | "employee"
+    role = Column(String(16), index=True)  # "manager" | "employee"
     created_at = Column(DateTime, default=datetime.now)
 
     stocks = relationship("Stock", back_populates="user")
 
     @staticmethod
-    def get_or_create(session, tg_user):
+    async def get_or_create(session, tg_user):
+        from bot.identity import identities
+
         uid = str(tg_user.id)
 
-        user = session.query(User).filter_by(telegram_id=uid).one_or_none()
+        user = await session.scalar(select(User).filter_by(telegram_id=uid))
         desired_role = "manager" if uid in MANAGER_TELEGRAM_IDS else "employee"
 
         if user:
             # ▶ если роль изменилась — обновим
             if user.role != desired_role:
                 user.role = desired_role
-                session.commit()
+                await session.commit()
+                identities.invalidate(uid)
             return user
 
         # ▶ создать нового
@@ -40,7 +45,8 @@ class User(Base):
             role=desired_role,
         )
         session.add(user)
-        session.commit()
+        await session.commit()
+        identities.invalidate(uid)
         return user
 
 
@@ -67,15 +73,168 @@ class Stock(Base):
     product = relationship("Product", back_populates="stocks")
     user = relationship("User", back_populates="stocks")
 
+    # одна строка остатка на (товар, держатель); склад — user_id IS NULL,
+    # а NULL в обычном UNIQUE не совпадают, поэтому два частичных индекса
+    __table_args__ = (
+        Index("ix_stocks_product_user", "product_id", "user_id"),
+        Index("ix_stocks_user_id", "user_id"),
+        Index(
+            "uq_stocks_product_user", "product_id", "user_id", unique=True,
+            sqlite_where=text("user_id IS NOT NULL"),
+            postgresql_where=text("user_id IS NOT NULL"),
+        ),
+        Index(
+            "uq_stocks_product_free", "product_id", unique=True,
+            sqlite_where=text("user_id IS NULL"),
+            postgresql_where=text("user_id IS NULL"),
+        ),
+    )
+
+    @staticmethod
+    async def adjust(session, product_id, user_id, delta):
+        """
+        Атомарно меняет остаток держателя на delta одним запросом
+        INSERT … ON CONFLICT DO UPDATE SET quantity = quantity + delta.
+        Возвращает итоговое количество.
+        """
+        insert = pg_insert if session.get_bind().dialect.name == "postgresql" else sqlite_insert
+        stmt = insert(Stock).values(product_id=product_id, user_id=user_id, quantity=delta)
+        if user_id is None:
+            target = dict(index_elements=["product_id"], index_where=Stock.user_id.is_(None))
+        else:
+            target = dict(index_elements=["product_id", "user_id"], index_where=Stock.user_id.isnot(None))
+        stmt = stmt.on_conflict_do_update(
+            **target,
+            set_={"quantity": Stock.quantity + stmt.excluded.quantity, "updated_at": datetime.now()},
+        ).returning(Stock.quantity)
+        return await session.scalar(stmt)
+
+    @staticmethod
+    async def adjust_many(session, deltas, user_id=None, chunk=500):
+        """
+        Adjust для многих товаров одного держателя: {product_id: delta} —
+        многострочными INSERT … ON CONFLICT DO UPDATE по chunk строк.
+        Возвращает {product_id: итоговое количество}.
+        """
+        insert = pg_insert if session.get_bind().dialect.name == "postgresql" else sqlite_insert
+        if user_id is None:
+            target = dict(index_elements=["product_id"], index_where=Stock.user_id.is_(None))
+        else:
+            target = dict(index_elements=["product_id", "user_id"], index_where=Stock.user_id.isnot(None))
+        items, totals = list(deltas.items()), {}
+        for lo in range(0, len(items), chunk):
+            stmt = insert(Stock).values([
+                {"product_id": pid, "user_id": user_id, "quantity": delta} for pid, delta in items[lo:lo + chunk]
+            ])
+            stmt = stmt.on_conflict_do_update(
+                **target,
+                set_={"quantity": Stock.quantity + stmt.excluded.quantity, "updated_at": datetime.now()},
+            ).returning(Stock.product_id, Stock.quantity)
+            totals.update((await session.execute(stmt)).all())
+        return totals
+
+    @staticmethod
+    async def take(session, qty, *, stock_id=None, product_id=None, user_id=None) -> bool:
+        """
+        Списывает qty с остатка, только если его хватает:
+        UPDATE … SET quantity = quantity - qty WHERE … AND quantity >= qty.
+        Строка задаётся stock_id либо парой (product_id, user_id; None — склад).
+        False — остаток успели уменьшить другие, ничего не изменено.
+        """
+        if stock_id is not None:
+            where = [Stock.id == stock_id]
+        else:
+            holder = Stock.user_id.is_(None) if user_id is None else Stock.user_id == user_id
+            where = [Stock.product_id == product_id, holder]
+        result = await session.execute(
+            update(Stock)
+            .where(*where, Stock.quantity >= qty)
+            .values(quantity=Stock.quantity - qty, updated_at=datetime.now())
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    @staticmethod
+    async def take_many(session, deltas, user_id=None) -> bool:
+        """
+        Take для многих товаров одного держателя одним UPDATE:
+        quantity = quantity - CASE product_id … END WHERE quantity >= того же CASE.
+        True — списано всё; False — какой-то строки не хватило, и вызывающий
+        должен откатить транзакцию (остальные строки уже уменьшены).
+        """
+        need = case(deltas, value=Stock.product_id)
+        holder = Stock.user_id.is_(None) if user_id is None else Stock.user_id == user_id
+        result = await session.execute(
+            update(Stock)
+            .where(Stock.product_id.in_(list(deltas)), holder, Stock.quantity >= need)
+            .values(quantity=Stock.quantity - need, updated_at=datetime.now())
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == len(deltas)
+
 class Log(Base):
     __tablename__ = "logs"
 
     id        = Column(Integer, primary_key=True)
-    timestamp = Column(DateTime, default=datetime.now)
+    timestamp = Column(DateTime, default=datetime.now, index=True)
     action    = Column(String(64))     # "add", "writeoff", "transfer", ...
     user_id   = Column(String(64))     # Telegram ID
     info      = Column(Text)           # что произошло
 
+class StockMovement(Base):
+    """Типизированный журнал движения остатков (Log.info — только для людей)."""
+    __tablename__ = "stock_movements"
+
+    id          = Column(Integer, primary_key=True)
+    ts          = Column(DateTime, default=datetime.now, nullable=False)
+    kind        = Column(String(32), nullable=False)  # те же значения, что Log.action
+    product_id  = Column(Integer)  # без FK: журнал переживает удаление товара
+    from_holder = Column(Integer)  # users.id; NULL — склад
+    to_holder   = Column(Integer)  # users.id; NULL — склад (или «никуда» для списания)
+    qty         = Column(Integer, nullable=False, default=0)
+    actor       = Column(String(64))  # Telegram ID
+    reason      = Column(Text)
+    folded      = Column(Boolean, nullable=False, default=False, server_default=text("false"))  # в daily_rollups
+
+    __table_args__ = (
+        Index("ix_movements_ts", "ts"),
+        Index("ix_movements_kind_ts", "kind", "ts"),
+        Index("ix_movements_product_ts", "product_id", "ts"),
+        Index("ix_movements_from_ts", "from_holder", "ts"),
+        Index("ix_movements_to_ts", "to_holder", "ts"),
+        Index("ix_movements_actor_ts", "actor", "ts"),
+        # ещё не свёрнутые в daily_rollups — обычно только хвост последних минут;
+        # запросы пишут folded == false(), чтобы условие совпало с индексом
+        Index(
+            "ix_movements_unfolded", "id",
+            sqlite_where=text("folded = 0"),
+            postgresql_where=text("NOT folded"),
+        ),
+    )
+
+
+class DailyRollup(Base):
+    """Суточные итоги stock_movements: день × действие × товар × автор."""
+    __tablename__ = "daily_rollups"
+
+    day        = Column(Date, primary_key=True)
+    kind       = Column(String(32), primary_key=True)
+    product_id = Column(Integer, primary_key=True)  # 0 — без товара
+    actor      = Column(String(64), primary_key=True)  # "" — неизвестен
+    events     = Column(Integer, nullable=False, default=0)
+    qty        = Column(Integer, nullable=False, default=0)
+
+
+class BotState(Base):
+    """Состояние бота между перезапусками: user_data и диалоги (см. bot/persistence.py)."""
+    __tablename__ = "bot_state"
+
+    kind       = Column(String(64), primary_key=True)  # "user" | "conv:<имя диалога>"
+    key        = Column(String(64), primary_key=True)  # user id | JSON-ключ диалога
+    data       = Column(LargeBinary, nullable=False)   # pickle
+    updated_at = Column(DateTime, default=datetime.now, nullable=False)
+
+
 class JoinRequest(Base):
     __tablename__ = "join_requests"
 
@@ -0,0 +1,209 @@
+# bot/notify.py
+"""
+Очередь исходящих уведомлений (менеджерам и т.п.).
+
+Хендлер кладёт сообщение в outbox и сразу отвечает пользователю, а
+доставляют его фоновые воркеры — параллельно, но в рамках лимитов Bot API:
+общий token bucket (~30 сообщений/с) и не чаще одного сообщения в секунду
+в один чат. RetryAfter приостанавливает всю отправку на указанное время,
+сетевые ошибки повторяются с паузой; учёт — в счётчиках stats().
+
+У каждого чата своя очередь (порядок сообщений в чат сохраняется), а в
+общую очередь ready попадает чат, чьё следующее сообщение уже можно слать.
+Чат, которому ещё рано, возвращается в ready таймером — воркер не спит
+ради одного чата, и всплеск в один чат не задерживает остальные. Записи
+о чате удаляются, как только у него нет сообщений и прошёл интервал.
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+from bot.config import NOTIFY_CHAT_INTERVAL, NOTIFY_QUEUE_SIZE, NOTIFY_RATE, NOTIFY_WORKERS
+
+MAX_ATTEMPTS = 5
+
+
+@dataclass
+class _Message:
+    chat_id: str
+    text: str
+    kwargs: dict = field(default_factory=dict)
+    attempts: int = 0
+
+
+def _seconds(retry_after) -> float:
+    # int в PTB 20–22, timedelta в более новых версиях
+    return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        self.paused_until = 0.0
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def take(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Outbox:
+    def __init__(self, rate=NOTIFY_RATE, chat_interval=NOTIFY_CHAT_INTERVAL,
+                 maxsize=NOTIFY_QUEUE_SIZE, workers=NOTIFY_WORKERS):
+        self.bucket = TokenBucket(rate)
+        self.chat_interval = chat_interval
+        self.maxsize = maxsize
+        self.workers = workers
+        self.ready = None      # chat_id, которым можно слать; каждый чат — не больше одного раза
+        self.bot = None
+        self._tasks = []
+        self._chats = {}       # chat_id → deque сообщений (есть, пока есть что слать)
+        self._chat_next = {}   # chat_id → когда можно слать следующее
+        self._pending = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.enqueued = self.delivered = self.failed = self.dropped = self.retried = 0
+
+    # ── API для хендлеров ───────────────────────────────────────────────────
+    def send(self, chat_id, text: str, **kwargs) -> bool:
+        """Поставить сообщение в очередь. False — очередь переполнена."""
+        if self._pending >= self.maxsize:
+            self.dropped += 1
+            print("‼️ outbox переполнен, сообщение отброшено:", chat_id)
+            return False
+        if self.ready is None:
+            self.ready = asyncio.Queue()
+        chat_id = str(chat_id)
+        pending = self._chats.get(chat_id)
+        if pending is None:
+            pending = self._chats[chat_id] = deque()
+            self._schedule(chat_id)
+        pending.append(_Message(chat_id, text, kwargs))
+        self._pending += 1
+        self._idle.clear()
+        self.enqueued += 1
+        return True
+
+    def broadcast(self, chat_ids, text: str, **kwargs) -> None:
+        for chat_id in chat_ids:
+            self.send(chat_id, text, **kwargs)
+
+    # ── жизненный цикл ──────────────────────────────────────────────────────
+    def start(self, bot) -> None:
+        self.bot = bot
+        if self.ready is None:
+            self.ready = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker(), name=f"outbox-{i}") for i in range(self.workers)]
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Дать очереди дослаться (не дольше timeout) и остановить воркеры."""
+        if self._tasks:
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # ── доставка ────────────────────────────────────────────────────────────
+    def _schedule(self, chat_id: str) -> None:
+        """Вернуть чат в ready, когда ему можно будет слать."""
+        wait = self._chat_next.get(chat_id, 0) - time.monotonic()
+        if wait > 0:
+            asyncio.get_running_loop().call_later(wait, self.ready.put_nowait, chat_id)
+        else:
+            self.ready.put_nowait(chat_id)
+
+    def _forget(self, chat_id: str) -> None:
+        if chat_id not in self._chats and self._chat_next.get(chat_id, 0) <= time.monotonic():
+            self._chat_next.pop(chat_id, None)
+
+    def _done(self, chat_id: str) -> None:
+        """Головное сообщение чата обработано (доставлено или брошено)."""
+        pending = self._chats[chat_id]
+        pending.popleft()
+        self._pending -= 1
+        if pending:
+            self._schedule(chat_id)
+        else:
+            del self._chats[chat_id]
+            wait = max(0.0, self._chat_next.get(chat_id, 0) - time.monotonic())
+            asyncio.get_running_loop().call_later(wait, self._forget, chat_id)
+        if not self._pending:
+            self._idle.set()
+
+    async def _worker(self) -> None:
+        while True:
+            chat_id = await self.ready.get()
+            try:
+                if await self._deliver(self._chats[chat_id][0]):
+                    self._done(chat_id)
+                else:
+                    self._schedule(chat_id)  # повтор того же сообщения, порядок не нарушается
+            except Exception as e:
+                self.failed += 1
+                print("‼️ ОШИБКА В outbox:", e)
+                self._done(chat_id)
+
+    async def _deliver(self, msg: _Message) -> bool:
+        """Одна попытка. True — с сообщением покончено, False — повторить позже."""
+        await self.bucket.take()
+        msg.attempts += 1
+        try:
+            await self.bot.send_message(msg.chat_id, msg.text, **msg.kwargs)
+        except RetryAfter as e:
+            self.bucket.pause(_seconds(e.retry_after))
+            error = e
+        except (Forbidden, BadRequest) as e:
+            # бот заблокирован, чат не найден, кривая разметка — повтор не поможет
+            self.failed += 1
+            print(f"‼️ уведомление {msg.chat_id} не доставлено:", e)
+            return True
+        except NetworkError as e:
+            self._chat_next[msg.chat_id] = time.monotonic() + min(30, 2 ** msg.attempts)
+            error = e
+        else:
+            self.delivered += 1
+            self._chat_next[msg.chat_id] = time.monotonic() + self.chat_interval
+            return True
+
+        if msg.attempts >= MAX_ATTEMPTS:
+            self.failed += 1
+            print(f"‼️ уведомление {msg.chat_id} не доставлено после {msg.attempts} попыток:", error)
+            return True
+        self.retried += 1
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._pending,
+            "chats": len(self._chat_next),
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "retried": self.retried,
+        }
+
+
+outbox = Outbox()
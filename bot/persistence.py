@@ -0,0 +1,194 @@
+# bot/persistence.py
+"""
+Хранение user_data и состояния диалогов в БД бота (таблица bot_state).
+
+Каждый пользователь и каждый активный диалог — отдельная строка, поэтому
+сохранение стоит столько, сколько ключей поменялось, а не весь объём, как у
+PicklePersistence. PTB раз в PERSISTENCE_INTERVAL отдаёт всё, что трогали
+апдейты; здесь значение сравнивается с последним записанным (по pickle) и
+в БД уходят только реально изменившиеся ключи — одной транзакцией.
+
+Завершённый диалог (и пустой user_data) удаляет свою строку, так что при
+старте читаются только незаконченные диалоги и user_data их участников;
+остальных пользователей подгружаем при первом апдейте (refresh_user_data).
+"""
+
+import asyncio
+import json
+import pickle
+from datetime import datetime
+
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from telegram.ext import BasePersistence, PersistenceInput
+
+from bot.config import PERSISTENCE_INTERVAL
+from bot.db import async_session
+from bot.models import BotState
+
+_USER = "user"
+
+
+def _conv(name: str) -> str:
+    return f"conv:{name}"
+
+
+class SqlPersistence(BasePersistence):
+    def __init__(self, update_interval: float = PERSISTENCE_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self._saved = {}   # (kind, key) → pickle, который сейчас лежит в БД
+        self._dirty = {}   # (kind, key) → новый pickle; None — удалить строку
+        self._known = set()  # пользователи, чьи строки уже прочитаны (или их нет)
+        self._flushing = None
+        self.writes = self.deletes = self.skipped = self.lazy_loads = 0
+
+    # ── запись ──────────────────────────────────────────────────────
+    def _mark(self, kind: str, key: str, value) -> None:
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL) if value not in (None, {}) else None
+        if blob == self._saved.get((kind, key)):
+            self._dirty.pop((kind, key), None)
+            self.skipped += 1
+        else:
+            self._dirty[(kind, key)] = blob
+
+    async def _write(self) -> None:
+        # update_* от одного прохода PTB запускаются разом (gather) — даём им
+        # всем отметиться и пишем одной транзакцией
+        await asyncio.sleep(0)
+        while self._dirty:
+            batch, self._dirty = self._dirty, {}
+            upserts = [{"kind": k, "key": key, "data": blob, "updated_at": datetime.now()}
+                       for (k, key), blob in batch.items() if blob is not None]
+            deletes = [(k, key) for (k, key), blob in batch.items() if blob is None]
+            try:
+                async with async_session() as session:
+                    if upserts:
+                        insert = pg_insert if session.get_bind().dialect.name == "postgresql" else sqlite_insert
+                        stmt = insert(BotState)
+                        stmt = stmt.on_conflict_do_update(
+                            index_elements=["kind", "key"],
+                            set_={"data": stmt.excluded.data, "updated_at": stmt.excluded.updated_at},
+                        )
+                        await session.execute(stmt, upserts)
+                    if deletes:
+                        await session.execute(delete(BotState).where(tuple_(BotState.kind, BotState.key).in_(deletes)))
+                    await session.commit()
+            except Exception:
+                # не потерять изменения: более свежие отметки важнее
+                self._dirty = {**batch, **self._dirty}
+                raise
+            for k, blob in batch.items():
+                if blob is None:
+                    self._saved.pop(k, None)
+                else:
+                    self._saved[k] = blob
+            self.writes += len(upserts)
+            self.deletes += len(deletes)
+
+    async def _flush_dirty(self) -> None:
+        if self._flushing is None or self._flushing.done():
+            self._flushing = asyncio.create_task(self._write())
+        await asyncio.shield(self._flushing)
+
+    # ── user_data ───────────────────────────────────────────────────
+    async def get_user_data(self) -> dict:
+        async with async_session() as session:
+            conv_keys = await session.scalars(select(BotState.key).where(BotState.kind.startswith("conv:")))
+            # ключ диалога — (chat_id, user_id): нужен только последний элемент
+            ids = {str(json.loads(k)[-1]) for k in conv_keys}
+            rows = (await session.execute(
+                select(BotState.key, BotState.data).where(BotState.kind == _USER, BotState.key.in_(ids))
+            )).all() if ids else []
+
+        data = {}
+        for key, blob in rows:
+            self._saved[(_USER, key)] = blob
+            data[int(key)] = pickle.loads(blob)
+        self._known.update(int(i) for i in ids)
+        return data
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        if user_id in self._known:
+            return
+        self._known.add(user_id)
+        async with async_session() as session:
+            blob = await session.scalar(
+                select(BotState.data).where(BotState.kind == _USER, BotState.key == str(user_id))
+            )
+        if blob is not None:
+            self._saved[(_USER, str(user_id))] = blob
+            # в памяти могло успеть появиться свежее — его не перетираем
+            user_data.update({k: v for k, v in pickle.loads(blob).items() if k not in user_data})
+            self.lazy_loads += 1
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._mark(_USER, str(user_id), data)
+        await self._flush_dirty()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._mark(_USER, str(user_id), None)
+        await self._flush_dirty()
+
+    # ── диалоги ─────────────────────────────────────────────────────
+    async def get_conversations(self, name: str) -> dict:
+        kind = _conv(name)
+        async with async_session() as session:
+            rows = (await session.execute(
+                select(BotState.key, BotState.data).where(BotState.kind == kind)
+            )).all()
+        conversations = {}
+        for key, blob in rows:
+            self._saved[(kind, key)] = blob
+            conversations[tuple(json.loads(key))] = pickle.loads(blob)
+        return conversations
+
+    async def update_conversation(self, name: str, key: tuple, new_state) -> None:
+        self._mark(_conv(name), json.dumps(list(key)), new_state)
+        await self._flush_dirty()
+
+    async def flush(self) -> None:
+        if self._flushing is not None:
+            await asyncio.gather(self._flushing, return_exceptions=True)
+        await self._write()
+
+    def stats(self) -> dict:
+        return {
+            "rows": len(self._saved),
+            "pending": len(self._dirty),
+            "writes": self.writes,
+            "deletes": self.deletes,
+            "skipped": self.skipped,
+            "lazy_loads": self.lazy_loads,
+        }
+
+    # ── не храним: chat_data, bot_data, callback_data ───────────────
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
@@ -0,0 +1,61 @@
+# bot/search.py
+"""
+Поиск товаров и сотрудников по части названия.
+
+SQLite — FTS5 с токенизатором trigram (таблицы *_fts из ревизии 0002),
+Postgres — ILIKE '%…%', который обслуживает GIN-индекс pg_trgm.
+Запросы короче трёх символов триграммам не по зубам — для них ищем
+по префиксу через обычный индекс на названии.
+"""
+
+from sqlalchemy import and_, literal_column, or_, select, table, column
+
+from bot.db import async_engine
+from bot.models import Product, User
+
+MIN_TRIGRAM = 3
+
+# модель → (колонка для поиска, FTS-таблица SQLite)
+_SEARCHABLE = {
+    Product: (Product.name, "products_fts"),
+    User: (User.full_name, "users_fts"),
+}
+
+
+def _prefix(col, q: str):
+    variants = {q, q[:1].upper() + q[1:]}
+    return or_(*(and_(col >= v, col < v + "\U0010ffff") for v in variants))
+
+
+def matches(model, q: str):
+    """Условие WHERE: строка model содержит q в названии."""
+    col, fts_name = _SEARCHABLE[model]
+    q = q.strip()
+    if len(q) < MIN_TRIGRAM:
+        return _prefix(col, q)
+
+    dialect = async_engine.dialect.name
+    if dialect == "sqlite":
+        fts = table(fts_name, column("rowid"))
+        phrase = '"' + q.replace('"', '""') + '"'
+        return model.id.in_(select(fts.c.rowid).where(literal_column(fts_name).op("MATCH")(phrase)))
+    return col.icontains(q, autoescape=True)
+
+
+async def search_products(session, q: str, limit: int = 20):
+    """[(id, name)] товаров, в названии которых встречается q."""
+    rows = await session.execute(
+        select(Product.id, Product.name).where(matches(Product, q)).order_by(Product.name).limit(limit)
+    )
+    return rows.all()
+
+
+async def search_employees(session, q: str, limit: int = 20):
+    """[(id, full_name)] сотрудников, в имени которых встречается q."""
+    rows = await session.execute(
+        select(User.id, User.full_name)
+        .where(User.role == "employee", matches(User, q))
+        .order_by(User.full_name)
+        .limit(limit)
+    )
+    return rows.all()
@@ -0,0 +1,130 @@
+# bot/sqlstats.py
+"""
+Сколько SQL стоит один апдейт — вместо echo=True.
+
+События before/after_cursor_execute движка пишут каждый запрос в «область»
+текущего апдейта (ContextVar; её открывает обёртка bot.tracing вокруг
+колбэка хендлера). По каждому хендлеру копится: вызовы, запросы, время в
+БД. Запрос дольше SQL_SLOW_MS печатается с замаскированными параметрами.
+Если один и тот же запрос за апдейт выполнился SQL_NPLUS1_MIN раз и больше —
+его число растёт с числом строк (N+1), апдейт помечается.
+"""
+
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from sqlalchemy import event
+
+from bot.config import SQL_NPLUS1_MIN, SQL_SLOW_MS
+
+_BACKGROUND = "фон"  # запросы вне хендлеров: задачи JobQueue, старт
+
+
+@dataclass
+class _Scope:
+    handler: str
+    statements: int = 0
+    db_time: float = 0.0
+    by_statement: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class HandlerSql:
+    calls: int = 0
+    statements: int = 0
+    db_time: float = 0.0
+    max_statements: int = 0
+    nplus1: int = 0
+    last_nplus1: Optional[str] = None
+
+
+current_scope: ContextVar[Optional[_Scope]] = ContextVar("sql_scope", default=None)
+per_handler: Dict[str, HandlerSql] = {}
+
+
+def _redact(params) -> str:
+    """Значения не печатаем — только их типы."""
+    if params is None:
+        return "—"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    if isinstance(params, (list, tuple)):
+        if params and isinstance(params[0], (list, tuple, dict)):
+            return f"{len(params)} × {_redact(params[0])}"
+        return "(" + ", ".join(type(v).__name__ for v in params) + ")"
+    return type(params).__name__
+
+
+def _short(statement: str, limit: int = 300) -> str:
+    s = " ".join(statement.split())
+    return s if len(s) <= limit else s[:limit - 1] + "…"
+
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("sql_started", []).append(time.perf_counter())
+
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["sql_started"].pop()
+    scope = current_scope.get()
+    if scope is not None:
+        scope.statements += 1
+        scope.db_time += elapsed
+        scope.by_statement[statement] = scope.by_statement.get(statement, 0) + 1
+        handler = scope.handler
+    else:
+        st = per_handler.setdefault(_BACKGROUND, HandlerSql())
+        st.statements += 1
+        st.db_time += elapsed
+        handler = _BACKGROUND
+
+    if elapsed * 1000 >= SQL_SLOW_MS:
+        print(f"🐢 медленный SQL в {handler}: {elapsed * 1000:.0f} мс\n    {_short(statement)}\n"
+              f"    параметры: {_redact(parameters)}")
+
+
+def _error(exc_context):
+    # упавший запрос до after_cursor_execute не доходит — снимаем его отметку
+    conn = exc_context.connection
+    if conn is not None and conn.info.get("sql_started"):
+        conn.info["sql_started"].pop()
+
+
+def install(engine) -> None:
+    """Подписать движок (sync или async_engine.sync_engine) на учёт запросов."""
+    event.listen(engine, "before_cursor_execute", _before)
+    event.listen(engine, "after_cursor_execute", _after)
+    event.listen(engine, "handle_error", _error)
+
+
+def begin(handler: str):
+    return current_scope.set(_Scope(handler))
+
+
+def end(token) -> None:
+    """Закрыть область апдейта и сложить её в статистику хендлера."""
+    scope = current_scope.get()
+    current_scope.reset(token)
+    if scope is None:
+        return
+
+    st = per_handler.setdefault(scope.handler, HandlerSql())
+    st.calls += 1
+    st.statements += scope.statements
+    st.db_time += scope.db_time
+    st.max_statements = max(st.max_statements, scope.statements)
+
+    repeated = [(n, s) for s, n in scope.by_statement.items() if n >= SQL_NPLUS1_MIN]
+    if repeated:
+        n, statement = max(repeated)
+        st.nplus1 += 1
+        st.last_nplus1 = _short(statement, 120)
+        print(f"⚠️ N+1 в {scope.handler}: один и тот же запрос {n} раз за апдейт "
+              f"(всего {scope.statements})\n    {_short(statement)}")
+
+
+def stats(top: int = 5) -> list:
+    """[(хендлер, HandlerSql)] — самые дорогие по суммарному времени в БД."""
+    return sorted(per_handler.items(), key=lambda kv: kv[1].db_time, reverse=True)[:top]
@@ -0,0 +1,104 @@
+# bot/stockviews.py
+"""
+Готовые тексты экранов «Остатки» (stock_list.show_stock) до следующей записи.
+
+Любой commit, в котором менялась таблица stocks (Stock.adjust/take и их
+пакетные версии, удаление товара, ORM-изменения Stock), поднимает version:
+слушатели сессий ниже отмечают запись, after_commit увеличивает версию.
+Тексты хранятся только для текущей версии, поэтому повторное открытие
+экрана между записями не делает ни одного запроса.
+
+С репликой (DATABASE_READ_URL) текст, прочитанный в первые
+READ_YOUR_WRITES_SECONDS после записи, не кешируется — реплика могла
+ещё не догнать основную базу.
+"""
+
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from bot import db
+from bot.config import READ_YOUR_WRITES_SECONDS
+from bot.models import Stock
+
+VIEWS_MAX = 4096  # «мои остатки» — по записи на сотрудника
+
+
+class StockViews:
+    def __init__(self):
+        self.version = 0
+        self.bumped_at = float("-inf")
+        self._views: dict = {}
+        self._views_version = 0
+        self.hits = self.misses = self.evictions = self.skipped = 0
+
+    def bump(self) -> None:
+        """Остатки изменились (после commit)."""
+        self.version += 1
+        self.bumped_at = time.monotonic()
+
+    async def cached(self, key, build) -> str:
+        """Текст экрана key для текущей версии остатков (или await build())."""
+        if self._views_version != self.version:
+            self._views.clear()
+            self._views_version = self.version
+        text = self._views.get(key)
+        if text is not None:
+            self.hits += 1
+            return text
+
+        self.misses += 1
+        version = self.version
+        text = await build()
+        if version != self.version:
+            return text  # пока строили, остатки поменялись — не сохраняем
+        if db.async_read_engine is not db.async_engine and time.monotonic() - self.bumped_at < READ_YOUR_WRITES_SECONDS:
+            self.skipped += 1
+            return text
+        if len(self._views) >= VIEWS_MAX:
+            self.evictions += len(self._views)
+            self._views.clear()
+        self._views[key] = text
+        return text
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._views) if self._views_version == self.version else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.version,
+            "skipped": self.skipped,
+        }
+
+
+stock_views = StockViews()
+
+
+# ── отметка записи в stocks (для всех сессий, включая async) ───────────────
+@event.listens_for(Session, "do_orm_execute")
+def _on_execute(state) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        table = getattr(state.statement, "table", None)
+        if table is not None and table.name == Stock.__tablename__:
+            state.session.info["stock_changed"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _on_flush(session, _flush_context) -> None:
+    if any(isinstance(obj, Stock) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["stock_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _on_commit(session) -> None:
+    if session.info.pop("stock_changed", False):
+        stock_views.bump()
+
+
+@event.listens_for(Session, "after_rollback")
+def _on_rollback(session) -> None:
+    session.info.pop("stock_changed", None)
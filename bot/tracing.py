@@ -0,0 +1,95 @@
+# bot/tracing.py
+"""
+Привязка работы к хендлеру: какой колбэк сейчас обрабатывает апдейт.
+
+instrument(app) оборачивает колбэки всех зарегистрированных хендлеров
+(включая состояния ConversationHandler) — внутри обёртки известно имя
+хендлера вида «transfer_stock.enter_qty» и id апдейта, а SQL-запросы
+считаются на этот хендлер (bot.sqlstats), а время обработки — в его
+гистограмму (bot.metrics) с меткой состояния диалога и паттерна.
+"""
+
+import asyncio
+import functools
+import time
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional, Tuple
+
+from telegram.ext import Application, BaseHandler, ConversationHandler
+
+from bot import db, metrics, sqlstats
+
+# имя хендлера, в контексте которого выполняется код
+current_handler: ContextVar[Optional[str]] = ContextVar("current_handler", default=None)
+
+# task → (хендлер, update_id); читается из других потоков (watchdog)
+active: Dict[asyncio.Task, Tuple[str, Optional[int]]] = {}
+
+
+def handler_name(callback) -> str:
+    """bot.handlers.transfer_stock.enter_qty → «transfer_stock.enter_qty»."""
+    module = getattr(callback, "__module__", "") or ""
+    return f"{module.rsplit('.', 1)[-1]}.{getattr(callback, '__qualname__', repr(callback))}"
+
+
+def iter_handlers(handlers: Iterable[BaseHandler], state: str = ""):
+    """(хендлер, состояние) — включая вложенные в ConversationHandler.
+
+    Состояние — «имя_диалога:номер», «имя_диалога:entry» / «:fallback»;
+    у хендлеров вне диалогов пустое.
+    """
+    for h in handlers:
+        if isinstance(h, ConversationHandler):
+            conv = h.name or "conversation"
+            yield from iter_handlers(h.entry_points, f"{conv}:entry")
+            for key, state_handlers in h.states.items():
+                yield from iter_handlers(state_handlers, f"{conv}:{key}")
+            yield from iter_handlers(h.fallbacks, f"{conv}:fallback")
+        else:
+            yield h, state
+
+
+def _pattern(handler: BaseHandler) -> str:
+    pattern = getattr(handler, "pattern", None)
+    return getattr(pattern, "pattern", None) or (pattern if isinstance(pattern, str) else "")
+
+
+def _wrap(callback, state: str = "", pattern: str = ""):
+    name = handler_name(callback)
+    hist = metrics.handler_histogram(name, state, pattern)
+
+    @functools.wraps(callback)
+    async def traced(update, context):
+        started = time.perf_counter()
+        token = current_handler.set(name)
+        sql_token = sqlstats.begin(name)
+        user = getattr(update, "effective_user", None)
+        actor_token = db.current_actor.set(user.id if user else None)  # read-your-writes
+        task = asyncio.current_task()
+        prev = active.get(task)
+        active[task] = (name, getattr(update, "update_id", None))
+        try:
+            return await callback(update, context)
+        except Exception as e:
+            e.__handler__ = name  # для счётчика ошибок в error handler
+            raise
+        finally:
+            hist.observe(time.perf_counter() - started)
+            if prev is None:
+                active.pop(task, None)
+            else:
+                active[task] = prev
+            db.current_actor.reset(actor_token)
+            sqlstats.end(sql_token)
+            current_handler.reset(token)
+
+    traced.__traced__ = True
+    return traced
+
+
+def instrument(app: Application) -> None:
+    """Оборачивает колбэки всех хендлеров приложения (повторный вызов безопасен)."""
+    for group in app.handlers.values():
+        for h, state in iter_handlers(group):
+            if not getattr(h.callback, "__traced__", False):
+                h.callback = _wrap(h.callback, state, _pattern(h))
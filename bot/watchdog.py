@@ -0,0 +1,157 @@
+# bot/watchdog.py
+"""
+Сторож event loop: замечает, когда цикл не отвечает дольше порога,
+и фиксирует, какой хендлер его держит (плюс стек в момент зависания).
+
+Фоновый поток раз в interval ставит в loop «пинг» и ждёт ответа.
+Если ответа нет дольше threshold — снимает стек потока event loop,
+пока тот ещё заблокирован, и после «отвисания» записывает длительность.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from telegram import Update
+from telegram.ext import CommandHandler, ContextTypes
+
+from bot import tracing
+from bot.config import (
+    MANAGER_TELEGRAM_IDS,
+    WATCHDOG_INTERVAL_MS,
+    WATCHDOG_REPORT_SECONDS,
+    WATCHDOG_THRESHOLD_MS,
+)
+
+
+@dataclass
+class Stall:
+    at: datetime
+    lag_ms: float
+    handler: str
+    update_id: Optional[int]
+    stack: str
+
+
+class LoopWatchdog:
+    def __init__(self, threshold_ms: int, interval_ms: int, report_seconds: int, history: int = 200):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.report_seconds = report_seconds
+        self.stalls: deque = deque(maxlen=history)
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.samples = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ── запуск / остановка (вызываются из event loop) ─────────────────────
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+
+    # ── фоновый поток ────────────────────────────────────────────────────
+    def _run(self) -> None:
+        next_report = time.monotonic() + self.report_seconds
+        while not self._stop.is_set():
+            pong = threading.Event()
+            sent = time.monotonic()
+            try:
+                self._loop.call_soon_threadsafe(pong.set)
+            except RuntimeError:  # loop закрыт
+                return
+
+            stall = None
+            if not pong.wait(self.threshold):
+                # loop всё ещё занят — снимаем стек, пока виновник на месте
+                stall = self._capture()
+                while not pong.wait(0.5):
+                    if self._stop.is_set():
+                        return
+
+            lag_ms = (time.monotonic() - sent) * 1000
+            self.last_lag_ms = lag_ms
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            self.samples += 1
+            if stall:
+                stall.lag_ms = lag_ms
+                self.stalls.append(stall)
+                print(f"🐢 event loop завис на {lag_ms:.0f} мс: {stall.handler} (update {stall.update_id})")
+
+            if self.report_seconds and time.monotonic() >= next_report:
+                next_report = time.monotonic() + self.report_seconds
+                if self.stalls:
+                    print(self.summary())
+
+            self._stop.wait(self.interval)
+
+    def _capture(self) -> Stall:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        handler, update_id = None, None
+
+        # 1) самый внешний кадр из bot.handlers в стеке потока loop
+        f = frame
+        while f is not None:
+            module = f.f_globals.get("__name__", "")
+            if module.startswith("bot.handlers."):
+                handler = f"{module.rsplit('.', 1)[-1]}.{f.f_code.co_name}"
+            f = f.f_back
+
+        # 2) если стек не дошёл до хендлера (greenlet, C-код) — по текущей задаче
+        current = getattr(asyncio.tasks, "_current_tasks", {}).get(self._loop)
+        if current is not None and current in tracing.active:
+            name, update_id = tracing.active[current]
+            handler = handler or name
+
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+        return Stall(datetime.now(), 0.0, handler or "?", update_id, stack)
+
+    # ── сводка ───────────────────────────────────────────────────────────
+    def summary(self) -> str:
+        by_handler = {}
+        for s in self.stalls:
+            cnt, total, worst = by_handler.get(s.handler, (0, 0.0, 0.0))
+            by_handler[s.handler] = (cnt + 1, total + s.lag_ms, max(worst, s.lag_ms))
+
+        lines = [
+            f"🐢 Зависания event loop (> {self.threshold * 1000:.0f} мс), последние {len(self.stalls)}:",
+            f"текущая задержка {self.last_lag_ms:.0f} мс, максимум {self.max_lag_ms:.0f} мс",
+        ]
+        for name, (cnt, total, worst) in sorted(by_handler.items(), key=lambda kv: -kv[1][1]):
+            lines.append(f"• {name}: {cnt} раз, всего {total:.0f} мс, макс {worst:.0f} мс")
+        return "\n".join(lines)
+
+
+watchdog = LoopWatchdog(WATCHDOG_THRESHOLD_MS, WATCHDOG_INTERVAL_MS, WATCHDOG_REPORT_SECONDS)
+
+
+# ── /lag для менеджеров ──────────────────────────────────────────────────────
+async def lag_command(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
+    if str(update.effective_user.id) not in MANAGER_TELEGRAM_IDS:
+        return
+
+    text = watchdog.summary() if watchdog.stalls else "✅ Зависаний event loop не было."
+    if "-v" in (ctx.args or []) and watchdog.stalls:
+        last = watchdog.stalls[-1]
+        text += f"\n\nПоследнее ({last.handler}, {last.lag_ms:.0f} мс):\n{last.stack[-3000:]}"
+    await update.message.reply_text(text)
+
+
+def get_handler() -> CommandHandler:
+    return CommandHandler("lag", lag_command)
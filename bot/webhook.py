@@ -0,0 +1,123 @@
+# bot/webhook.py
+"""
+Режим webhook: свой tornado-сервер вместо run_polling().
+
+    POST <WEBHOOK_PATH>  — апдейты от Telegram (проверяется секретный заголовок)
+    GET  /healthz        — жив ли бот и сколько апдейтов ждёт в очереди
+
+Сервер слушает WEBHOOK_LISTEN:WEBHOOK_PORT — обычно за reverse proxy,
+который терминирует TLS. Если задан WEBHOOK_URL, при старте боту
+регистрируется webhook <WEBHOOK_URL><WEBHOOK_PATH>; без него сервер просто
+принимает POST'ы — так его можно гонять локально синтетическими апдейтами.
+
+Без WEBHOOK_SECRET апдейты не проверить: кто угодно прислал бы апдейт от
+имени менеджера. Поэтому без секрета сервер стартует только на loopback и
+без WEBHOOK_URL — иначе check_secret() останавливает запуск.
+"""
+
+import asyncio
+import json
+import signal
+from http import HTTPStatus
+
+import tornado.web
+from telegram import Update
+from telegram.ext import Application
+
+from bot.config import (
+    WEBHOOK_LISTEN, WEBHOOK_MAX_CONNECTIONS, WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_SECRET, WEBHOOK_URL,
+)
+
+
+_LOOPBACK = {"127.0.0.1", "::1", "localhost"}
+
+
+def check_secret(listen: str, url: str = WEBHOOK_URL, secret: str = WEBHOOK_SECRET) -> None:
+    """Не запускать webhook без секрета там, где до него достучится чужой."""
+    if secret:
+        return
+    if url:
+        raise RuntimeError("WEBHOOK_URL задан, а WEBHOOK_SECRET — нет: апдейты можно было бы подделать")
+    if listen not in _LOOPBACK:
+        raise RuntimeError(f"без WEBHOOK_SECRET webhook слушает только localhost, а не {listen}")
+
+
+class UpdateHandler(tornado.web.RequestHandler):
+    def initialize(self, app: Application, secret: str) -> None:
+        self.app = app
+        self.secret = secret
+
+    async def post(self) -> None:
+        if self.secret and self.request.headers.get("X-Telegram-Bot-Api-Secret-Token") != self.secret:
+            raise tornado.web.HTTPError(HTTPStatus.FORBIDDEN)
+        try:
+            update = Update.de_json(json.loads(self.request.body), self.app.bot)
+        except Exception as e:
+            print("‼️ webhook: кривой апдейт:", e)
+            raise tornado.web.HTTPError(HTTPStatus.BAD_REQUEST)
+        await self.app.update_queue.put(update)
+        self.set_status(HTTPStatus.OK)
+
+    def log_exception(self, typ, value, tb) -> None:
+        # 403/400 — не повод для трейсбека в логе
+        if not isinstance(value, tornado.web.HTTPError):
+            super().log_exception(typ, value, tb)
+
+
+class HealthHandler(tornado.web.RequestHandler):
+    def initialize(self, app: Application, **_) -> None:
+        self.app = app
+
+    def get(self) -> None:
+        ok = self.app.running
+        self.set_status(HTTPStatus.OK if ok else HTTPStatus.SERVICE_UNAVAILABLE)
+        self.write({"ok": ok, "pending_updates": self.app.update_queue.qsize()})
+
+
+def make_app(app: Application, path: str = WEBHOOK_PATH, secret: str = WEBHOOK_SECRET) -> tornado.web.Application:
+    """tornado-приложение с маршрутами бота (удобно и для локальных прогонов)."""
+    args = {"app": app, "secret": secret}
+    return tornado.web.Application([
+        (path, UpdateHandler, args),
+        (r"/healthz", HealthHandler, args),
+    ])
+
+
+async def serve(app: Application, listen: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT, stop: asyncio.Event = None) -> None:
+    """Запустить бота в режиме webhook и работать до SIGINT/SIGTERM (или stop.set())."""
+    if stop is None:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+    check_secret(listen)
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+
+    server = make_app(app).listen(port, address=listen, xheaders=True)
+    if WEBHOOK_URL:
+        await app.bot.set_webhook(
+            url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET or None,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=Update.ALL_TYPES,
+        )
+    print(f"🌐 webhook: слушаю {listen}:{port}{WEBHOOK_PATH}")
+
+    try:
+        await stop.wait()
+    finally:
+        server.stop()
+        await app.stop()
+        if app.post_stop:
+            await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+
+
+def run(app: Application) -> None:
+    asyncio.run(serve(app))
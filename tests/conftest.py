@@ -0,0 +1,21 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from bot import db
+
+
+@pytest.fixture
+def engines(tmp_path):
+    """(sync, async) движки на пустой SQLite-базе во временном каталоге."""
+    sync_engine, async_engine = db.create_engines(f"sqlite:///{tmp_path / 'bot.db'}", "tuned")
+    db.Base.metadata.create_all(sync_engine)
+    yield sync_engine, async_engine
+    sync_engine.dispose()
+    asyncio.run(async_engine.dispose())
+
+
+@pytest.fixture
+def make_session(engines):
+    return async_sessionmaker(engines[1], expire_on_commit=False)
@@ -0,0 +1,87 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event, insert, select
+
+from bot import keyboards, stockviews
+from bot.catalog import Catalog
+from bot.keyboards import CatalogPicker
+from bot.models import Product, Stock
+from bot.stockviews import StockViews
+
+
+@pytest.fixture
+def cat(engines, monkeypatch):
+    """Свежие каталог и версия остатков вместо общих на процесс."""
+    catalog, views = Catalog(), StockViews()
+    monkeypatch.setattr(keyboards, "catalog", catalog)
+    monkeypatch.setattr(keyboards, "stock_views", views)
+    monkeypatch.setattr(stockviews, "stock_views", views)
+    with engines[0].begin() as conn:
+        conn.execute(insert(Product), [{"id": i, "name": name} for i, name in ((1, "Каска"), (2, "Перчатки"), (3, "Скотч"))])
+        conn.execute(insert(Stock), [{"product_id": 1, "quantity": 5}, {"product_id": 2, "quantity": 1}])
+    return catalog
+
+
+@pytest.fixture
+def statements(engines):
+    count = [0]
+    event.listen(engines[1].sync_engine, "before_cursor_execute", lambda *a: count.__setitem__(0, count[0] + 1))
+    return count
+
+
+def _in_stock(ctx):
+    return select(Stock.product_id).filter(Stock.user_id.is_(None), Stock.quantity > 0)
+
+
+async def _open(make_session, picker, ctx):
+    async with make_session() as session:
+        return await picker.keyboard(session, ctx)
+
+
+def _ids(markup):
+    return [int(b.callback_data) for row in markup.inline_keyboard for b in row if b.callback_data.isdigit()]
+
+
+def test_pages_are_cached_until_stock_or_catalog_changes(make_session, cat, statements):
+    picker, ctx = CatalogPicker("t", allowed=_in_stock), SimpleNamespace(user_data={})
+
+    async def run():
+        first = await _open(make_session, picker, ctx)
+        before = statements[0]
+        again = await _open(make_session, picker, ctx)
+        repeat_sql = statements[0] - before
+
+        async with make_session() as session:  # приход на склад — новая версия остатков
+            await Stock.adjust(session, 3, None, 4)
+            await session.commit()
+        after_stock = await _open(make_session, picker, ctx)
+
+        async with make_session() as session:
+            session.add_all([Product(id=4, name="Бахилы"), Stock(product_id=4, quantity=2)])
+            await session.commit()
+        cat.bump()
+        after_catalog = await _open(make_session, picker, ctx)
+        return first, again, repeat_sql, after_stock, after_catalog
+
+    first, again, repeat_sql, after_stock, after_catalog = asyncio.run(run())
+    assert _ids(first) == [1, 2]
+    assert again is first and repeat_sql == 0
+    assert _ids(after_stock) == [1, 2, 3]
+    assert _ids(after_catalog) == [4, 1, 2, 3]
+
+
+def test_per_user_filter_is_not_cached(make_session, cat, statements):
+    picker = CatalogPicker("t", allowed=_in_stock, per_user=True)
+    ctx = SimpleNamespace(user_data={})
+
+    async def run():
+        await _open(make_session, picker, ctx)
+        before = statements[0]
+        markup = await _open(make_session, picker, ctx)
+        return markup, statements[0] - before
+
+    markup, sql = asyncio.run(run())
+    assert _ids(markup) == [1, 2]
+    assert sql > 0
@@ -0,0 +1,41 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from bot import export
+from bot.models import Log
+
+openpyxl = pytest.importorskip("openpyxl")
+pytest.importorskip("xlsxwriter")
+
+
+def test_xlsx_rolls_over_to_new_sheet(engines, make_session, monkeypatch):
+    monkeypatch.setattr(export._Xlsx, "rows_per_sheet", 3)
+    t0 = datetime(2026, 10, 1, 9)
+    with engines[0].begin() as conn:
+        conn.execute(insert(Log), [
+            {"timestamp": t0 + timedelta(minutes=i), "action": "add_stock", "user_id": "500", "info": f"строка {i}"}
+            for i in range(7)
+        ])
+
+    async def run():
+        async with make_session() as session:
+            return await export.export_logs(session, t0, t0 + timedelta(days=1), "xlsx")
+
+    path, count = asyncio.run(run())
+    try:
+        wb = openpyxl.load_workbook(path, read_only=True)
+        sheets = {ws.title: [row[3] for row in ws.iter_rows(values_only=True)] for ws in wb.worksheets}
+        wb.close()
+    finally:
+        os.remove(path)
+
+    assert count == 7
+    assert sheets == {
+        "Журнал": ["Описание", "строка 0", "строка 1", "строка 2"],
+        "Журнал (2)": ["Описание", "строка 3", "строка 4", "строка 5"],
+        "Журнал (3)": ["Описание", "строка 6"],
+    }
@@ -0,0 +1,63 @@
+import pytest
+
+from bot.intake import parse
+
+
+def _csv(tmp_path, text, encoding="utf-8"):
+    path = tmp_path / "intake.csv"
+    path.write_bytes(text.encode(encoding))
+    return str(path)
+
+
+def test_utf8_multibyte_char_on_64k_boundary(tmp_path):
+    head, line = "Товар;Количество;".encode(), "Перчатки;1\n".encode()
+    # добиваем заголовок так, чтобы граница 64 КБ пришлась внутрь «П»
+    pad = (64 * 1024 - len(head) - 1 - 1) % len(line)
+    body = head + b"-" * pad + b"\n" + line * (64 * 1024 // len(line) + 10)
+    with pytest.raises(UnicodeDecodeError):
+        body[:64 * 1024].decode("utf-8")
+
+    path = tmp_path / "intake.csv"
+    path.write_bytes(body)
+    _, totals, rejected = parse(str(path), ".csv")
+    assert list(totals) == ["Перчатки"]
+    assert totals["Перчатки"][0] == 64 * 1024 // len(line) + 10
+    assert rejected == []
+
+
+def test_cp1251(tmp_path):
+    _, totals, rejected = parse(_csv(tmp_path, "Перчатки;5\nКаска;2\n", "cp1251"), ".csv")
+    assert totals == {"Перчатки": [5, 1], "Каска": [2, 2]}
+    assert rejected == []
+
+
+@pytest.mark.parametrize("text, by_id, totals", [
+    ("Товар;Количество\nПерчатки;5\n", False, {"Перчатки": [5, 2]}),
+    ("Наименование,Кол-во\nПерчатки,5\n", False, {"Перчатки": [5, 2]}),
+    ("id;qty\n7;5\n12;1\n", True, {7: [5, 2], 12: [1, 3]}),
+    ("Артикул\tКоличество\n7\t5\n", True, {7: [5, 2]}),
+    ("Перчатки;5\nКаска;2\n", False, {"Перчатки": [5, 1], "Каска": [2, 2]}),
+])
+def test_header(tmp_path, text, by_id, totals):
+    assert parse(_csv(tmp_path, text), ".csv")[:2] == (by_id, totals)
+
+
+def test_bad_qty_in_first_row_is_rejected_not_header(tmp_path):
+    by_id, totals, rejected = parse(_csv(tmp_path, "Перчатки;пять\nКаска;2\n"), ".csv")
+    assert by_id is False
+    assert totals == {"Каска": [2, 2]}
+    assert rejected == [(1, "Перчатки", "количество — не целое положительное число")]
+
+
+def test_id_mode_rejects_non_numeric(tmp_path):
+    by_id, totals, rejected = parse(_csv(tmp_path, "sku;qty\n7;5\nабв;1\n"), ".csv")
+    assert by_id is True
+    assert totals == {7: [5, 2]}
+    assert rejected == [(3, "абв", "id — не число")]
+
+
+def test_duplicates_are_summed(tmp_path):
+    text = "Перчатки;5\nКаска;1\n  Перчатки ; 1 000\nПерчатки;-3\n"
+    _, totals, rejected = parse(_csv(tmp_path, text), ".csv")
+    assert totals == {"Перчатки": [1005, 1], "Каска": [1, 2]}
+    assert [n for n, _, _ in rejected] == [4]
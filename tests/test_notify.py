@@ -0,0 +1,96 @@
+import asyncio
+import time
+from datetime import timedelta
+
+from telegram.error import Forbidden, NetworkError, RetryAfter
+
+from bot.notify import Outbox
+
+
+class FakeBot:
+    def __init__(self, failures=None):
+        self.sent = []                    # (время, chat_id, текст)
+        self.failures = failures or {}    # текст → [исключения по очереди]
+
+    async def send_message(self, chat_id, text, **kwargs):
+        errors = self.failures.get(text)
+        if errors:
+            raise errors.pop(0)
+        self.sent.append((time.monotonic(), chat_id, text))
+
+
+async def _deliver(outbox, bot, sends, timeout=5):
+    outbox.start(bot)
+    for chat_id, text in sends:
+        outbox.send(chat_id, text)
+    await asyncio.wait_for(outbox._idle.wait(), timeout)
+    await outbox.stop()
+
+
+def test_chat_order_kept_while_other_chats_are_served():
+    interval = 0.05
+    outbox, bot = Outbox(rate=1000, chat_interval=interval, workers=4), FakeBot()
+    sends = [("A", f"a{i}") for i in range(5)] + [("B", "b0"), ("C", "c0")]
+    asyncio.run(_deliver(outbox, bot, sends))
+
+    a = [(t, text) for t, chat, text in bot.sent if chat == "A"]
+    assert [text for _, text in a] == [f"a{i}" for i in range(5)]
+    assert all(t2 - t1 >= interval * 0.9 for (t1, _), (t2, _) in zip(a, a[1:]))
+    # всплеск в чат A не задерживает B и C: они уходят раньше второго сообщения A
+    first_b = next(t for t, chat, _ in bot.sent if chat == "B")
+    first_c = next(t for t, chat, _ in bot.sent if chat == "C")
+    assert max(first_b, first_c) < a[1][0]
+    assert outbox.stats()["delivered"] == 7
+
+
+def test_retry_after_pauses_all_chats_and_keeps_order():
+    outbox = Outbox(rate=1000, chat_interval=0, workers=2)
+    bot = FakeBot({"a0": [RetryAfter(timedelta(milliseconds=200))]})
+    t0 = time.monotonic()
+    asyncio.run(_deliver(outbox, bot, [("A", "a0"), ("A", "a1"), ("B", "b0")]))
+
+    assert [text for _, chat, text in bot.sent if chat == "A"] == ["a0", "a1"]
+    # повтор a0 и следующее a1 ждут паузу, заданную RetryAfter
+    assert all(t - t0 >= 0.19 for t, chat, _ in bot.sent if chat == "A")
+    assert outbox.bucket.paused_until > t0
+    st = outbox.stats()
+    assert (st["delivered"], st["retried"], st["failed"]) == (3, 1, 0)
+
+
+def test_network_error_is_retried_and_forbidden_is_dropped():
+    outbox = Outbox(rate=1000, chat_interval=0, workers=2)
+    bot = FakeBot({"a0": [NetworkError("x")], "b0": [Forbidden("blocked")]})
+    asyncio.run(_deliver(outbox, bot, [("A", "a0"), ("A", "a1"), ("B", "b0"), ("B", "b1")]))
+
+    assert [text for _, chat, text in bot.sent if chat == "A"] == ["a0", "a1"]
+    assert [text for _, chat, text in bot.sent if chat == "B"] == ["b1"]
+    # пауза после сетевой ошибки — только для чата A
+    assert [text for _, _, text in bot.sent][0] == "b1"
+    st = outbox.stats()
+    assert (st["delivered"], st["retried"], st["failed"], st["queued"]) == (3, 1, 1, 0)
+
+
+def test_idle_chats_are_forgotten():
+    async def run():
+        outbox = Outbox(rate=1000, chat_interval=0.05, workers=2)
+        outbox.start(FakeBot())
+        outbox.broadcast([f"c{i}" for i in range(20)], "hi")
+        await asyncio.wait_for(outbox._idle.wait(), 5)
+        await asyncio.sleep(0.1)
+        stats = outbox.stats()
+        await outbox.stop()
+        return stats, outbox._chats, outbox._chat_next
+
+    stats, chats, chat_next = asyncio.run(run())
+    assert stats["delivered"] == 20
+    assert chats == {} and chat_next == {}
+
+
+def test_send_refuses_when_full():
+    async def run():
+        outbox = Outbox(maxsize=2)
+        return [outbox.send("A", str(i)) for i in range(3)], outbox.stats()
+
+    results, stats = asyncio.run(run())
+    assert results == [True, True, False]
+    assert (stats["queued"], stats["dropped"]) == (2, 1)
@@ -0,0 +1,78 @@
+import asyncio
+import pickle
+
+import pytest
+from sqlalchemy import select
+
+from bot import persistence
+from bot.models import BotState
+from bot.persistence import SqlPersistence
+
+
+@pytest.fixture(autouse=True)
+def use_test_db(make_session, monkeypatch):
+    monkeypatch.setattr(persistence, "async_session", make_session)
+
+
+async def _rows(make_session):
+    async with make_session() as session:
+        rows = (await session.execute(select(BotState.kind, BotState.key, BotState.data))).all()
+    return {(kind, key): pickle.loads(data) for kind, key, data in rows}
+
+
+def test_only_changed_keys_are_written(make_session):
+    async def run():
+        p = SqlPersistence()
+        await asyncio.gather(*(p.update_user_data(uid, {"step": 1}) for uid in (1, 2, 3)))
+        first = dict(p.stats())
+        await asyncio.gather(
+            p.update_user_data(1, {"step": 1}),
+            p.update_user_data(2, {"step": 1}),
+            p.update_user_data(3, {"step": 2}),
+        )
+        return first, p.stats(), await _rows(make_session)
+
+    first, second, rows = asyncio.run(run())
+    assert (first["writes"], first["skipped"]) == (3, 0)
+    assert (second["writes"], second["skipped"], second["pending"]) == (4, 2, 0)
+    assert rows == {("user", "1"): {"step": 1}, ("user", "2"): {"step": 1}, ("user", "3"): {"step": 2}}
+
+
+def test_finished_conversation_and_empty_user_data_delete_rows(make_session):
+    async def run():
+        p = SqlPersistence()
+        await p.update_conversation("transfer", (10, 1), 3)
+        await p.update_user_data(1, {"product": 7})
+        before = await _rows(make_session)
+        await p.update_conversation("transfer", (10, 1), None)  # ConversationHandler.END
+        await p.update_user_data(1, {})
+        return before, await _rows(make_session), p.stats()
+
+    before, after, stats = asyncio.run(run())
+    assert before == {("conv:transfer", "[10, 1]"): 3, ("user", "1"): {"product": 7}}
+    assert after == {}
+    assert (stats["deletes"], stats["rows"]) == (2, 0)
+
+
+def test_restart_loads_open_conversations_and_their_users_lazily_the_rest(make_session):
+    async def run():
+        p = SqlPersistence()
+        await p.update_conversation("transfer", (10, 1), 2)
+        await p.update_user_data(1, {"product": 7})
+        await p.update_user_data(2, {"product": 8, "qty": 1})
+
+        restarted = SqlPersistence()
+        conversations = await restarted.get_conversations("transfer")
+        user_data = await restarted.get_user_data()
+        fresh = {"qty": 5}  # успело появиться в памяти до подгрузки
+        await restarted.refresh_user_data(2, fresh)
+        await restarted.refresh_user_data(2, fresh)  # второй раз в БД не ходит
+        # подгруженное уже «сохранено»: без изменений записи нет
+        await restarted.update_user_data(1, {"product": 7})
+        return conversations, user_data, fresh, restarted.stats()
+
+    conversations, user_data, fresh, stats = asyncio.run(run())
+    assert conversations == {(10, 1): 2}
+    assert user_data == {1: {"product": 7}}
+    assert fresh == {"product": 8, "qty": 5}
+    assert (stats["lazy_loads"], stats["writes"], stats["skipped"]) == (1, 0, 1)
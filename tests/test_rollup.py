@@ -0,0 +1,58 @@
+import asyncio
+from datetime import date, datetime
+
+from sqlalchemy import false, insert, select, text
+
+from bot.models import DailyRollup, StockMovement
+from bot.rollup import fold, period_totals
+
+
+def _moves(engines, *rows):
+    with engines[0].begin() as conn:
+        conn.execute(insert(StockMovement), [
+            {"ts": ts, "kind": kind, "product_id": pid, "qty": qty, "actor": "500"} for ts, kind, pid, qty in rows
+        ])
+
+
+async def _fold_and_read(make_session):
+    async with make_session() as session:
+        n = await fold(session)
+        rows = (await session.execute(
+            select(DailyRollup.day, DailyRollup.kind, DailyRollup.product_id, DailyRollup.events, DailyRollup.qty)
+        )).all()
+    return n, {(day, kind, pid): (ev, qty) for day, kind, pid, ev, qty in rows}
+
+
+def test_fold_twice(engines, make_session):
+    d1, d2 = datetime(2026, 10, 1, 12), datetime(2026, 10, 2, 9)
+    _moves(engines, (d1, "add_stock", 1, 10), (d1, "add_stock", 1, 5), (d1, "writeoff", 1, 3))
+
+    n, totals = asyncio.run(_fold_and_read(make_session))
+    assert n == 3
+    assert totals == {(d1.date(), "add_stock", 1): (2, 15), (d1.date(), "writeoff", 1): (1, 3)}
+
+    # второй проход: старое не считается повторно, новое прибавляется
+    _moves(engines, (d1, "add_stock", 1, 1), (d2, "add_stock", 1, 7))
+    n, totals = asyncio.run(_fold_and_read(make_session))
+    assert n == 2
+    assert totals == {
+        (d1.date(), "add_stock", 1): (3, 16),
+        (d1.date(), "writeoff", 1): (1, 3),
+        (d2.date(), "add_stock", 1): (1, 7),
+    }
+
+    n, _ = asyncio.run(_fold_and_read(make_session))
+    assert n == 0
+
+    async def summary():
+        async with make_session() as session:
+            return sorted(await period_totals(session, date(2026, 10, 1), date(2026, 10, 2)))
+    assert asyncio.run(summary()) == [("add_stock", 1, 3, 16), ("writeoff", 1, 1, 3)]
+
+
+def test_unfolded_lookup_uses_partial_index(engines):
+    query = select(StockMovement.id).where(StockMovement.folded == false()).order_by(StockMovement.id)
+    sql = str(query.compile(engines[0], compile_kwargs={"literal_binds": True}))
+    with engines[0].connect() as conn:
+        plan = " ".join(row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql)))
+    assert "ix_movements_unfolded" in plan
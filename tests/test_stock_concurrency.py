@@ -0,0 +1,105 @@
+"""
+Одновременные передачи и списания с одних и тех же остатков.
+
+Задачи повторяют путь хендлеров (transfer_stock.enter_qty,
+writeoff.enter_reason, transfer_cart.commit_cart): прочитать доступное,
+«подумать», затем условно списать (Stock.take / take_many) и, для
+передачи, зачислить сотруднику. Остаток не должен уходить в минус, а
+итоги — расходиться с суммой применённых движений.
+"""
+
+import asyncio
+import random
+
+import pytest
+from sqlalchemy import insert, select
+
+from bot.models import Product, Stock, User
+
+START = 500
+PRODUCTS = (1, 2)
+EMPLOYEES = (1, 2, 3)
+
+
+@pytest.fixture(autouse=True)
+def seed(engines):
+    with engines[0].begin() as conn:
+        conn.execute(insert(Product), [{"id": pid, "name": f"Товар {pid}"} for pid in PRODUCTS])
+        conn.execute(insert(User), [
+            {"id": uid, "telegram_id": str(500 + uid), "full_name": f"Сотрудник {uid}", "role": "employee"}
+            for uid in EMPLOYEES
+        ])
+        conn.execute(insert(Stock), [{"product_id": pid, "user_id": None, "quantity": START} for pid in PRODUCTS])
+
+
+async def _quantity(make_session, pid, uid):
+    async with make_session() as session:
+        holder = Stock.user_id.is_(None) if uid is None else Stock.user_id == uid
+        return await session.scalar(select(Stock.quantity).where(Stock.product_id == pid, holder)) or 0
+
+
+async def _transfer(make_session, rnd, applied):
+    pid, uid, qty = rnd.choice(PRODUCTS), rnd.choice(EMPLOYEES), rnd.randint(1, 40)
+    if qty > await _quantity(make_session, pid, None):
+        return
+    await asyncio.sleep(rnd.uniform(0, 0.02))
+    async with make_session() as session:
+        if not await Stock.take(session, qty, product_id=pid, user_id=None):
+            return
+        await Stock.adjust(session, pid, uid, qty)
+        await session.commit()
+    applied.append(("transfer", pid, uid, qty))
+
+
+async def _writeoff(make_session, rnd, applied):
+    pid, uid, qty = rnd.choice(PRODUCTS), rnd.choice((None,) + EMPLOYEES), rnd.randint(1, 40)
+    if qty > await _quantity(make_session, pid, uid):
+        return
+    await asyncio.sleep(rnd.uniform(0, 0.02))
+    async with make_session() as session:
+        if not await Stock.take(session, qty, product_id=pid, user_id=uid):
+            return
+        await session.commit()
+    applied.append(("writeoff", pid, uid, qty))
+
+
+async def _cart(make_session, rnd, applied):
+    uid = rnd.choice(EMPLOYEES)
+    cart = {pid: rnd.randint(1, 30) for pid in PRODUCTS}
+    await asyncio.sleep(rnd.uniform(0, 0.02))
+    async with make_session() as session:
+        if not await Stock.take_many(session, cart):
+            await session.rollback()
+            return
+        await Stock.adjust_many(session, cart, user_id=uid)
+        await session.commit()
+    applied += [("transfer", pid, uid, qty) for pid, qty in cart.items()]
+
+
+async def _run(make_session, tasks):
+    rnd, applied = random.Random(17), []
+    jobs = [rnd.choice((_transfer, _writeoff, _cart))(make_session, rnd, applied) for _ in range(tasks)]
+    await asyncio.gather(*jobs)
+
+    async with make_session() as session:
+        rows = (await session.execute(select(Stock.product_id, Stock.user_id, Stock.quantity))).all()
+    return applied, {(pid, uid): qty for pid, uid, qty in rows}
+
+
+def test_concurrent_takes_never_oversell(make_session):
+    applied, balances = asyncio.run(_run(make_session, 300))
+
+    assert applied, "ни одно движение не прошло — тест ничего не проверил"
+    assert all(qty >= 0 for qty in balances.values()), balances
+
+    expected = {(pid, None): START for pid in PRODUCTS}
+    for kind, pid, uid, qty in applied:
+        if kind == "transfer":
+            expected[(pid, None)] -= qty
+            expected[(pid, uid)] = expected.get((pid, uid), 0) + qty
+        else:
+            expected[(pid, uid)] -= qty
+    assert {k: v for k, v in balances.items() if v or k in expected} == {k: v for k, v in expected.items()}
+
+    written_off = sum(qty for kind, _, _, qty in applied if kind == "writeoff")
+    assert sum(balances.values()) == START * len(PRODUCTS) - written_off
@@ -0,0 +1,24 @@
+import pytest
+
+from bot.handlers.transfer_cart import parse_line
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("Перчатки 5", ("Перчатки", 5)),
+    ("Перчатки;5", ("Перчатки", 5)),
+    ("Перчатки — 5 шт", ("Перчатки", 5)),
+    ("Перчатки x5", ("Перчатки", 5)),
+    ("Перчатки × 5 шт.", ("Перчатки", 5)),
+    ("Товар 007 3", ("Товар 007", 3)),
+    # «х» в конце названия — часть названия, а не знак количества
+    ("Мех 5", ("Мех", 5)),
+    ("Комплект для душевых 2", ("Комплект для душевых", 2)),
+    ("Мех х 5", ("Мех", 5)),
+])
+def test_parse_line(raw, expected):
+    assert parse_line(raw) == expected
+
+
+@pytest.mark.parametrize("raw", ["Перчатки", "Товар 007 -2", "5"])
+def test_parse_line_rejects(raw):
+    assert parse_line(raw) is None
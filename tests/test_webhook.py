@@ -0,0 +1,23 @@
+import pytest
+
+from bot.webhook import check_secret
+
+
+@pytest.mark.parametrize("listen, url, secret", [
+    ("127.0.0.1", "", ""),
+    ("::1", "", ""),
+    ("0.0.0.0", "", "s3cret"),
+    ("0.0.0.0", "https://bot.example.com", "s3cret"),
+])
+def test_check_secret_allows(listen, url, secret):
+    check_secret(listen, url, secret)
+
+
+@pytest.mark.parametrize("listen, url", [
+    ("0.0.0.0", ""),
+    ("10.0.0.5", ""),
+    ("127.0.0.1", "https://bot.example.com"),
+])
+def test_check_secret_refuses_without_secret(listen, url):
+    with pytest.raises(RuntimeError):
+        check_secret(listen, url, "")